@@ -0,0 +1,101 @@
+"""
+Glitch Bot Monitored-Account Rotation
+
+Chooses which ACCOUNTS_TO_MONITOR to read each cycle. Every account is covered in turn: an
+account's priority is its signal yield (the smoothed share of its tweets that pass
+assess_content_quality) times the seconds since it was last read, so high-yield accounts are read
+more often and quiet ones still come round. Resolved user ids and since_id cursors are kept in the
+monitored_accounts table, so an account costs one read per visit and only returns new tweets.
+"""
+import time
+from typing import Dict, Iterable, List
+
+from src.bots.config import ACCOUNT_POLL_CONFIG
+
+
+class AccountRotation:
+    def __init__(self, db, config: Dict = None):
+        self.db = db
+        self.config = dict(ACCOUNT_POLL_CONFIG, **(config or {}))
+
+    def sync(self, usernames: Iterable[str]) -> int:
+        """Start tracking any new usernames; returns how many were added"""
+        with self.db.get_connection() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO monitored_accounts (username) VALUES (?)",
+                             [(u,) for u in usernames])
+            conn.commit()
+            return conn.total_changes - before
+
+    def unresolved(self, now: float = None) -> List[str]:
+        """Usernames without a user id, except those get_users couldn't find within unresolved_ttl"""
+        now = now or time.time()
+        with self.db.get_connection() as conn:
+            return [row[0] for row in conn.execute("""
+                SELECT username FROM monitored_accounts
+                WHERE user_id IS NULL AND (lookup_failed_at IS NULL OR lookup_failed_at <= ?)
+            """, (now - self.config["unresolved_ttl"],))]
+
+    def record_user_ids(self, user_ids: Dict[str, str]):
+        with self.db.get_connection() as conn:
+            conn.executemany("UPDATE monitored_accounts SET user_id = ?, lookup_failed_at = NULL WHERE username = ?",
+                             [(user_id, username) for username, user_id in user_ids.items()])
+            conn.commit()
+
+    def record_lookup_failures(self, usernames: Iterable[str], now: float = None):
+        """Usernames get_users didn't return (renamed, suspended or deleted accounts)"""
+        now = now or time.time()
+        with self.db.get_connection() as conn:
+            conn.executemany("UPDATE monitored_accounts SET lookup_failed_at = ? WHERE username = ? AND user_id IS NULL",
+                             [(now, username) for username in usernames])
+            conn.commit()
+
+    def priority(self, row: Dict, now: float) -> float:
+        if row["last_polled_at"] is None:
+            return float("inf")
+        signal = row["signal_yield"] if row["signal_yield"] is not None else self.config["prior_yield"]
+        return max(signal, self.config["min_yield"]) * (now - row["last_polled_at"])
+
+    def plan(self, budget: int, usernames: Iterable[str] = None, now: float = None) -> List[Dict]:
+        """Up to budget resolved accounts to read now, highest priority first"""
+        if budget <= 0:
+            return []
+        now = now or time.time()
+        with self.db.get_connection() as conn:
+            rows = [dict(row) for row in conn.execute("""
+                SELECT * FROM monitored_accounts
+                WHERE user_id IS NOT NULL AND (last_polled_at IS NULL OR last_polled_at <= ?)
+            """, (now - self.config["min_interval"],))]
+        if usernames is not None:
+            wanted = set(usernames)
+            rows = [row for row in rows if row["username"] in wanted]
+        rows.sort(key=lambda row: (-self.priority(row, now), row["username"]))
+        return rows[:min(budget, self.config["max_per_cycle"])]
+
+    def record_poll(self, username: str, seen: int, passed: int, newest_id: str = None, error: str = None,
+                    now: float = None):
+        """Advance the account's cursor and fold this read's pass rate into its yield"""
+        alpha = self.config["yield_alpha"]
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                UPDATE monitored_accounts SET
+                    last_polled_at = ?,
+                    polls = polls + 1,
+                    tweets_seen = tweets_seen + ?,
+                    tweets_passed = tweets_passed + ?,
+                    since_id = COALESCE(?, since_id),
+                    signal_yield = CASE WHEN ? > 0
+                        THEN (1 - ?) * COALESCE(signal_yield, ?) + ? * (CAST(? AS REAL) / ?)
+                        ELSE signal_yield END,
+                    last_error = ?
+                WHERE username = ?
+            """, (now or time.time(), seen, passed, newest_id, seen, alpha, self.config["prior_yield"], alpha,
+                  passed, max(seen, 1), error, username))
+            conn.commit()
+
+    def stats(self) -> List[Dict]:
+        with self.db.get_connection() as conn:
+            return [dict(row) for row in conn.execute("""
+                SELECT username, polls, tweets_seen, tweets_passed, signal_yield, last_polled_at, since_id
+                FROM monitored_accounts ORDER BY username
+            """)]
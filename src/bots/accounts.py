@@ -0,0 +1,179 @@
+"""
+Glitch Bot Accounts (multi-account operation in one process)
+
+An Account bundles what is private to one bot persona: its DB file, mention queue, Twitter
+credentials, rate-limit buckets and cached user id. Agent code finds the active account through
+current_account(), which reads a contextvar, so the same functions serve every account and worker
+threads started with tracing.with_current_context() stay on their caller's account. User profiles,
+tweets and LLM completions are cached process-wide (caches.py) and shared by all accounts.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from src.bots.config import ACCOUNTS_FILE, GAME_API_KEY, TWITTER_RATE_LIMITS, TWITTER_TOKEN, YOUR_TWITTER_HANDLE
+from src.bots.glitch_bot_db import TwitterAgentDB
+from src.bots.mention_queue import MentionQueue
+from src.bots.twitter_utils import (
+    TokenBucket, get_twitter_client, has_twitter_client_override, twitter_read_limiter, twitter_write_limiter
+)
+
+DEFAULT_DB_PATH = "enhanced_glitch_bot_v2.db"
+
+
+class Account:
+    """
+    One bot persona. The DB, mention queue and Twitter client are created on first use, so an
+    idle account costs a few hundred bytes plus its two token buckets.
+    """
+    __slots__ = ("name", "owner_handle", "db_path", "twitter_token", "game_api_key", "read_limiter", "write_limiter",
+                 "bot_user_id", "agent_state", "mention_pool", "quote_gate", "_db", "_mention_queue", "_client", "_lock")
+
+    def __init__(self, name: str, owner_handle: str = None, db_path: str = None, twitter_token: str = None,
+                 game_api_key: str = None, read_limiter: TokenBucket = None, write_limiter: TokenBucket = None):
+        self.name = name
+        self.owner_handle = owner_handle or YOUR_TWITTER_HANDLE
+        self.db_path = db_path or f"glitch_bot_{name}.db"
+        self.twitter_token = twitter_token
+        self.game_api_key = game_api_key
+        self.read_limiter = read_limiter or TokenBucket(TWITTER_RATE_LIMITS["reads_per_window"], TWITTER_RATE_LIMITS["window_seconds"])
+        self.write_limiter = write_limiter or TokenBucket(TWITTER_RATE_LIMITS["writes_per_window"], TWITTER_RATE_LIMITS["window_seconds"])
+        self.bot_user_id = None
+        self.agent_state = None  # The agent state's posting pacing, kept across agent re-creation (see warm_restart.py)
+        self.mention_pool = None  # Built by the agent module, which owns the reply handler
+        self.quote_gate = None    # Likewise (see glitch_bot_agent.get_quote_gate)
+        self._db = None
+        self._mention_queue = None
+        self._client = None
+        self._lock = threading.RLock()
+
+    @property
+    def db(self) -> TwitterAgentDB:
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._db = TwitterAgentDB(self.db_path)
+        return self._db
+
+    @property
+    def mention_queue(self) -> MentionQueue:
+        if self._mention_queue is None:
+            with self._lock:
+                if self._mention_queue is None:
+                    self._mention_queue = MentionQueue(self.db, priority_handle=self.owner_handle)
+        return self._mention_queue
+
+    def twitter_client(self):
+        """This account's (instrumented) Twitter client; a process-wide override wins, e.g. in benchmarks"""
+        if has_twitter_client_override():
+            return get_twitter_client()
+        if self._client is None:
+            # Rate limits are per token, so each account's endpoints get their own breakers
+            self._client = get_twitter_client(self.twitter_token, "twitter" if self.name == "default" else f"twitter:{self.name}")
+        return self._client
+
+    def bind(self, fn: Callable) -> Callable:
+        """fn wrapped to run with this account active (for scheduler tasks and GAME agent steps)"""
+        @functools.wraps(fn)
+        def bound(*args, **kwargs):
+            with use_account(self):
+                return fn(*args, **kwargs)
+        return bound
+
+    def __repr__(self):
+        return f"Account({self.name!r}, db_path={self.db_path!r})"
+
+
+_default_account: Optional[Account] = None
+_current_account: contextvars.ContextVar = contextvars.ContextVar("glitchbot_account", default=None)
+
+
+def default_account() -> Account:
+    """The single account configured in config.py; it uses the module-level Twitter rate limiters"""
+    global _default_account
+    if _default_account is None:
+        _default_account = Account("default", YOUR_TWITTER_HANDLE, DEFAULT_DB_PATH, TWITTER_TOKEN, GAME_API_KEY,
+                                   twitter_read_limiter, twitter_write_limiter)
+    return _default_account
+
+
+def set_default_account(account: Account):
+    global _default_account
+    _default_account = account
+
+
+def current_account() -> Account:
+    return _current_account.get() or default_account()
+
+
+@contextmanager
+def use_account(account: Account):
+    token = _current_account.set(account)
+    try:
+        yield account
+    finally:
+        _current_account.reset(token)
+
+
+class AccountAttribute:
+    """Module-level stand-in (e.g. glitch_bot_agent.db) that forwards to the current account's attribute"""
+    __slots__ = ("_attr",)
+
+    def __init__(self, attr: str):
+        self._attr = attr
+
+    def __getattr__(self, name):
+        return getattr(getattr(current_account(), self._attr), name)
+
+    def __repr__(self):
+        return f"<{self._attr} of {current_account()!r}>"
+
+
+def _secret(entry: Dict, key: str) -> Optional[str]:
+    """Credentials come from the environment variable named by <key>_env, or inline as <key>"""
+    if entry.get(f"{key}_env"):
+        return os.environ.get(entry[f"{key}_env"])
+    return entry.get(key)
+
+
+def _credential(entry: Dict, key: str, default: Optional[str], path: str) -> str:
+    """
+    An account's credential. Only the account named "default" falls back to the global one from
+    config.py; any other account missing one would silently act as the default bot, so it is an error.
+    """
+    value = _secret(entry, key)
+    if value:
+        return value
+    if entry["name"] == "default" and default:
+        return default
+    source = f"environment variable {entry[f'{key}_env']}" if entry.get(f"{key}_env") else f"{key} / {key}_env"
+    raise ValueError(f"Account {entry['name']} in {path} has no {key} (set {source})")
+
+
+def load_accounts(path: str = None) -> List[Account]:
+    """Accounts from the JSON file at path (GLITCH_BOT_ACCOUNTS_FILE), or just the default account"""
+    path = path or ACCOUNTS_FILE
+    if not path:
+        return [default_account()]
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    accounts, names = [], set()
+    for entry in entries:
+        name = entry["name"]
+        if name in names:
+            raise ValueError(f"Duplicate account name in {path}: {name}")
+        names.add(name)
+        accounts.append(Account(
+            name,
+            owner_handle=entry.get("owner_handle"),
+            db_path=entry.get("db_path"),
+            twitter_token=_credential(entry, "twitter_token", TWITTER_TOKEN, path),
+            game_api_key=_credential(entry, "game_api_key", GAME_API_KEY, path),
+        ))
+    if len({a.db_path for a in accounts}) != len(accounts):
+        raise ValueError(f"Accounts in {path} must not share a db_path")
+    return accounts
@@ -0,0 +1,179 @@
+"""
+Glitch Bot Content Analysis (batch sentiment, key points and importance for ingested tweets)
+
+Stored tweets (monitored_content) start with processed = 0. A partial index covers only those
+rows, so finding the backlog stays cheap however large the table grows. Each run drains it in
+chunks of chunk_size rows, oldest first:
+
+    local pass: sentiment from a word list; key points from the quality keywords, hashtags and
+                cashtags; importance from pipeline.score_content (quality plus engagement). No I/O.
+    LLM pass:   rows whose local importance reaches llm_min_importance get their sentiment and
+                key points from one batched completion per llm_batch_size rows, at most
+                llm_calls_per_run per run. If the LLM is unavailable the local results stand.
+
+Each chunk is written in one transaction that inserts its analysis_results rows and marks the
+content processed. After a crash or restart every row is either fully analysed or still pending,
+and the next run resumes where the last one stopped. Tweets scored by the pipeline (handle_score)
+go through the same write, so nothing is analysed twice.
+"""
+import json
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from src.bots.config import ANALYSIS_CONFIG, QUALITY_INDICATORS
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY
+
+log = get_logger("analysis")
+
+POSITIVE_WORDS = frozenset("""
+    breakthrough bullish excited excellent exciting great impressive improve improved improves
+    innovative launch launched love milestone novel powerful promising record success successful
+    strong win wins working amazing progress faster better best solved open-source
+""".split())
+NEGATIVE_WORDS = frozenset("""
+    bad bearish broken bug concern concerns crash crashed decline delay delayed down exploit
+    exploited fail failed failing failure fraud hack hacked lawsuit loss losses outage risk risky
+    scam slow vulnerability weak worse worst rug rugged dump
+""".split())
+
+_TOKEN = re.compile(r"[#$]?[a-z0-9_'-]+")
+
+
+def _chunks(items: List, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def local_sentiment(words: List[str]) -> str:
+    score = sum(word in POSITIVE_WORDS for word in words) - sum(word in NEGATIVE_WORDS for word in words)
+    return "positive" if score > 0 else "negative" if score < 0 else "neutral"
+
+
+class ContentAnalyzer:
+    def __init__(self, db, config: Dict = None):
+        self.db = db
+        self.config = dict(ANALYSIS_CONFIG, **(config or {}))
+        self._keywords = [keyword.lower() for keyword in QUALITY_INDICATORS["high_quality"]]
+
+    def analyze_local(self, row: Dict) -> Dict:
+        """Sentiment, key points and importance of one monitored_content row, without any API call"""
+        from src.bots.pipeline import score_content  # pipeline imports this module
+        text = row["content"] or ""
+        lower = text.lower()
+        words = _TOKEN.findall(lower)
+        key_points = [keyword for keyword in self._keywords if keyword in lower]
+        key_points += [word for word in dict.fromkeys(words) if word[0] in "#$" and len(word) > 1]
+        return {"content_id": row["id"], "topic": row["topic"], "content": text, "sentiment": local_sentiment(words),
+                "key_points": key_points[:self.config["max_key_points"]], "importance_score": score_content(row),
+                "source": "local"}
+
+    def analyze_llm(self, results: List[Dict], max_calls: int) -> Tuple[int, int]:
+        """Replace the local sentiment and key points of the most important results with the LLM's; returns (calls, rows)"""
+        from src.bots.llm_utils import analyze_content_batch
+        wanted = sorted((r for r in results if r["importance_score"] >= self.config["llm_min_importance"]),
+                        key=lambda r: -r["importance_score"])
+        calls = rows = 0
+        for batch in _chunks(wanted, self.config["llm_batch_size"]):
+            if calls >= max_calls:
+                break
+            answers = analyze_content_batch([r["content"] for r in batch], self.config["llm_model"])
+            calls += 1
+            if not answers:
+                break  # Out of budget, circuit open or an unusable answer: the local results stand
+            for index, answer in answers.items():
+                batch[index].update(sentiment=answer["sentiment"], source="llm",
+                                    key_points=answer["key_points"][:self.config["max_key_points"]])
+                rows += 1
+        return calls, rows
+
+    def store(self, results: List[Dict]) -> int:
+        """
+        Insert the analyses and mark their rows processed in one transaction. Rows already processed
+        (by another worker, or the pipeline) are left alone. Returns the rows written.
+        """
+        by_id = {r["content_id"]: r for r in results}
+        if not by_id:
+            return 0
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            pending = set()
+            for ids in _chunks(list(by_id), 500):
+                pending.update(row[0] for row in conn.execute(f"""
+                    SELECT id FROM monitored_content WHERE processed = 0 AND id IN ({','.join('?' * len(ids))})
+                """, ids))
+            fresh = [r for content_id, r in by_id.items() if content_id in pending]
+            conn.executemany("""
+                INSERT INTO analysis_results (content_id, topic, key_points, sentiment, importance_score)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(r["content_id"], r["topic"], json.dumps(r["key_points"]), r["sentiment"], r["importance_score"])
+                  for r in fresh])
+            conn.executemany("UPDATE monitored_content SET processed = 1 WHERE id = ?", [(r["content_id"],) for r in fresh])
+            conn.commit()
+        for source, count in Counter(r["source"] for r in fresh).items():
+            REGISTRY.counter("glitchbot_analysis_rows_total", {"source": source}, "Stored tweets analysed, by who analysed them").inc(count)
+        return len(fresh)
+
+    def pending(self) -> int:
+        with self.db.get_connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM monitored_content WHERE processed = 0").fetchone()[0]
+
+    def run(self, max_seconds: float = None, llm_calls: int = None) -> Dict:
+        """Drain the backlog chunk by chunk until it is empty or max_seconds have passed"""
+        start = time.monotonic()
+        deadline = start + (self.config["max_seconds"] if max_seconds is None else max_seconds)
+        llm_left = self.config["llm_calls_per_run"] if llm_calls is None else llm_calls
+        stats = {"rows": 0, "chunks": 0, "llm_calls": 0, "llm_rows": 0}
+        after_id = 0
+        while True:
+            with self.db.get_connection() as conn:
+                rows = [dict(row) for row in conn.execute("""
+                    SELECT id, content, topic, engagement_metrics FROM monitored_content
+                    WHERE processed = 0 AND id > ? ORDER BY id LIMIT ?
+                """, (after_id, self.config["chunk_size"]))]
+            if not rows:
+                break
+            after_id = rows[-1]["id"]
+            results = [self.analyze_local(row) for row in rows]
+            if llm_left > 0:
+                calls, llm_rows = self.analyze_llm(results, llm_left)
+                llm_left -= calls
+                stats["llm_calls"] += calls
+                stats["llm_rows"] += llm_rows
+            stats["rows"] += self.store(results)
+            stats["chunks"] += 1
+            if time.monotonic() >= deadline:
+                break
+        stats["seconds"] = round(time.monotonic() - start, 3)
+        REGISTRY.gauge("glitchbot_analysis_pending", {}, "Stored tweets waiting for analysis").set(self.pending())
+        if stats["rows"]:
+            log.info("Analysed %d stored tweets in %d chunk(s), %d by the LLM (%.1fs)", stats["rows"], stats["chunks"],
+                     stats["llm_rows"], stats["seconds"])
+        return stats
+
+    def summary(self, hours: int = 24, top: int = 5) -> Dict:
+        """What was ingested lately, for the agent state: per-topic counts and sentiment, and the commonest key points"""
+        since = f"-{int(hours)} hours"
+        by_topic = {}
+        with self.db.get_connection() as conn:
+            for row in conn.execute("""
+                SELECT topic, sentiment, COUNT(*) AS n, AVG(importance_score) AS importance FROM analysis_results
+                WHERE created_at >= datetime('now', ?) GROUP BY topic, sentiment
+            """, (since,)):
+                stats = by_topic.setdefault(row["topic"], {"analysed": 0, "sentiment": {}, "importance": 0.0})
+                stats["analysed"] += row["n"]
+                stats["sentiment"][row["sentiment"] or "unknown"] = row["n"]
+                stats["importance"] += (row["importance"] or 0) * row["n"]
+            key_points = Counter()
+            for row in conn.execute("""
+                SELECT key_points FROM analysis_results WHERE created_at >= datetime('now', ?) ORDER BY id DESC LIMIT 1000
+            """, (since,)):
+                try:
+                    key_points.update(json.loads(row["key_points"] or "[]"))
+                except (TypeError, ValueError):
+                    continue
+        for stats in by_topic.values():
+            stats["avg_importance"] = round(stats.pop("importance") / stats["analysed"], 1)
+        return {"by_topic": by_topic, "top_key_points": [point for point, _ in key_points.most_common(top)]}
@@ -0,0 +1,434 @@
+"""
+Glitch Bot Offline Benchmarks
+
+Runs the real agent/DB code paths against the in-process fakes from fakes.py, so throughput and
+latency regressions in glitch_bot_db / glitch_bot_agent show up as numbers without touching live APIs.
+
+Usage:
+    python -m src.bots.benchmarks                       # all scenarios, default sizes
+    python -m src.bots.benchmarks reply_burst --mentions 200 --twitter-latency-ms 80
+    python -m src.bots.benchmarks rank_and_post --db-rows 1000000 --json
+    python -m src.bots.benchmarks job_workers --jobs 400 --workers 1,2,4 --twitter-latency-ms 50
+    python -m src.bots.benchmarks stream_ingest --stream-tweets 500
+    python -m src.bots.benchmarks llm_stream --generations 100
+    python -m src.bots.benchmarks startup --startup-runs 10
+    python -m src.bots.benchmarks analysis --analysis-rows 200000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from src.bots.fakes import FakeOpenAI, FakeTwitterClient
+from src.bots.mention_queue import percentile
+from src.bots.outbox import Outbox
+
+
+def _result(scenario: str, ops: int, seconds: float, latencies: List[float], db_path: str, **extra) -> Dict:
+    result = {
+        "scenario": scenario,
+        "ops": ops,
+        "seconds": round(seconds, 3),
+        "ops_per_sec": round(ops / seconds, 1) if seconds > 0 else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "db_bytes": os.path.getsize(db_path) if os.path.exists(db_path) else 0,
+    }
+    result.update(extra)
+    return result
+
+
+def _lift_rate_limits():
+    """The shared API budgets would throttle a benchmark to real-world rates; lift them for the run"""
+    from src.bots import llm_utils
+    from src.bots.twitter_utils import twitter_read_limiter, twitter_write_limiter
+    llm_utils.OPENAI_MAX_CALLS_PER_HOUR = 10 ** 9
+    for bucket in (twitter_read_limiter, twitter_write_limiter):
+        bucket.capacity = bucket.tokens = 10 ** 12
+
+
+def use_database(db_path: str):
+    """Point the agent module (via a fresh default account) at a scratch database"""
+    from src.bots import glitch_bot_agent as agent
+    from src.bots.accounts import Account, set_default_account
+    from src.bots.caches import LLM_CACHE, TWEET_CACHE, USER_CACHE
+    from src.bots.twitter_utils import twitter_read_limiter, twitter_write_limiter
+    account = Account("default", db_path=db_path, read_limiter=twitter_read_limiter, write_limiter=twitter_write_limiter)
+    set_default_account(account)
+    account.db  # Create the schema now; scenarios may seed the file directly
+    for cache in (LLM_CACHE, TWEET_CACHE, USER_CACHE):
+        cache.clear()
+    return agent
+
+
+def install_fakes(twitter: FakeTwitterClient, openai_client: FakeOpenAI):
+    from src.bots.llm_utils import set_openai_client
+    from src.bots.twitter_utils import set_twitter_client
+    set_twitter_client(twitter)
+    set_openai_client(openai_client)
+    _lift_rate_limits()
+
+
+def bench_ingest(db_path: str, twitter: FakeTwitterClient, tweets: int = 5000, **_) -> Dict:
+    """Ingest N tweets through the home-timeline fetch-and-store path"""
+    agent = use_database(db_path)
+    client = agent.current_account().twitter_client()
+    latencies, stored = [], 0
+    start = time.perf_counter()
+    while stored < tweets:
+        t0 = time.perf_counter()
+        stored += len(agent.monitor_home_timeline(client))
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+    return _result("ingest", stored, elapsed, latencies, db_path, latency_unit="timeline page (25 tweets)")
+
+
+def bench_reply_burst(db_path: str, twitter: FakeTwitterClient, mentions: int = 100, **_) -> Dict:
+    """Queue a burst of M mentions (some sharing conversations) and drain them through the worker pool"""
+    agent = use_database(db_path)
+    for i in range(mentions):
+        conversation = f"conv{i % max(mentions // 4, 1)}" if i % 3 == 0 else None
+        twitter.add_mentions(1, conversation_id=conversation)
+    client = agent.current_account().twitter_client()
+    start = time.perf_counter()
+    wall_start = time.time()
+    # The poller sees the newest 20 mentions per call; page back through the burst
+    while twitter.mentions:
+        agent.check_mentions(client)
+        del twitter.mentions[-20:]
+    while agent.process_mention_queue(str(mentions))[2]["mentions_replied"]:
+        pass
+    elapsed = time.perf_counter() - start
+    with agent.db.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT completed_at FROM priority_queue WHERE outcome = 'replied'"
+        ).fetchall()
+    latencies = [row[0] - wall_start for row in rows]
+    return _result("reply_burst", len(latencies), elapsed, latencies, db_path,
+                   latency_unit="burst start to reply", posted=len(twitter.posted))
+
+
+def _seed_monitored_content(db_path: str, rows: int, twitter: FakeTwitterClient):
+    """Bulk-load rows straight into SQLite (one transaction) so seeding 1M rows takes seconds"""
+    rng = random.Random(7)
+    conn = sqlite3.connect(db_path)
+    batch = []
+    for i in range(rows):
+        text = twitter.make_tweet()["text"] if i % 1000 == 0 else f"Research note {i}: data on {rng.choice(['AI', 'crypto', 'biotech'])} development."
+        metrics = json.dumps({"like_count": rng.randint(0, 500), "retweet_count": rng.randint(0, 100)})
+        batch.append((str(10 ** 12 + i), text, "home_timeline", str(rng.randint(1, 10 ** 6)), metrics))
+        if len(batch) >= 50000:
+            conn.executemany("INSERT OR IGNORE INTO monitored_content (tweet_id, content, topic, author_id, engagement_metrics) VALUES (?, ?, ?, ?, ?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT OR IGNORE INTO monitored_content (tweet_id, content, topic, author_id, engagement_metrics) VALUES (?, ?, ?, ?, ?)", batch)
+    conn.commit()
+    twitter.tweets.clear()
+    conn.close()
+
+
+def bench_rank_and_post(db_path: str, twitter: FakeTwitterClient, db_rows: int = 1000000, posts: int = 50, **_) -> Dict:
+    """Rank monitored content and prepare quote posts from a DB holding db_rows tweets"""
+    agent = use_database(db_path)
+    seed_start = time.perf_counter()
+    _seed_monitored_content(db_path, db_rows, twitter)
+    seed_seconds = time.perf_counter() - seed_start
+    outbox = Outbox(agent.current_account().db)
+    client = agent.current_account().twitter_client()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(posts):
+        t0 = time.perf_counter()
+        agent.post_insight_from_timeline("AI", current_state={})
+        latencies.append(time.perf_counter() - t0)
+        # Each post's slot comes round before the next is written (otherwise the full outbox stops generation)
+        outbox.publish_due(client, now=time.time() + 10 ** 6, limit=10)
+        # New content keeps arriving between posting slots
+        agent.db.store_monitored_content(str(10 ** 14 + i), twitter.make_tweet()["text"], "home_timeline")
+    elapsed = time.perf_counter() - start
+    return _result("rank_and_post", posts, elapsed, latencies, db_path, db_rows=db_rows, seed_seconds=round(seed_seconds, 2))
+
+
+def _drain_jobs(db_path: str, roles: List[str]):
+    """Worker process body: run jobs of the given roles until none are claimable"""
+    from src.bots.jobs import JobQueue, JobWorker
+    from src.bots.pipeline import HANDLERS
+    agent = use_database(db_path)
+    worker = JobWorker(JobQueue(agent.db), HANDLERS, roles=roles, concurrency=1)
+    while worker.run_once():
+        pass
+
+
+def bench_job_workers(db_path: str, twitter: FakeTwitterClient, jobs: int = 400, workers: str = "1,2,4", **_) -> Dict:
+    """Drain the same hydrate -> score job backlog with 1, 2, 4... worker processes sharing one DB"""
+    from src.bots.jobs import JobQueue
+    counts = [int(n) for n in str(workers).split(",")]
+    agent = use_database(db_path)
+    tweet_ids = []
+    for _ in range(jobs * 10):
+        tweet = twitter.make_tweet()
+        agent.db.store_monitored_content(tweet["id"], tweet["text"], "home_timeline", tweet["author_id"])
+        tweet_ids.append(tweet["id"])
+    ctx = multiprocessing.get_context("fork")  # Children inherit the installed fakes
+    scaling = {}
+    for count in counts:
+        with agent.db.get_connection() as conn:
+            conn.execute("DELETE FROM jobs")
+            conn.commit()
+        JobQueue(agent.db).enqueue_many("hydrate", [{"tweet_ids": tweet_ids[i:i + 10]} for i in range(0, len(tweet_ids), 10)])
+        start = time.perf_counter()
+        procs = [ctx.Process(target=_drain_jobs, args=(db_path, ["hydrate", "score"])) for _ in range(count)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+        done = JobQueue(agent.db).stats()
+        ran = sum(done.get(kind, {}).get("done", 0) for kind in ("hydrate", "score"))
+        scaling[count] = round(ran / elapsed, 1)
+    return _result("job_workers", ran, elapsed, [], db_path, jobs_per_sec_by_workers=scaling)
+
+
+def bench_stream_ingest(db_path: str, twitter: FakeTwitterClient, tweets_streamed: int = 200, rate: float = 50.0, **_) -> Dict:
+    """Post tweets to a local filtered stream (dropping the connection halfway) and time posted -> stored"""
+    from src.bots.config import SCHEDULER_CONFIG, TOPICS_TO_MONITOR
+    from src.bots.fakes import FakeStreamServer
+    from src.bots.streaming import FilteredStream, StreamIngestor
+    agent = use_database(db_path)
+    server = FakeStreamServer(twitter, keepalive=1.0).start()
+    stored_at = {}
+
+    def record(account, tweet, *_):
+        if tweet:
+            stored_at[tweet["id"]] = time.perf_counter()
+
+    ingestor = StreamIngestor([agent.current_account()], on_mention=record, on_tweet=record)
+    stream = FilteredStream(ingestor, url=server.url, bearer_token="bench",
+                            config={"backfill_minutes": 1, "network_backoff": 0.05}).start()
+    while not server.connected_clients():
+        time.sleep(0.01)
+    posted_at = {}
+    start = time.perf_counter()
+    for i in range(tweets_streamed):
+        if i == tweets_streamed // 2:
+            server.drop_connections()  # Tweets posted while reconnecting must arrive through the resume
+        if i % 4 == 0:
+            tweet = server.post_mention()
+        else:
+            tweet = server.post_tweet(f"{TOPICS_TO_MONITOR[i % len(TOPICS_TO_MONITOR)]} breakthrough number {i}")
+        posted_at[tweet["id"]] = time.perf_counter()
+        time.sleep(1 / rate)
+    deadline = time.perf_counter() + 10
+    while len(stored_at) < tweets_streamed and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    stream.stop()
+    server.stop()
+    latencies = [stored_at[tweet_id] - posted for tweet_id, posted in posted_at.items() if tweet_id in stored_at]
+    return _result("stream_ingest", len(latencies), elapsed, latencies, db_path, latency_unit="posted to stored",
+                   missed=tweets_streamed - len(latencies), reconnects=stream.connections - 1,
+                   polling_p50_s=SCHEDULER_CONFIG["mentions"]["interval"] / 2)
+
+
+def bench_llm_stream(db_path: str, twitter: FakeTwitterClient, generations: int = 40, **_) -> Dict:
+    """
+    Generate quote comments with long answers (some SKIP) at 5ms per token, blocking and then
+    streamed with early cutoff; latency is the streamed time to a usable reply
+    """
+    from src.bots import llm_utils
+    from src.bots.caches import LLM_CACHE
+    from src.bots.config import LLM_CONFIG
+    use_database(db_path)
+    runs = {}
+    for stream in (False, True):
+        openai_client = FakeOpenAI(seed=5, reply_words=80, token_latency=0.005, skip_rate=0.2)
+        llm_utils.set_openai_client(openai_client)
+        LLM_CACHE.clear()
+        LLM_CONFIG["stream"] = stream
+        latencies = []
+        start = time.perf_counter()
+        for i in range(generations):
+            t0 = time.perf_counter()
+            llm_utils.generate_quote_tweet_comment("AI", [], f"Benchmark tweet {i} about inference breakthroughs")
+            latencies.append(time.perf_counter() - t0)
+        runs[stream] = (time.perf_counter() - start, latencies, sum(r["completion_tokens"] for r in openai_client.requests))
+    LLM_CONFIG["stream"] = True
+    (blocking_s, blocking, blocking_tokens), (elapsed, latencies, tokens) = runs[False], runs[True]
+    return _result("llm_stream", generations, elapsed, latencies, db_path, latency_unit="request to usable reply",
+                   blocking_p50_ms=round(percentile(blocking, 50) * 1000, 2),
+                   completion_tokens=tokens, blocking_completion_tokens=blocking_tokens)
+
+
+# Must stay out of `import src.bots.glitch_bot_main` (printdb and pipeline workers start from it)
+STARTUP_HEAVY_MODULES = ("game_sdk", "twitter_plugin_gamesdk", "openai", "http.server", "src.bots.glitch_bot_agent")
+
+
+def _import_times(stderr: str) -> Dict[str, int]:
+    """Cumulative microseconds per module from `python -X importtime` output"""
+    times = {}
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def bench_startup(db_path: str, twitter: FakeTwitterClient, startup_runs: int = 5, **_) -> Dict:
+    """
+    Cold starts in fresh interpreters: `python -X importtime` of glitch_bot_main (which must not
+    load STARTUP_HEAVY_MODULES), then `printdb` on a new DB file and with its schema current;
+    latency is the printdb wall time once the schema exists
+    """
+    from src.bots.glitch_bot_db import TwitterAgentDB
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    workdir = os.path.dirname(db_path)
+
+    def python(*args):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, *args], cwd=workdir, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} failed: {proc.stderr[-2000:]}")
+        return time.perf_counter() - start, proc
+
+    import_ms, eager = [], set()
+    for _ in range(startup_runs):
+        _, proc = python("-X", "importtime", "-c", "import src.bots.glitch_bot_main")
+        times = _import_times(proc.stderr)
+        import_ms.append(times["src.bots.glitch_bot_main"] / 1000)
+        eager.update(m for m in STARTUP_HEAVY_MODULES if any(n == m or n.startswith(m + ".") for n in times))
+    accounts_file = os.path.join(workdir, "startup_accounts.json")
+    with open(accounts_file, "w", encoding="utf-8") as f:
+        json.dump([{"name": "default", "db_path": db_path}], f)
+    printdb = ("-m", "src.bots.glitch_bot_main", "printdb", "--accounts", accounts_file, "--log-level", "WARNING")
+    first, _ = python(*printdb)
+    latencies = [python(*printdb)[0] for _ in range(startup_runs)]
+    # In-process schema setup: a new file runs every CREATE and migration, a current one reads user_version
+    scratch = os.path.join(workdir, "startup_schema.db")
+    schema_ms = {}
+    for state in ("new", "current"):
+        start = time.perf_counter()
+        TwitterAgentDB(scratch)
+        schema_ms[state] = round((time.perf_counter() - start) * 1000, 2)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(scratch + suffix):
+            os.remove(scratch + suffix)
+    return _result("startup", len(latencies), sum(latencies), latencies, db_path, latency_unit="printdb wall time",
+                   import_ms=round(percentile(import_ms, 50), 2), eager_heavy_imports=sorted(eager),
+                   printdb_new_db_ms=round(first * 1000, 2), schema_init_ms=schema_ms)
+
+
+def bench_analysis(db_path: str, twitter: FakeTwitterClient, analysis_rows: int = 100000, **_) -> Dict:
+    """Drain a backlog of analysis_rows unprocessed tweets, one chunk (and at most one batched LLM call) per run"""
+    from src.bots.analysis import ContentAnalyzer
+    agent = use_database(db_path)
+    _seed_monitored_content(db_path, analysis_rows, twitter)
+    analyzer = ContentAnalyzer(agent.current_account().db)
+    latencies, analysed, llm_rows = [], 0, 0
+    start = time.perf_counter()
+    while True:
+        t0 = time.perf_counter()
+        stats = analyzer.run(max_seconds=0, llm_calls=1)
+        if not stats["chunks"]:
+            break
+        latencies.append(time.perf_counter() - t0)
+        analysed += stats["rows"]
+        llm_rows += stats["llm_rows"]
+    elapsed = time.perf_counter() - start
+    return _result("analysis", analysed, elapsed, latencies, db_path, latency_unit=f"chunk ({analyzer.config['chunk_size']} rows)",
+                   llm_rows=llm_rows, pending=analyzer.pending())
+
+
+SCENARIOS = {
+    "ingest": bench_ingest,
+    "reply_burst": bench_reply_burst,
+    "rank_and_post": bench_rank_and_post,
+    "job_workers": bench_job_workers,
+    "stream_ingest": bench_stream_ingest,
+    "llm_stream": bench_llm_stream,
+    "startup": bench_startup,
+    "analysis": bench_analysis,
+}
+
+
+def run(scenarios: List[str], twitter_kwargs: Dict = None, openai_kwargs: Dict = None, workdir: str = None, **sizes) -> List[Dict]:
+    results = []
+    workdir = workdir or tempfile.mkdtemp(prefix="glitchbot-bench-")
+    for name in scenarios:
+        twitter = FakeTwitterClient(seed=1, **(twitter_kwargs or {}))
+        openai_client = FakeOpenAI(seed=2, **(openai_kwargs or {}))
+        install_fakes(twitter, openai_client)
+        db_path = os.path.join(workdir, f"{name}.db")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        result = SCENARIOS[name](db_path, twitter, **sizes)
+        if openai_client.requests:
+            result["llm_prompt_tokens_avg"] = round(
+                sum(r["prompt_tokens"] for r in openai_client.requests) / len(openai_client.requests), 1)
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.bots.benchmarks", description="Offline Glitch Bot benchmarks")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--tweets", type=int, default=5000, help="ingest: tweets to ingest")
+    parser.add_argument("--mentions", type=int, default=100, help="reply_burst: mentions in the burst")
+    parser.add_argument("--db-rows", type=int, default=1000000, help="rank_and_post: monitored_content rows")
+    parser.add_argument("--posts", type=int, default=50, help="rank_and_post: posts to prepare")
+    parser.add_argument("--jobs", type=int, default=400, help="job_workers: hydrate jobs (10 tweets each)")
+    parser.add_argument("--workers", default="1,2,4", help="job_workers: worker process counts to compare")
+    parser.add_argument("--stream-tweets", type=int, default=200, help="stream_ingest: tweets posted to the fake stream")
+    parser.add_argument("--generations", type=int, default=40, help="llm_stream: quote comments to generate per mode")
+    parser.add_argument("--startup-runs", type=int, default=5, help="startup: fresh interpreters per measurement")
+    parser.add_argument("--analysis-rows", type=int, default=100000, help="analysis: unprocessed tweets to drain")
+    parser.add_argument("--twitter-latency-ms", type=float, default=0.0)
+    parser.add_argument("--openai-latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of fake API calls that fail")
+    parser.add_argument("--workdir", default=None, help="Where scratch databases are written")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    results = run(
+        args.scenarios or list(SCENARIOS),
+        twitter_kwargs={"latency": args.twitter_latency_ms / 1000, "error_rate": args.error_rate},
+        openai_kwargs={"latency": args.openai_latency_ms / 1000, "error_rate": args.error_rate},
+        workdir=args.workdir,
+        tweets=args.tweets, mentions=args.mentions, db_rows=args.db_rows, posts=args.posts,
+        jobs=args.jobs, workers=args.workers, tweets_streamed=args.stream_tweets,
+        generations=args.generations, startup_runs=args.startup_runs, analysis_rows=args.analysis_rows,
+    )
+    for result in results:
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{result['scenario']:<14} {result['ops']:>8} ops  {result['ops_per_sec'] or 0:>10.1f} ops/s  "
+                  f"p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  db {result['db_bytes'] / 1e6:.1f} MB")
+            if "llm_prompt_tokens_avg" in result:
+                print("".ljust(14), f"LLM prompts: {result['llm_prompt_tokens_avg']} tokens on average")
+            if "blocking_completion_tokens" in result:
+                print("".ljust(14), f"blocking: p50 {result['blocking_p50_ms']} ms, {result['blocking_completion_tokens']} "
+                                    f"completion tokens; streamed: {result['completion_tokens']}")
+            if "import_ms" in result:
+                print("".ljust(14), f"import glitch_bot_main: {result['import_ms']} ms; printdb on a new DB: "
+                                    f"{result['printdb_new_db_ms']} ms; schema setup {result['schema_init_ms']} ms")
+                if result["eager_heavy_imports"]:
+                    print("".ljust(14), f"WARNING: imported eagerly: {', '.join(result['eager_heavy_imports'])}")
+            if "llm_rows" in result:
+                print("".ljust(14), f"{result['llm_rows']} rows analysed by the LLM; {result['pending']} left pending")
+            if "jobs_per_sec_by_workers" in result:
+                print("".ljust(14), "  ".join(f"{n} worker(s): {rate} jobs/s" for n, rate in result["jobs_per_sec_by_workers"].items()))
+
+
+if __name__ == "__main__":
+    main()
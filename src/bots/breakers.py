@@ -0,0 +1,306 @@
+"""
+Glitch Bot Circuit Breakers (one per upstream endpoint: twitter.get_users, openai gpt-4, game.agent_step...)
+
+Every Twitter client method, LLM completion and GAME agent step goes through BREAKERS.call(),
+which keeps a breaker per (upstream, endpoint):
+
+    closed    -> calls go through; failures are counted over a sliding window_seconds window
+    open      -> calls fail at once with CircuitOpen (no request, no timeout to wait for)
+    half_open -> after the open period, half_open_probes calls test the upstream: a success
+                 closes the circuit, a failure opens it again for twice as long (up to
+                 max_open_seconds)
+
+A circuit opens when at least min_calls calls in the window failed at failure_rate or more, and
+at once on a rate limit (until the limit's reset, or rate_limit_open_seconds). Errors are
+classified once here (classify_error) and re-raised typed: RateLimited or Unavailable, with the
+original message and exception kept. Client errors (bad request, duplicate content, not found)
+are the caller's problem, not the upstream's; they pass through unchanged and count as healthy.
+
+status() feeds /status on the metrics server and the agent state; glitchbot_circuit_state is
+the same as a gauge (0 closed, 1 half open, 2 open).
+"""
+import functools
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from src.bots.config import BREAKER_CONFIG
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY, register_status
+
+log = get_logger("breakers")
+
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class UpstreamError(Exception):
+    """A call to upstream/endpoint failed because of the upstream; kind says how"""
+    kind = "error"
+
+    def __init__(self, upstream: str, endpoint: str, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.upstream = upstream
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class RateLimited(UpstreamError):
+    """HTTP 429 / the SDK's rate limit error"""
+    kind = "rate_limited"
+
+
+class Unavailable(UpstreamError):
+    """5xx, timeouts and connection failures"""
+    kind = "unavailable"
+
+
+class CircuitOpen(UpstreamError):
+    """Not attempted: the endpoint's circuit is open; retry_after is when it lets a probe through"""
+    kind = "circuit_open"
+
+
+_STATUS_IN_MESSAGE = re.compile(r"\b(429|50[0-4])\b")
+_UNAVAILABLE_NAMES = ("Timeout", "APIConnection", "ConnectionError", "ServiceUnavailable", "InternalServerError")
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    for holder in (exc, getattr(exc, "response", None)):
+        for attr in ("status_code", "status", "code"):
+            value = getattr(holder, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+
+def classify_error(exc: BaseException) -> Optional[str]:
+    """"rate_limited", "unavailable", or None for errors that say nothing about the upstream's health"""
+    if isinstance(exc, UpstreamError):
+        return exc.kind
+    status = _status_code(exc)
+    if status is None:
+        # The Twitter plugin raises plain exceptions carrying the HTTP status in the message
+        match = _STATUS_IN_MESSAGE.search(str(exc))
+        status = int(match.group(1)) if match else None
+    name = type(exc).__name__
+    if status == 429 or "RateLimit" in name or "Too Many Requests" in str(exc):
+        return "rate_limited"
+    if (status is not None and status >= 500) or any(part in name for part in _UNAVAILABLE_NAMES) \
+            or isinstance(exc, (TimeoutError, ConnectionError)):
+        return "unavailable"
+    return None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds until a rate limit resets, from the response headers when the SDK exposes them"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+        if headers.get("x-rate-limit-reset"):
+            return max(float(headers["x-rate-limit-reset"]) - time.time(), 1.0)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class CircuitBreaker:
+    def __init__(self, upstream: str, endpoint: str, config: Dict = None, clock: Callable[[], float] = time.monotonic):
+        self.upstream = upstream
+        self.endpoint = endpoint
+        self.config = dict(BREAKER_CONFIG, **(config or {}))
+        self.clock = clock
+        self.state = "closed"
+        self.open_until = 0.0
+        self.open_seconds = self.config["open_seconds"]
+        self.last_error = None
+        self.rejected = 0
+        self._calls = deque()  # (time, failed) inside the window
+        self._probes = 0
+        self._lock = threading.Lock()
+        self._labels = {"upstream": upstream, "endpoint": endpoint}
+        REGISTRY.gauge("glitchbot_circuit_state", self._labels,
+                       "Circuit breaker state per upstream endpoint (0 closed, 1 half open, 2 open)").set(0)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        log.warning("Circuit %s.%s %s -> %s%s", self.upstream, self.endpoint, self.state, state,
+                    f" for {self.open_until - self.clock():.0f}s ({self.last_error})" if state == "open" else "")
+        self.state = state
+        REGISTRY.gauge("glitchbot_circuit_state", self._labels).set(STATE_VALUES[state])
+        REGISTRY.counter("glitchbot_circuit_transitions_total", dict(self._labels, to=state),
+                         "Circuit breaker state changes").inc()
+
+    def _open(self, now: float, seconds: float):
+        self.open_until = now + seconds
+        self._probes = 0
+        self._calls.clear()
+        self._transition("open")
+
+    def before_call(self) -> bool:
+        """Raise CircuitOpen unless a call may go out now; True if it took a half-open probe slot"""
+        with self._lock:
+            now = self.clock()
+            if self.state == "open" and now >= self.open_until:
+                self._transition("half_open")
+            if self.state == "closed":
+                return False
+            if self.state == "half_open" and self._probes < self.config["half_open_probes"]:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            retry_after = max(self.open_until - now, 0.0)
+        REGISTRY.counter("glitchbot_circuit_rejected_total", self._labels, "Calls failed fast by an open circuit").inc()
+        raise CircuitOpen(self.upstream, self.endpoint,
+                          f"{self.upstream}.{self.endpoint} circuit {self.state} ({self.last_error})", retry_after)
+
+    def release_probe(self):
+        """Hand back a probe slot whose call ended without an outcome to record"""
+        with self._lock:
+            if self.state == "half_open" and self._probes > 0:
+                self._probes -= 1
+
+    def record(self, kind: Optional[str], error: BaseException = None):
+        """The outcome of a call let through by before_call: kind None for success / client errors"""
+        with self._lock:
+            now = self.clock()
+            if kind is not None:
+                self.last_error = f"{kind}: {error}" if error is not None else kind
+            if self.state == "half_open":
+                if kind is None:
+                    self.open_seconds = self.config["open_seconds"]
+                    self._calls.clear()
+                    self._transition("closed")
+                else:
+                    self.open_seconds = min(self.open_seconds * 2, self.config["max_open_seconds"])
+                    self._open(now, self._rate_limit_seconds(error) if kind == "rate_limited" else self.open_seconds)
+                return
+            if self.state != "closed":
+                return  # A call from before the circuit opened
+            if kind == "rate_limited":
+                self._open(now, self._rate_limit_seconds(error))
+                return
+            self._calls.append((now, kind is not None))
+            cutoff = now - self.config["window_seconds"]
+            while self._calls and self._calls[0][0] < cutoff:
+                self._calls.popleft()
+            failures = sum(failed for _, failed in self._calls)
+            if len(self._calls) >= self.config["min_calls"] and failures >= self.config["failure_rate"] * len(self._calls):
+                self._open(now, self.open_seconds)
+
+    def _rate_limit_seconds(self, error: BaseException = None) -> float:
+        return (_retry_after(error) if error is not None else None) or self.config["rate_limit_open_seconds"]
+
+    def call(self, fn: Callable, *args, **kwargs):
+        probe = self.before_call()
+        recorded = False
+        try:
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                if kind is None or kind == "circuit_open":
+                    self.record(None)
+                    recorded = True
+                    raise
+                self.record(kind, e)
+                recorded = True
+                REGISTRY.counter("glitchbot_upstream_errors_total", dict(self._labels, kind=kind),
+                                 "Upstream failures by kind").inc()
+                if isinstance(e, UpstreamError):
+                    raise
+                error_class = RateLimited if kind == "rate_limited" else Unavailable
+                raise error_class(self.upstream, self.endpoint, str(e),
+                                  self._rate_limit_seconds(e) if kind == "rate_limited" else None) from e
+            self.record(None)
+            recorded = True
+            return result
+        finally:
+            # KeyboardInterrupt, SystemExit or a timeout kill skip record(); a kept probe slot would
+            # leave the circuit half open and rejecting every call
+            if probe and not recorded:
+                self.release_probe()
+
+    def status(self) -> Dict:
+        with self._lock:
+            failures = sum(failed for _, failed in self._calls)
+            return {
+                "upstream": self.upstream,
+                "endpoint": self.endpoint,
+                "state": self.state,
+                "failure_rate": round(failures / len(self._calls), 2) if self._calls else 0.0,
+                "calls_in_window": len(self._calls),
+                "open_for": round(max(self.open_until - self.clock(), 0.0), 1) if self.state == "open" else None,
+                "open_seconds": self.open_seconds,
+                "rejected": self.rejected,
+                "last_error": self.last_error,
+            }
+
+    def restore(self, state: Dict, elapsed: float = 0.0):
+        """Re-open a circuit that was open elapsed seconds ago (a status() dict) for what is left of its open period"""
+        left = (state.get("open_for") or 0.0) - elapsed
+        if state.get("state") != "open" or left <= 0:
+            return
+        with self._lock:
+            self.last_error = state.get("last_error")
+            self.open_seconds = state.get("open_seconds") or self.open_seconds
+            self._open(self.clock(), left)
+
+
+class BreakerRegistry:
+    """The process-wide breakers, created on first use of each (upstream, endpoint)"""
+
+    def __init__(self, config: Dict = None):
+        self.config = config
+        self._breakers: Dict[tuple, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, upstream: str, endpoint: str) -> CircuitBreaker:
+        breaker = self._breakers.get((upstream, endpoint))
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get((upstream, endpoint))
+                if breaker is None:
+                    breaker = self._breakers[(upstream, endpoint)] = CircuitBreaker(upstream, endpoint, self.config)
+        return breaker
+
+    def call(self, upstream: str, endpoint: str, fn: Callable, *args, **kwargs):
+        return self.get(upstream, endpoint).call(fn, *args, **kwargs)
+
+    def wrap(self, upstream: str, endpoint: str, fn: Callable) -> Callable:
+        breaker = self.get(upstream, endpoint)
+
+        @functools.wraps(fn)
+        def guarded(*args, **kwargs):
+            return breaker.call(fn, *args, **kwargs)
+        return guarded
+
+    def is_open(self, upstream: str, endpoint: str) -> bool:
+        """True while the circuit would reject a call (without taking a half-open probe slot)"""
+        breaker = self._breakers.get((upstream, endpoint))
+        return breaker is not None and breaker.state == "open" and breaker.clock() < breaker.open_until
+
+    def status(self) -> List[Dict]:
+        return [breaker.status() for _, breaker in sorted(self._breakers.items())]
+
+    def degraded(self) -> List[Dict]:
+        """The circuits that are not closed, for the agent state"""
+        return [s for s in self.status() if s["state"] != "closed"]
+
+    def dump(self) -> List[Dict]:
+        """The open circuits, for the warm-restart snapshot (see warm_restart.py)"""
+        return [s for s in self.status() if s["state"] == "open"]
+
+    def restore(self, states: List[Dict], elapsed: float = 0.0):
+        for state in states:
+            self.get(state["upstream"], state["endpoint"]).restore(state, elapsed)
+
+    def reset(self):
+        with self._lock:
+            self._breakers.clear()
+
+
+BREAKERS = BreakerRegistry()
+register_status("upstreams", BREAKERS.status)
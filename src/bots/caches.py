@@ -0,0 +1,107 @@
+"""
+Glitch Bot Shared Caches (user profiles, tweets, LLM completions)
+
+One instance of each cache per process, shared by every account the process runs; see accounts.py.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, List
+
+from src.bots.config import SHARED_CACHE_CONFIG
+from src.bots.metrics import REGISTRY
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ttl seconds after being stored"""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = REGISTRY.counter("glitchbot_cache_hits_total", {"cache": name}, "Shared cache hits")
+        self._misses = REGISTRY.counter("glitchbot_cache_misses_total", {"cache": name}, "Shared cache misses")
+
+    def get(self, key: Hashable, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(key)
+                    self._hits.inc()
+                    return entry[1]
+                del self._data[key]
+        self._misses.inc()
+        return default
+
+    def set(self, key: Hashable, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], object]):
+        """Cached value for key, calling loader() on a miss; falsy results are not cached"""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value:
+                self.set(key, value)
+        return value
+
+    def dump(self) -> List[list]:
+        """Live entries as [key, value, seconds left], least recently used first; values JSON can't hold are left out"""
+        now = time.monotonic()
+        with self._lock:
+            entries = [(key, value, expires - now) for key, (expires, value) in self._data.items() if expires > now]
+        dumped = []
+        for key, value, left in entries:
+            try:
+                json.dumps(value)
+            except (TypeError, ValueError):
+                continue
+            dumped.append([key, value, round(left, 1)])
+        return dumped
+
+    def load(self, entries: List[list], elapsed: float = 0.0) -> int:
+        """Put back dump() entries saved elapsed seconds ago (keys come back as tuples); returns how many were still live"""
+        now = time.monotonic()
+        loaded = 0
+        with self._lock:
+            for key, value, left in entries:
+                if left <= elapsed:
+                    continue
+                key = _as_key(key)
+                self._data[key] = (now + left - elapsed, value)
+                self._data.move_to_end(key)
+                loaded += 1
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return loaded
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _as_key(value):
+    """A request_key() that went through JSON: its tuples came back as lists"""
+    return tuple(_as_key(v) for v in value) if isinstance(value, list) else value
+
+
+USER_CACHE = TTLCache("user_profiles", **SHARED_CACHE_CONFIG["user_profiles"])
+TWEET_CACHE = TTLCache("tweets", **SHARED_CACHE_CONFIG["tweets"])
+LLM_CACHE = TTLCache("llm", **SHARED_CACHE_CONFIG["llm"])
+
+
+def request_key(*parts, **kwargs) -> tuple:
+    """Hashable key for an API call: positional parts plus sorted keyword arguments (lists become tuples)"""
+    return parts + tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items()))
@@ -18,6 +18,237 @@ POSTING_CONFIG = {
     "general_response_time": 30,     # Respond to others within 30 minutes
 }
 
+# Task cadences for the scheduler in glitch_bot_main (seconds). Lower priority runs first when
+# several tasks are due; tasks that find nothing back off by idle_backoff up to max_interval.
+SCHEDULER_CONFIG = {
+    "mentions": {"interval": 60, "min_interval": 30, "max_interval": 300, "idle_backoff": 1.5, "priority": 0, "jitter": 5},
+    "posting": {"interval": 3600 / POSTING_CONFIG["max_posts_per_hour"], "align": True, "deadline": 600, "priority": 1},
+    "outbox": {"interval": 60, "max_interval": 300, "idle_backoff": 1.5, "priority": 1},
+    "timeline": {"interval": 3600, "max_interval": 7200, "priority": 2, "jitter": 120},
+    "topic_search": {"interval": 1800, "max_interval": 7200, "idle_backoff": 2.0, "priority": 3, "jitter": 120},
+    "monitored_accounts": {"interval": 900, "max_interval": 3600, "idle_backoff": 1.5, "priority": 4, "jitter": 60},
+    "engagement": {"interval": 900, "priority": 6, "jitter": 60},
+    "follows": {"interval": 1800, "priority": 7, "jitter": 120},
+    "analysis": {"interval": 300, "max_interval": 1800, "idle_backoff": 2.0, "priority": 6},
+    "knowledge": {"interval": 600, "max_interval": 3600, "idle_backoff": 2.0, "priority": 7},
+    "cleanup": {"interval": 86400, "priority": 9, "jitter": 600},
+    "metrics_snapshot": {"interval": 300, "priority": 8},
+    "state_snapshot": {"interval": 60, "priority": 9},
+}
+
+# Warm restarts: the run command's snapshot of in-memory state (see warm_restart.py)
+SNAPSHOT_CONFIG = {
+    "path": os.environ.get("GLITCH_BOT_SNAPSHOT", "glitch_bot_state.snapshot.gz"),
+    "max_age": 6 * 3600,          # Older snapshots are ignored: the pacing and caches in them are stale
+    "caches": ["user_profiles", "tweets", "llm"],  # Shared caches saved with their remaining TTLs
+    "posting_history": 20,        # Recent posts kept with the posting pacing
+    "compress_level": 6,
+}
+
+# Metrics: Prometheus text endpoint (disabled unless a port is set) and agent_metrics snapshots
+METRICS_CONFIG = {
+    "http_host": os.environ.get("GLITCH_BOT_METRICS_HOST", "127.0.0.1"),
+    "http_port": int(os.environ.get("GLITCH_BOT_METRICS_PORT", "0")),
+}
+
+# Structured logging (see log_utils.py)
+LOGGING_CONFIG = {
+    "level": os.environ.get("GLITCH_BOT_LOG_LEVEL", "INFO"),
+    "format": os.environ.get("GLITCH_BOT_LOG_FORMAT", "json"),   # "json" lines or "text"
+    "file": os.environ.get("GLITCH_BOT_LOG_FILE"),                # None = stdout
+    # Full API responses / LLM outputs at DEBUG; large, so off unless explicitly enabled
+    "debug_payloads": os.environ.get("GLITCH_BOT_LOG_PAYLOADS", "0") == "1",
+    "queue_size": 10000,
+    # Fraction of sub-WARNING records kept per category (per-tweet ingest lines are the noisy ones)
+    "sample_rates": {
+        "agent.timeline": 0.1,
+        "agent.search": 0.1,
+    },
+}
+
+# Mention queue tuning
+MENTION_QUEUE_CONFIG = {
+    "visibility_timeout": 300,   # Seconds a leased mention stays invisible to other workers
+    "max_attempts": 5,           # Failed attempts before a mention is parked as 'dead'
+    "retry_delay": 60,           # Base delay (seconds) before a nacked mention becomes visible again
+    "cache_size": 50,            # Rows pulled into the in-memory heap per refill
+    "cache_ttl": 15,             # Seconds before the heap is refreshed from the DB
+    "max_workers": 4,            # Mentions replied to concurrently
+    "batch_size": 20,            # Mentions leased per drain
+    "reconcile_lookback": 20,    # Own recent tweets searched for a reply whose response was lost
+    "order_delay": 30,           # Seconds a mention waits while an earlier one in its conversation is unanswered
+}
+
+# Posting outbox (see outbox.py); slots are spaced by POSTING_CONFIG
+OUTBOX_CONFIG = {
+    "max_ready": 2,              # No new post is generated (no LLM call) while this many wait in the outbox
+    "max_draft_age": 6 * 3600,   # Unscheduled drafts older than this are expired rather than posted late
+    "publish_lease": 120,        # A publish that hasn't finished in this many seconds may be taken over
+    "max_attempts": 3,           # Failed publishes before a draft is parked as failed
+    "retry_delay": 300,          # Seconds before a failed publish is retried
+    "reconcile_lookback": 20,    # Own recent tweets searched for a post whose response was lost
+}
+
+# Engagement refresher for the bot's own posts (see engagement.py)
+ENGAGEMENT_CONFIG = {
+    "window_days": 7,            # Posts older than this are no longer re-read
+    # (post age up to N hours, seconds between reads): young posts change fastest
+    "tiers": [(6, 900), (48, 3 * 3600), (7 * 24, 12 * 3600)],
+    "batch_size": 100,           # Tweet ids per get_tweets call (the API maximum)
+    "max_calls_per_run": 2,      # get_tweets calls per run, however many posts are due
+    "keep_days": 30,             # Snapshots older than this are pruned by the cleanup task
+}
+
+# Follow decisions (see follows.py)
+FOLLOW_CONFIG = {
+    "scan_rows": 2000,           # Newest ingested tweets / queued mentions searched for new authors per run
+    "max_candidates": 200,       # Authors scored per run (profiles are fetched 100 per get_users call)
+    "redecide_days": 14,         # Authors not followed are reconsidered after this long
+    "max_follows_per_run": 5,
+    "max_follows_per_day": 50,
+    "max_attempts": 3,           # Failed follow attempts before a decision is parked as failed
+}
+
+# Batch analysis of ingested tweets (see analysis.py)
+ANALYSIS_CONFIG = {
+    "chunk_size": 500,           # Unprocessed rows analysed and written per transaction
+    "max_seconds": 20,           # A run starts no new chunk after this long; the rest waits for the next run
+    "llm_min_importance": 25,    # Rows scoring this high locally also get LLM sentiment and key points...
+    "llm_batch_size": 20,        # ...this many tweets per completion...
+    "llm_calls_per_run": 1,      # ...and this many completions per run at most, only from the hourly OpenAI budget
+                                 # left over after llm_utils.OPENAI_RESERVED_CALLS_PER_HOUR (kept for replies)
+    "llm_model": "gpt-4",
+    "max_key_points": 5,
+}
+
+# Knowledge base built from the analysed tweets (see knowledge.py)
+KNOWLEDGE_CONFIG = {
+    # Knowledge-base topic -> the monitored topics (and words in a tweet) that belong to it
+    "topics": {
+        "AI": ["ai", "artificial intelligence", "machine learning", "llm", "gpt", "agi"],
+        "crypto": ["crypto", "cryptocurrency", "bitcoin", "ethereum", "defi", "web3", "blockchain"],
+        "biotech": ["biotech", "biotechnology", "crispr", "gene therapy", "longevity", "bioinformatics"],
+    },
+    "batch_size": 1000,          # analysis_results rows merged per transaction
+    "max_batches_per_run": 20,
+    "evidence_scale": 100,       # One tweet's confidence in its concepts: importance / evidence_scale...
+    "max_evidence": 0.5,         # ...at most this; tweets agreeing add up (1 - product of (1 - confidence))
+    "max_confidence": 0.99,
+    "half_life_days": 7,         # Confidence halves after this long without new evidence...
+    "min_confidence": 0.05,      # ...and the concept is dropped once below this
+    "max_source_ids": 20,        # Newest supporting tweets kept per concept
+    "top_k": 10,                 # Concepts per topic in the in-process cache read by prompts and the agent state
+    "cache_ttl": 600,            # Seconds before a process re-reads a topic's concepts merged elsewhere
+}
+
+# Job queue for `glitch_bot_main worker` processes (see jobs.py / pipeline.py)
+JOB_QUEUE_CONFIG = {
+    "lease_seconds": 120,        # A claimed job is retried elsewhere if its worker stops heartbeating this long
+    "heartbeat_interval": 30,    # Seconds between lease renewals for running jobs
+    "max_attempts": 5,           # Attempts before a job is dead-lettered
+    "retry_delay": 30,           # Base retry backoff (doubles per attempt, plus jitter)
+    "max_retry_delay": 3600,
+    "concurrency": 4,            # Jobs run at once per worker process
+    "poll_interval": 1.0,        # Idle workers poll at this rate, backing off to max_poll_interval
+    "max_poll_interval": 15.0,
+    "keep_done_seconds": 86400,  # Completed jobs are purged after a day
+    "hydrate_batch": 100,        # Tweet ids per hydrate job (one get_tweets call)
+    "generate_score": 15,        # Scored tweets at or above this get a quote post generated
+    # How often fetch jobs are created for each source (seconds)
+    "fetch_intervals": {"mentions": 60, "home_timeline": 3600, "topic_search": 1800, "monitored_accounts": 900,
+                        "engagement": 900, "follows": 1800, "analysis": 300, "knowledge": 600},
+}
+
+# Filtered-stream ingestion (see streaming.py); replaces mention/topic polling while connected
+STREAM_CONFIG = {
+    "enabled": os.environ.get("GLITCH_BOT_STREAM", "0") == "1",
+    "url": os.environ.get("GLITCH_BOT_STREAM_URL", "https://api.twitter.com/2/tweets/search/stream"),
+    "bearer_token": os.environ.get("TWITTER_BEARER_TOKEN"),  # App-only token; filtered stream needs it
+    "stall_timeout": 90,         # Twitter sends a keep-alive every 20s; silence this long means a dead connection
+    "max_rule_length": 512,      # Topics are OR-packed into as few rules as fit this length
+    "backfill_minutes": 0,       # Ask the API to replay this many minutes after a reconnect (Pro access and above)
+    # Reconnect backoff, as recommended for the v2 streaming endpoints
+    "network_backoff": 0.25,     # TCP/IP errors: grow linearly by this much...
+    "max_network_backoff": 16,   # ...up to this
+    "http_backoff": 5,           # HTTP errors: start here and double...
+    "max_http_backoff": 320,     # ...up to this
+    "rate_limit_backoff": 60,    # HTTP 429: start here and double...
+    "max_rate_limit_backoff": 960,  # ...up to this (the 15-minute rate-limit window, plus a minute)
+    "tweet_fields": ["author_id", "conversation_id", "created_at", "public_metrics"],
+}
+
+# Shared Twitter API budgets (token buckets shared by every worker thread)
+TWITTER_RATE_LIMITS = {
+    "reads_per_window": 180,
+    "writes_per_window": 50,
+    "window_seconds": 900,       # 15-minute windows, like the Twitter API
+}
+
+# Circuit breakers per upstream endpoint (see breakers.py)
+BREAKER_CONFIG = {
+    "window_seconds": 120,       # Failure rate is measured over this sliding window...
+    "min_calls": 5,              # ...once it holds at least this many calls
+    "failure_rate": 0.5,         # Open the circuit at this share of failed calls
+    "open_seconds": 30,          # First open period; doubles after each failed half-open probe...
+    "max_open_seconds": 900,     # ...up to this
+    "rate_limit_open_seconds": 900,  # A 429 opens the circuit until the limit resets (header), or this long
+    "half_open_probes": 1,       # Calls let through to test an upstream that may have recovered
+}
+
+# Per-process caches shared by every account (see caches.py); ttl in seconds
+SHARED_CACHE_CONFIG = {
+    "user_profiles": {"maxsize": 5000, "ttl": 3600},
+    "tweets": {"maxsize": 10000, "ttl": 300},
+    "llm": {"maxsize": 1000, "ttl": 900},
+}
+
+# LLM calls (see llm_utils.py)
+LLM_CONFIG = {
+    # Stream completions and stop reading once the reply is tweet-length or starts with SKIP
+    "stream": os.environ.get("GLITCH_BOT_LLM_STREAM", "1") == "1",
+    # Only completions at or below this temperature (e.g. batch analysis) are served from the LLM cache;
+    # creative ones would post the same text from every account and repeat a rejected near-duplicate
+    "cache_max_temperature": 0.3,
+}
+
+# Pre-gate in front of the GPT-4 quote call (see quote_gate.py)
+QUOTE_GATE_CONFIG = {
+    "enabled": True,
+    "min_quality": 0,            # assess_content_quality score below this never reaches the LLM
+    "threshold": 0.25,           # Model's predicted chance of a usable post below which the call is skipped...
+    "explore_rate": 0.1,         # ...except for this share, so rejected kinds of tweet keep getting labelled
+    "min_samples": 50,           # Outcomes needed before the model is trained and used
+    "retrain_every": 25,         # New outcomes between retrainings
+    "max_samples": 5000,         # Most recent outcomes used for training
+    "epochs": 8,
+    "learning_rate": 0.1,
+    "l2": 0.0001,
+    "features": 4096,            # Hashed feature slots
+    # Cheaper model that drafts the comment first; a SKIP draft saves the GPT-4 call, otherwise GPT-4 refines it
+    "draft_model": os.environ.get("GLITCH_BOT_DRAFT_MODEL") or None,
+}
+
+# Prompt assembly (see prompts.py); budgets are prompt tokens per LLM call
+PROMPT_CONFIG = {
+    "budgets": {
+        "generate_thread_with_llm": 600,
+        "generate_reply_to_mention": 600,
+        "generate_quote_tweet_comment": 600,
+        "analyze_content_batch": 1500,
+    },
+    "content_share": 0.5,        # Share of the free budget the quoted/mention text may take before knowledge
+    "max_snippets": 5,           # Knowledge-base rows per prompt at most...
+    "snippet_tokens": 40,        # ...each cut to this many tokens
+    "analysis_item_tokens": 60,  # Each tweet in a batched analysis prompt is cut to this many tokens
+}
+
+# Multi-account mode: GLITCH_BOT_ACCOUNTS_FILE points at a JSON list of accounts, e.g.
+#   [{"name": "glitch", "owner_handle": "lemoncheli", "db_path": "glitch.db",
+#     "twitter_token_env": "GLITCH_TWITTER_TOKEN", "game_api_key_env": "GLITCH_GAME_API_KEY"}, ...]
+# Each account gets its own DB and rate-limit buckets. Without the file the bot runs the single
+# account configured by GAME_API_KEY / GAME_TWITTER_ACCESS_TOKEN / YOUR_TWITTER_HANDLE.
+ACCOUNTS_FILE = os.environ.get("GLITCH_BOT_ACCOUNTS_FILE")
+
 # Your Twitter handle
 YOUR_TWITTER_HANDLE = "lemoncheli"  # Your actual handle
 
@@ -34,6 +265,29 @@ ACCOUNTS_TO_MONITOR = [
     "VitalikButerin", "coinbase", "a16z", YOUR_TWITTER_HANDLE
 ]
 
+# Rotation through ACCOUNTS_TO_MONITOR (see account_rotation.py)
+ACCOUNT_POLL_CONFIG = {
+    "max_per_cycle": 5,          # Accounts read per cycle at most...
+    "read_reserve": 0.5,         # ...and only while the read bucket stays above this share (mentions come first)
+    "min_interval": 900,         # Seconds before the same account is read again
+    "max_results": 10,           # Tweets per get_users_tweets call (5-100)
+    "prior_yield": 0.2,          # Assumed signal yield for accounts not read yet
+    "yield_alpha": 0.3,          # Weight of the latest poll in the yield moving average
+    "min_yield": 0.05,           # Floor so low-yield accounts still come round
+    "unresolved_ttl": 86400,     # Seconds before a username get_users didn't find is looked up again
+}
+
+# Topic search planning (see search_planner.py)
+SEARCH_CONFIG = {
+    "max_query_length": 512,     # search_recent_tweets query limit
+    "max_topics_per_query": 8,   # Topics OR-packed into one query; smaller packs give finer yield tracking
+    "queries_per_cycle": 2,      # Searches per cycle (the old code searched the first two topics, one call each)
+    "max_results": 10,           # Tweets per search (10-100)
+    "prior_yield": 0.2,          # Assumed signal yield for queries not run yet
+    "yield_alpha": 0.3,          # Weight of the latest run in the yield moving average
+    "min_yield": 0.05,           # Floor so low-yield queries still come round
+}
+
 # Quality assessment criteria
 QUALITY_INDICATORS = {
     "high_quality": [
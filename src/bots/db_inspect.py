@@ -0,0 +1,302 @@
+"""
+Glitch Bot DB Inspector (read-only queries and exports; replaces print_db.py)
+
+    python -m src.bots.db_inspect recent                                   # latest rows of the main tables
+    python -m src.bots.db_inspect rows generated_threads --posted --since 7d
+    python -m src.bots.db_inspect rows monitored_content --topic AI --format jsonl > ai.jsonl
+    python -m src.bots.db_inspect rows jobs --format csv --order oldest --after 120000
+    python -m src.bots.db_inspect stats
+
+The file is opened with mode=ro and query_only, so it takes no write locks and never blocks the
+running bot (with WAL, readers and the writer don't wait for each other).
+
+Every page is a keyset query on rowid (`rowid < ?` / `rowid > ?`, LIMIT n): the next page starts
+where the last one ended, with no OFFSET and no sort step. Rows are written out as they are
+read, so large exports use constant memory. A time range on an append-only table is
+turned into a rowid range with a binary search over point lookups, because its timestamps grow
+with rowid. Other filters (topic, posted) are evaluated on the rows in that range. stats reads
+only rowid bounds and breakdowns that an index covers.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+DEFAULT_DB_PATH = "enhanced_glitch_bot_v2.db"  # accounts.DEFAULT_DB_PATH, without importing the bot
+RECENT_TABLES = ("monitored_content", "generated_threads", "mentions_responses", "priority_queue")
+PAGE_SIZE = 1000
+
+# Per table: its time column (UTC text timestamps, or epoch seconds with "epoch"), whether rows are
+# only appended so the time grows with rowid ("appended"), the topic column and the SQL that
+# means "posted". Tables not listed can still be paged and exported, just not filtered.
+TABLES = {
+    "monitored_content": {"time": "created_at", "appended": True, "topic": "topic"},
+    "analysis_results": {"time": "created_at", "appended": True, "topic": "topic"},
+    "generated_threads": {"time": "created_at", "appended": True, "topic": "topic", "posted": "status = 'posted'"},
+    "mentions_responses": {"time": "created_at", "appended": True, "posted": "response_tweet_id IS NOT NULL"},
+    "priority_queue": {"time": "created_at", "appended": True, "posted": "outcome = 'replied'"},
+    "knowledge_base": {"time": "last_updated", "topic": "topic"},
+    "agent_metrics": {"time": "recorded_at", "appended": True},
+    "jobs": {"time": "created_at", "epoch": True, "appended": True},
+    "quote_outcomes": {"time": "created_at", "appended": True, "topic": "topic"},
+    "gate_models": {"time": "trained_at", "appended": True},
+    "monitored_accounts": {"time": "last_polled_at", "epoch": True},
+    "search_queries": {"time": "last_run_at", "epoch": True},
+    "engagement_snapshots": {"time": "captured_at", "epoch": True, "appended": True},
+    "followed_accounts": {"time": "followed_at", "epoch": True, "appended": True},
+    "follow_decisions": {"time": "decided_at", "epoch": True},
+}
+
+# Breakdowns an index covers (named alongside), so stats never scans a table for them
+INDEXED_STATS = {
+    "generated_threads": ("status",),  # idx_generated_threads_outbox
+    "priority_queue": ("status",),     # idx_priority_queue_pop
+    "jobs": ("status", "kind"),        # idx_jobs_claim
+    "follow_decisions": ("decision",),  # idx_follow_decisions_pending
+}
+
+_RELATIVE = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+_UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def connect_readonly(db_path: str) -> sqlite3.Connection:
+    """A connection that cannot write to db_path (and fails instead of creating a missing file)"""
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Database file '{db_path}' not found")
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, timeout=5)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = 1")
+    return conn
+
+
+def list_tables(conn: sqlite3.Connection) -> List[str]:
+    return [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+
+
+def parse_time(value: str, now: float = None) -> float:
+    """Epoch seconds from "90m" / "24h" / "7d" (ago), epoch seconds, or an ISO date/datetime (UTC unless it has an offset)"""
+    match = _RELATIVE.match(value.strip())
+    if match:
+        return (now or time.time()) - float(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.strip())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _column_value(spec: Dict, epoch: float):
+    """epoch in the table's own time format, so comparisons stay in SQL (and use plain string order)"""
+    if spec.get("epoch"):
+        return epoch
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _rowid_bound(conn: sqlite3.Connection, table: str, column: str, value, lo: int, hi: int) -> int:
+    """
+    Smallest rowid in [lo, hi] whose column is >= value (hi + 1 if none), for a column that grows
+    with rowid; about log2(hi - lo) primary-key lookups
+    """
+    hi += 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        row = conn.execute(f"SELECT rowid, {column} FROM {table} WHERE rowid >= ? ORDER BY rowid LIMIT 1", (mid,)).fetchone()
+        if row is None:
+            hi = mid
+        elif row[1] is not None and row[1] >= value:
+            hi = mid
+        else:
+            lo = row[0] + 1
+    return lo
+
+
+def build_query(conn: sqlite3.Connection, table: str, since: float = None, until: float = None, topic: str = None,
+                posted: Optional[bool] = None) -> Tuple[List[str], List]:
+    """WHERE clauses and parameters for the filters, with time ranges narrowed to rowid ranges where possible"""
+    if table not in list_tables(conn):
+        raise ValueError(f"No table named {table}")
+    spec = TABLES.get(table, {})
+    clauses, params = [], []
+    if since is not None or until is not None:
+        if not spec.get("time"):
+            raise ValueError(f"{table} has no time column to filter on")
+        column = spec["time"]
+        bounds = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+        for value, op in ((since, ">="), (until, "<")):
+            if value is None:
+                continue
+            value = _column_value(spec, value)
+            clauses.append(f"{column} {op} ?")
+            params.append(value)
+            if spec.get("appended") and bounds[0] is not None:
+                clauses.append(f"rowid {op} ?")
+                params.append(_rowid_bound(conn, table, column, value, *bounds))
+    if topic is not None:
+        if not spec.get("topic"):
+            raise ValueError(f"{table} has no topic column")
+        clauses.append(f"{spec['topic']} = ?")
+        params.append(topic)
+    if posted is not None:
+        if not spec.get("posted"):
+            raise ValueError(f"{table} has no posted status")
+        clauses.append(spec["posted"] if posted else f"COALESCE({spec['posted']}, 0) = 0")
+    return clauses, params
+
+
+def iter_rows(conn: sqlite3.Connection, table: str, clauses: List[str] = (), params: List = (), newest_first: bool = True,
+              after: int = None, limit: int = None, page_size: int = PAGE_SIZE) -> Iterator[Tuple[int, Dict]]:
+    """(rowid, row) pairs in rowid order, fetched a keyset page at a time"""
+    op, order = ("<", "DESC") if newest_first else (">", "ASC")
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page = page_size if remaining is None else min(page_size, remaining)
+        where = list(clauses) + ([f"rowid {op} ?"] if after is not None else [])
+        sql = f"SELECT rowid AS _cursor, * FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = conn.execute(f"{sql} ORDER BY rowid {order} LIMIT ?",
+                            list(params) + ([after] if after is not None else []) + [page]).fetchall()
+        for row in rows:
+            record = dict(row)
+            after = record.pop("_cursor")
+            yield after, record
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < page:
+            return
+
+
+def _cell(value, width: int = 60) -> str:
+    text = "" if value is None else str(value).replace("\n", "\\n")
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+def write_rows(rows: Iterator[Tuple[int, Dict]], fmt: str, out, columns: List[str] = None) -> Tuple[int, Optional[int]]:
+    """Stream rows to out as table / jsonl / csv; returns (rows written, last rowid)"""
+    count, last, writer = 0, None, None
+    for last, row in rows:
+        if columns:
+            row = {name: row.get(name) for name in columns}
+        if fmt == "jsonl":
+            out.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+        elif fmt == "csv":
+            if writer is None:
+                writer = csv.DictWriter(out, fieldnames=list(row))
+                writer.writeheader()
+            writer.writerow(row)
+        else:
+            if count == 0:
+                out.write("\t".join(row) + "\n")
+            out.write("\t".join(_cell(value) for value in row.values()) + "\n")
+        count += 1
+    return count, last
+
+
+def table_stats(conn: sqlite3.Connection, table: str, exact: bool = False) -> Dict:
+    """rowid span, first/last time from the rows at the span's ends, index-covered breakdowns"""
+    spec = TABLES.get(table, {})
+    lo, hi = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+    stats = {"table": table, "rowids": [lo, hi]}
+    if exact:
+        stats["rows"] = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    if spec.get("appended") and lo is not None:
+        column = spec["time"]
+        stats["oldest"], stats["newest"] = (
+            conn.execute(f"SELECT {column} FROM {table} WHERE rowid = ?", (rowid,)).fetchone()[0] for rowid in (lo, hi))
+    for column in INDEXED_STATS.get(table, ()):
+        try:
+            stats[f"by_{column}"] = dict(conn.execute(
+                f"SELECT {column}, COUNT(*) FROM {table} GROUP BY {column}").fetchall())
+        except sqlite3.OperationalError:
+            pass  # A file from before the column existed
+    return stats
+
+
+def print_recent(db_path: str, limit: int = 10, out=None):
+    """The latest rows of RECENT_TABLES (what print_db.py used to show)"""
+    out = out or sys.stdout
+    with closing(connect_readonly(db_path)) as conn:
+        existing = set(list_tables(conn))
+        for table in RECENT_TABLES:
+            out.write(f"\n===== {table} =====\n")
+            if table not in existing:
+                out.write("(table not found)\n")
+                continue
+            if write_rows(iter_rows(conn, table, limit=limit), "table", out)[0] == 0:
+                out.write("(no rows)\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.bots.db_inspect", description="Inspect a Glitch Bot DB (read-only)")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"Database file (default: {DEFAULT_DB_PATH})")
+    commands = parser.add_subparsers(dest="command")
+    recent = commands.add_parser("recent", help="Latest rows of the main tables (default command)")
+    recent.add_argument("--limit", type=int, default=10)
+    rows = commands.add_parser("rows", help="Rows of one table, filtered and paged")
+    rows.add_argument("table")
+    rows.add_argument("--since", help="Rows at or after: 24h, 7d, epoch seconds or an ISO date (UTC)")
+    rows.add_argument("--until", help="Rows before (same formats as --since)")
+    rows.add_argument("--topic")
+    posted = rows.add_mutually_exclusive_group()
+    posted.add_argument("--posted", dest="posted", action="store_true", default=None)
+    posted.add_argument("--unposted", dest="posted", action="store_false")
+    rows.add_argument("--columns", help="Comma-separated columns to output (default: all)")
+    rows.add_argument("--format", choices=["table", "jsonl", "csv"], default="table")
+    rows.add_argument("--order", choices=["newest", "oldest"], default="newest")
+    rows.add_argument("--after", type=int, help="Continue after this rowid (printed at the end of a page)")
+    rows.add_argument("--limit", type=int, default=None,
+                      help="Rows to output, 0 for all (default: 20 for table, all for jsonl/csv)")
+    stats = commands.add_parser("stats", help="Per-table rowid span, time range and indexed breakdowns")
+    stats.add_argument("--exact", action="store_true", help="Also COUNT(*) each table (scans it)")
+    commands.add_parser("tables", help="List the tables")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        if args.command in (None, "recent"):
+            print_recent(args.db, getattr(args, "limit", 10))
+            return
+        with closing(connect_readonly(args.db)) as conn:
+            if args.command == "tables":
+                print("\n".join(list_tables(conn)))
+            elif args.command == "stats":
+                for table in list_tables(conn):
+                    print(json.dumps(table_stats(conn, table, args.exact), default=str))
+            else:
+                now = time.time()
+                clauses, params = build_query(
+                    conn, args.table,
+                    since=parse_time(args.since, now) if args.since else None,
+                    until=parse_time(args.until, now) if args.until else None,
+                    topic=args.topic, posted=args.posted,
+                )
+                limit = args.limit if args.limit is not None else (20 if args.format == "table" else 0)
+                columns = [c.strip() for c in args.columns.split(",")] if args.columns else None
+                written, last = write_rows(
+                    iter_rows(conn, args.table, clauses, params, args.order == "newest", args.after, limit or None),
+                    args.format, sys.stdout, columns)
+                if limit and written == limit:
+                    print(f"# next page: --after {last}", file=sys.stderr)
+    except (FileNotFoundError, ValueError, sqlite3.Error) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except BrokenPipeError:
+        sys.stderr.close()  # Piped into head; not an error
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Glitch Bot Engagement Refresher (public_metrics time series for the bot's own posts)
+
+Every post from the last window_days (published threads and mention replies) is re-read with
+get_tweets, batch_size ids per call. How often depends on its age (ENGAGEMENT_CONFIG["tiers"]):
+a post from the last few hours is re-read every 15 minutes while its numbers still move, one
+from two days ago a couple of times a day. A run takes the most overdue posts first and makes at
+most max_calls_per_run calls, so tracking costs a fixed number of reads per run no matter how
+much the bot has posted.
+
+Each read becomes one engagement_snapshots row of plain integers. The latest numbers are also
+written back to the post's own row (generated_threads / mentions_responses.engagement_metrics),
+and summary() is what the agent state shows as engagement_tracking.
+"""
+import json
+import time
+from typing import Dict, List, Optional
+
+from src.bots.config import ENGAGEMENT_CONFIG
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY
+
+log = get_logger("engagement")
+
+# Where each kind of post lives: table, tweet id column and the SQL for its posting time (epoch seconds)
+SOURCES = {
+    "thread": ("generated_threads", "tweet_id", "posted_at", "status = 'posted'"),
+    "reply": ("mentions_responses", "response_tweet_id", "CAST(strftime('%s', created_at) AS REAL)",
+              "response_tweet_id IS NOT NULL"),
+}
+
+SNAPSHOT_FIELDS = (("likes", "like_count"), ("retweets", "retweet_count"), ("replies", "reply_count"),
+                   ("quotes", "quote_count"), ("impressions", "impression_count"))
+
+
+class EngagementRefresher:
+    def __init__(self, db, config: Dict = None):
+        self.db = db
+        self.config = dict(ENGAGEMENT_CONFIG, **(config or {}))
+
+    def refresh_interval(self, age: float) -> Optional[float]:
+        """Seconds between refreshes for a post age seconds old; None once it has left the window"""
+        for max_age_hours, interval in self.config["tiers"]:
+            if age < max_age_hours * 3600:
+                return interval
+        return None
+
+    def tracked(self, now: float = None) -> List[Dict]:
+        """Posts inside the window: kind, row id, tweet_id, posted_at, refreshed_at and the latest metrics"""
+        now = now or time.time()
+        cutoff = now - self.config["window_days"] * 86400
+        rows = []
+        with self.db.get_connection() as conn:
+            for kind, (table, id_column, posted_sql, posted_where) in SOURCES.items():
+                rows.extend(dict(row, kind=kind) for row in conn.execute(f"""
+                    SELECT * FROM (
+                        SELECT id, {id_column} AS tweet_id, {posted_sql} AS posted_at,
+                               metrics_refreshed_at AS refreshed_at, engagement_metrics
+                        FROM {table} WHERE {posted_where}
+                    ) WHERE posted_at >= ?
+                """, (cutoff,)))
+        return rows
+
+    def due(self, now: float = None) -> List[Dict]:
+        """Tracked posts whose tier interval has passed since their last read, most overdue first"""
+        now = now or time.time()
+        due = []
+        for row in self.tracked(now):
+            interval = self.refresh_interval(now - row["posted_at"])
+            if interval is None:
+                continue
+            overdue = now - ((row["refreshed_at"] or row["posted_at"]) + interval)
+            if overdue >= 0:
+                due.append((overdue, row))
+        due.sort(key=lambda item: -item[0])
+        return [row for _, row in due]
+
+    def refresh(self, client, read_limiter=None, now: float = None) -> Dict:
+        """One run: hydrate up to max_calls_per_run batches of due posts and store their snapshots"""
+        now = now or time.time()
+        batch_size = self.config["batch_size"]
+        backlog = self.due(now)
+        due = backlog[:batch_size * self.config["max_calls_per_run"]]
+        calls = refreshed = missing = 0
+        for start in range(0, len(due), batch_size):
+            batch = due[start:start + batch_size]
+            if read_limiter is not None and not read_limiter.try_acquire():
+                log.info("Read budget exhausted; %d posts left for the next engagement run", len(due) - start)
+                break
+            response = client.get_tweets(ids=[row["tweet_id"] for row in batch], tweet_fields=["public_metrics"])
+            calls += 1
+            metrics = {t["id"]: t["public_metrics"] for t in response.get("data") or [] if t.get("public_metrics")}
+            self._store(batch, metrics, int(now))
+            refreshed += len(metrics)
+            missing += len(batch) - len(metrics)
+        REGISTRY.counter("glitchbot_engagement_refreshed_total", {"result": "refreshed"},
+                         "Own posts whose public_metrics were re-read").inc(refreshed)
+        if missing:
+            # Deleted or hidden posts; their refresh time still advances so they don't crowd the next run
+            REGISTRY.counter("glitchbot_engagement_refreshed_total", {"result": "missing"}).inc(missing)
+        REGISTRY.gauge("glitchbot_engagement_due", {}, "Own posts waiting for a metrics refresh").set(
+            len(backlog) - refreshed - missing)
+        return {"calls": calls, "refreshed": refreshed, "missing": missing, "due": len(due)}
+
+    def _store(self, batch: List[Dict], metrics: Dict[str, Dict], captured_at: int):
+        snapshots = [(row["tweet_id"], captured_at, *(metrics[row["tweet_id"]].get(key) for _, key in SNAPSHOT_FIELDS))
+                     for row in batch if row["tweet_id"] in metrics]
+        with self.db.get_connection() as conn:
+            conn.executemany(f"""
+                INSERT INTO engagement_snapshots (tweet_id, captured_at, {', '.join(name for name, _ in SNAPSHOT_FIELDS)})
+                VALUES ({', '.join('?' * (2 + len(SNAPSHOT_FIELDS)))})
+            """, snapshots)
+            for kind, (table, *_) in SOURCES.items():
+                rows = [row for row in batch if row["kind"] == kind]
+                conn.executemany(f"""
+                    UPDATE {table} SET engagement_metrics = COALESCE(?, engagement_metrics), metrics_refreshed_at = ?
+                    WHERE id = ?
+                """, [(json.dumps(metrics[row["tweet_id"]]) if row["tweet_id"] in metrics else None, captured_at, row["id"])
+                      for row in rows])
+            conn.commit()
+
+    def history(self, tweet_id: str) -> List[Dict]:
+        """A post's snapshots, oldest first"""
+        with self.db.get_connection() as conn:
+            return [dict(row) for row in conn.execute(
+                "SELECT * FROM engagement_snapshots WHERE tweet_id = ? ORDER BY captured_at", (tweet_id,))]
+
+    def summary(self, top: int = 3, now: float = None) -> Dict:
+        """engagement_tracking for the agent state: averages per kind and the best recent posts"""
+        by_kind, posts = {}, []
+        for row in self.tracked(now):
+            if not row["engagement_metrics"]:
+                continue
+            try:
+                metrics = json.loads(row["engagement_metrics"])
+            except (TypeError, ValueError):
+                continue
+            stats = by_kind.setdefault(row["kind"], {"posts": 0, "likes": 0, "retweets": 0, "replies": 0})
+            stats["posts"] += 1
+            for name, key in SNAPSHOT_FIELDS[:3]:
+                stats[name] += metrics.get(key) or 0
+            posts.append({"tweet_id": row["tweet_id"], "kind": row["kind"], "likes": metrics.get("like_count") or 0,
+                          "retweets": metrics.get("retweet_count") or 0})
+        for stats in by_kind.values():
+            for name in ("likes", "retweets", "replies"):
+                stats[f"avg_{name}"] = round(stats.pop(name) / stats["posts"], 1)
+        posts.sort(key=lambda p: -(p["likes"] + 2 * p["retweets"]))
+        return {"by_kind": by_kind, "top_posts": posts[:top]}
+
+    def prune(self, now: float = None) -> int:
+        """Delete snapshots older than keep_days"""
+        cutoff = (now or time.time()) - self.config["keep_days"] * 86400
+        with self.db.get_connection() as conn:
+            deleted = conn.execute("DELETE FROM engagement_snapshots WHERE captured_at < ?", (cutoff,)).rowcount
+            conn.commit()
+        return deleted
@@ -0,0 +1,595 @@
+"""
+Glitch Bot Fake Backends (in-process Twitter and OpenAI stand-ins for benchmarks and tests)
+"""
+import hashlib
+import itertools
+import json
+import queue
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from src.bots.config import QUALITY_INDICATORS, TOPICS_TO_MONITOR
+
+_WORDS = (
+    "model agents latency chain protocol genome token inference data compute "
+    "validator sequencing network signal layer rollup weights dataset protein"
+).split()
+
+
+_URL = re.compile(r"https?://\S+")
+_STATUS_URL = re.compile(r"https?://(?:www\.)?(?:x|twitter)\.com/\S*?status/(\d+)")
+
+
+class FakeBackendError(Exception):
+    """Raised by the fakes for injected failures; the message mimics the real APIs"""
+
+
+class _LatencyAndErrors:
+    """Shared latency/error injection: each call sleeps latency +/- jitter and fails with error_rate"""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _call(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+            roll = self.rng.random()
+            delay = self.latency + (self.rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.rate_limit_rate:
+            raise FakeBackendError(f"429 Too Many Requests ({endpoint})")
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise FakeBackendError(f"503 Service Unavailable ({endpoint})")
+
+
+class FakeTwitterClient(_LatencyAndErrors):
+    """
+    Mimics the dict-returning twitter_client from the GAME Twitter plugin.
+
+    Tweets are generated on demand with increasing ids; mentions can be queued with add_mentions()
+    so a test controls exactly what the bot sees.
+
+    Like the real API, create_tweet rejects text the bot has already posted, and the bot's own
+    get_users_tweets returns what it posted. lost_response_rate makes that share of create_tweet
+    calls post the tweet and then fail anyway, like a timeout after the server acted.
+    """
+
+    def __init__(self, bot_username: str = "glitchbot", lost_response_rate: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.lost_response_rate = lost_response_rate
+        self.bot_user = {"id": "1", "username": bot_username, "name": "Glitch Bot"}
+        self._ids = itertools.count(10 ** 15)
+        self.tweets: Dict[str, Dict] = {}
+        self.mentions: List[Dict] = []
+        self.users: Dict[str, Dict] = {}
+        self.posted: List[Dict] = []
+        self.followed: List[str] = []
+
+    def _user(self, username: str) -> Dict:
+        if username not in self.users:
+            uid = str(len(self.users) + 1000)
+            self.users[username] = {
+                "id": uid, "username": username, "name": username.title(),
+                "public_metrics": {"followers_count": self.rng.randint(10, 50000), "following_count": 100,
+                                   "tweet_count": 1000, "listed_count": 5},
+            }
+        return self.users[username]
+
+    def make_tweet(self, text: str = None, author: str = None, **fields) -> Dict:
+        tweet_id = str(next(self._ids))
+        author = author or f"user{self.rng.randint(1, 500)}"
+        if text is None:
+            words = self.rng.sample(_WORDS, 8) + [self.rng.choice(QUALITY_INDICATORS["high_quality"]),
+                                                    self.rng.choice(TOPICS_TO_MONITOR)]
+            text = " ".join(words).capitalize() + ". What does this unlock next?"
+        tweet = {
+            "id": tweet_id,
+            "text": text,
+            "author_id": self._user(author)["id"],
+            "conversation_id": fields.pop("conversation_id", None) or tweet_id,
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+            "public_metrics": {"like_count": self.rng.randint(0, 500), "retweet_count": self.rng.randint(0, 100),
+                               "reply_count": self.rng.randint(0, 50), "quote_count": self.rng.randint(0, 20)},
+        }
+        tweet.update(fields)
+        self.tweets[tweet_id] = tweet
+        return tweet
+
+    def add_mentions(self, count: int, author: str = None, conversation_id: str = None) -> List[Dict]:
+        added = []
+        for _ in range(count):
+            who = author or f"fan{self.rng.randint(1, 200)}"
+            added.append(self.make_tweet(text=f"@{self.bot_user['username']} thoughts on this {self.rng.choice(_WORDS)}?",
+                                         author=who, conversation_id=conversation_id))
+        self.mentions.extend(added)
+        return added
+
+    def _page(self, tweets: List[Dict]) -> Dict:
+        by_id = {u["id"]: u for u in self.users.values()}
+        users = {t["author_id"]: by_id[t["author_id"]] for t in tweets if t["author_id"] in by_id}
+        return {"data": tweets, "includes": {"users": list(users.values())}, "meta": {"result_count": len(tweets)}}
+
+    # --- Twitter API surface used by the bot ---
+
+    def get_me(self, **kwargs):
+        self._call("get_me")
+        return {"data": dict(self.bot_user)}
+
+    def get_user(self, username: str = None, id: str = None, **kwargs):
+        self._call("get_user")
+        if username:
+            return {"data": dict(self._user(username))}
+        user = next((u for u in self.users.values() if u["id"] == id), None)
+        return {"data": dict(user)} if user else {"errors": [{"detail": "Not Found"}]}
+
+    def get_users(self, ids: List[str] = None, usernames: List[str] = None, **kwargs):
+        self._call("get_users")
+        if usernames:
+            return {"data": [dict(self._user(u)) for u in usernames]}
+        wanted = set(ids or [])
+        return {"data": [dict(u) for u in self.users.values() if u["id"] in wanted]}
+
+    def get_users_mentions(self, id: str = None, max_results: int = 10, since_id: str = None, **kwargs):
+        self._call("get_users_mentions")
+        mentions = [m for m in self.mentions if not since_id or int(m["id"]) > int(since_id)]
+        return self._page(list(reversed(mentions))[:max_results])
+
+    def get_home_timeline(self, max_results: int = 25, **kwargs):
+        self._call("get_home_timeline")
+        return self._page([self.make_tweet() for _ in range(max_results)])
+
+    def get_users_tweets(self, id: str = None, max_results: int = 10, since_id: str = None, **kwargs):
+        self._call("get_users_tweets")
+        if id == self.bot_user["id"]:
+            with self._lock:
+                own = [t for t in reversed(self.posted) if not since_id or int(t["id"]) > int(since_id)]
+            return self._page(own[:max_results])
+        author = next((u["username"] for u in self.users.values() if u["id"] == id), None)
+        return self._page([self.make_tweet(author=author) for _ in range(max_results)])
+
+    def search_recent_tweets(self, query: str = "", max_results: int = 10, since_id: str = None, **kwargs):
+        self._call("search_recent_tweets")
+        return self._page([self.make_tweet() for _ in range(max_results)])
+
+    def get_tweet(self, id: str, **kwargs):
+        self._call("get_tweet")
+        tweet = self.tweets.get(str(id))
+        return {"data": dict(tweet)} if tweet else {"errors": [{"detail": "Not Found"}]}
+
+    def get_tweets(self, ids: List[str], **kwargs):
+        self._call("get_tweets")
+        return {"data": [dict(self.tweets[str(i)]) for i in ids if str(i) in self.tweets]}
+
+    @staticmethod
+    def published_text(text: str) -> str:
+        """Text as the API stores and returns it: &, < and > as HTML entities, every URL a t.co link"""
+        escaped = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        return _URL.sub(lambda m: "https://t.co/" + hashlib.sha1(m.group(0).encode("utf-8")).hexdigest()[:10], escaped)
+
+    def create_tweet(self, text: str, in_reply_to_tweet_id: str = None, quote_tweet_id: str = None, **kwargs):
+        self._call("create_tweet")
+        published = self.published_text(text)
+        with self._lock:
+            if any(t["text"] == published for t in self.posted):
+                raise FakeBackendError("403 Forbidden: You are not allowed to create a Tweet with duplicate content.")
+        tweet = self.make_tweet(text=published, author=self.bot_user["username"])
+        tweet["author_id"] = self.bot_user["id"]
+        references = [{"type": "quoted", "id": quoted} for quoted in
+                      ([str(quote_tweet_id)] if quote_tweet_id else _STATUS_URL.findall(text)[:1])]
+        if in_reply_to_tweet_id:
+            references.append({"type": "replied_to", "id": str(in_reply_to_tweet_id)})
+        if references:
+            tweet["referenced_tweets"] = references
+        with self._lock:
+            self.posted.append(tweet)
+            lost = self.rng.random() < self.lost_response_rate
+        if lost:
+            raise FakeBackendError("504 Gateway Timeout (create_tweet)")
+        return {"data": {"id": tweet["id"], "text": published}}
+
+    def follow_user(self, target_user_id: str, **kwargs):
+        self._call("follow_user")
+        with self._lock:
+            self.followed.append(str(target_user_id))
+        return {"data": {"following": True, "pending_follow": False}}
+
+
+class _Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeOpenAI(_LatencyAndErrors):
+    """
+    Stand-in for openai.OpenAI(): client.chat.completions.create(...) returns an object shaped like
+    the v1 SDK response, including usage token counts. skip_rate makes that share of answers 'SKIP'.
+
+    Answers are reply_words words in short sentences, generated at token_latency seconds per
+    token. stream=True returns a FakeChatStream; each request's completion_tokens is what the
+    caller actually received, so a stream closed early shows the tokens it saved.
+    """
+
+    def __init__(self, skip_rate: float = 0.0, reply_words: int = 30, token_latency: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.skip_rate = skip_rate
+        self.reply_words = reply_words
+        self.token_latency = token_latency
+        self.requests: List[Dict] = []
+        self.chat = _Obj(completions=_Obj(create=self._create))
+
+    def _answer(self) -> str:
+        with self._lock:
+            if self.rng.random() < self.skip_rate:
+                return "SKIP because nothing here is new."
+            words = [self.rng.choice(_WORDS) for _ in range(self.reply_words)]
+            lengths = [self.rng.randint(6, 12) for _ in range(self.reply_words)]
+        sentences, i = [], 0
+        for n in lengths:
+            if i >= len(words):
+                break
+            sentences.append(" ".join(words[i:i + n]).capitalize() + ".")
+            i += n
+        return "The signal under the noise: " + " ".join(sentences)
+
+    def _analysis_answer(self, prompt: str) -> str:
+        """One "<n> | <sentiment> | <key point>; <key point>" line per numbered tweet, like ANALYSIS_PROMPT asks"""
+        numbers = re.findall(r"^(\d+)\. ", prompt.split("\nTweets:\n", 1)[1], re.MULTILINE)
+        with self._lock:
+            return "\n".join(f"{n} | {self.rng.choice(('positive', 'negative', 'neutral'))} | "
+                             f"{self.rng.choice(_WORDS)} {self.rng.choice(_WORDS)}; {self.rng.choice(_WORDS)}" for n in numbers)
+
+    def _create(self, model: str, messages: List[Dict], max_tokens: int = 300, stream: bool = False, **kwargs):
+        self._call("chat.completions.create")
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+        prompt = messages[-1].get("content", "") if messages else ""
+        answer = self._analysis_answer(prompt) if "\nTweets:\n" in prompt else self._answer()
+        pieces = chat_pieces(answer)[:max_tokens]
+        request = {"model": model, "prompt_tokens": prompt_tokens, "max_tokens": max_tokens, "stream": stream,
+                   "completion_tokens": len(pieces)}
+        with self._lock:
+            self.requests.append(request)
+        if stream:
+            def on_close(chat_stream):
+                request["completion_tokens"] = chat_stream.sent
+                request["aborted"] = chat_stream.sent < len(pieces)
+            return FakeChatStream(pieces, model, self.token_latency, on_close=on_close)
+        if self.token_latency:
+            time.sleep(self.token_latency * len(pieces))
+        return make_chat_completion("".join(pieces), model, prompt_tokens, len(pieces),
+                                    "length" if len(pieces) == max_tokens else "stop")
+
+
+def chat_pieces(content: str) -> List[str]:
+    """content split into token-sized pieces (about four characters, leading space attached)"""
+    return re.findall(r"\s*\S{1,4}", content)
+
+
+class FakeChatStream:
+    """
+    Iterable of chunks shaped like the openai v1 Stream (choices[0].delta.content). close() ends
+    generation, like dropping the HTTP response; sent counts the pieces delivered before that.
+    """
+
+    def __init__(self, pieces: List[str], model: str = "gpt-4", token_latency: float = 0.0, on_close=None):
+        self.pieces = pieces
+        self.model = model
+        self.token_latency = token_latency
+        self.sent = 0
+        self.closed = False
+        self._on_close = on_close
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            if self.closed:
+                return
+            self.sent += 1
+            yield _Obj(choices=[_Obj(index=0, delta=_Obj(role="assistant", content=piece), finish_reason=None)], model=self.model)
+        yield _Obj(choices=[_Obj(index=0, delta=_Obj(content=None), finish_reason="stop")], model=self.model)
+        self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self._on_close:
+                self._on_close(self)
+
+
+def make_chat_completion(content: str, model: str = "gpt-4", prompt_tokens: int = 0, completion_tokens: int = 0,
+                         finish_reason: str = "stop"):
+    """Object shaped like an openai v1 ChatCompletion (choices[0].message.content, usage.*)"""
+    return _Obj(
+        choices=[_Obj(message=_Obj(role="assistant", content=content), finish_reason=finish_reason)],
+        usage=_Obj(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                   total_tokens=prompt_tokens + completion_tokens),
+        model=model,
+    )
+
+def rule_matches(value: str, text: str) -> bool:
+    """
+    Just enough of the filtered-stream rule language for the rules the bot builds: every
+    parenthesised OR group needs one matching term, bare terms must all appear, and operators
+    (is:retweet, lang:en, negations) are ignored. Matching is case-insensitive substring matching.
+    """
+    text = text.lower()
+    for group in re.findall(r"\(([^)]*)\)", value):
+        terms = [q or t for q, t in re.findall(r'"([^"]+)"|(\S+)', group) if (q or t) != "OR"]
+        if terms and not any(term.lower() in text for term in terms):
+            return False
+    for term in re.sub(r"\([^)]*\)", " ", value).split():
+        if term.startswith("-") or ":" in term:
+            continue
+        if term.strip('"').lower() not in text:
+            return False
+    return True
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"  # The stream body runs until the connection closes
+    server_ref: "FakeStreamServer" = None
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, body: Dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _check(self) -> bool:
+        fake = self.server_ref
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            self._json(401, {"title": "Unauthorized"})
+            return False
+        with fake._lock:
+            status = fake._fail_statuses.pop(0) if fake._fail_statuses else None
+        if status:
+            self._json(status, {"title": "Injected failure"})
+            return False
+        return True
+
+    def do_GET(self):
+        fake = self.server_ref
+        url = urlparse(self.path)
+        if not self._check():
+            return
+        if url.path.endswith("/rules"):
+            with fake._lock:
+                rules = list(fake.rules.values())
+            self._json(200, {"data": rules, "meta": {"result_count": len(rules)}})
+            return
+        params = parse_qs(url.query)
+        backfill = int(params.get("backfill_minutes", ["0"])[0])
+        events: "queue.Queue" = queue.Queue()
+        with fake._lock:
+            fake.connections += 1
+            fake.requests.append(params)
+            if backfill:
+                cutoff = time.time() - backfill * 60
+                for published_at, event in fake.history:
+                    if published_at >= cutoff:
+                        events.put(event)
+            fake._clients.append(events)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=fake.keepalive)
+                except queue.Empty:
+                    self.wfile.write(b"\r\n")
+                    self.wfile.flush()
+                    continue
+                if event is None:
+                    return
+                self.wfile.write(json.dumps(event).encode() + b"\r\n")
+                self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            with fake._lock:
+                if events in fake._clients:
+                    fake._clients.remove(events)
+
+    def do_POST(self):
+        fake = self.server_ref
+        if not self._check():
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        with fake._lock:
+            created = []
+            for rule in body.get("add", []):
+                rule_id = str(next(fake._rule_ids))
+                fake.rules[rule_id] = {"id": rule_id, "value": rule["value"], "tag": rule.get("tag")}
+                created.append(fake.rules[rule_id])
+            for rule_id in body.get("delete", {}).get("ids", []):
+                fake.rules.pop(str(rule_id), None)
+        self._json(200, {"data": created, "meta": {"summary": {"created": len(created)}}})
+
+
+class FakeStreamServer:
+    """
+    Local stand-in for the Twitter v2 filtered stream: the /rules endpoints plus a newline-delimited
+    JSON stream with keep-alives, on a real socket so the streaming client's reconnect, stall and
+    backoff handling run for real.
+
+    post_tweet() creates a tweet (in the attached FakeTwitterClient, so REST lookups see it too) and
+    delivers it to every connected client whose rules match. drop_connections() and fail_next()
+    simulate disconnects and HTTP errors; backfill_minutes on connect replays recent events.
+    """
+
+    def __init__(self, twitter: FakeTwitterClient = None, keepalive: float = 20.0, host: str = "127.0.0.1", port: int = 0):
+        self.twitter = twitter or FakeTwitterClient(seed=3)
+        self.keepalive = keepalive
+        self.rules: Dict[str, Dict] = {}
+        self.history: List[tuple] = []
+        self.connections = 0
+        self.requests: List[Dict] = []
+        self._clients: List["queue.Queue"] = []
+        self._fail_statuses: List[int] = []
+        self._rule_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        handler = type("StreamHandler", (_StreamHandler,), {"server_ref": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-stream", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/2/tweets/search/stream"
+
+    def start(self) -> "FakeStreamServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.drop_connections()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def connected_clients(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+    def publish(self, tweet: Dict, author: Dict = None) -> List[str]:
+        """Deliver an existing tweet to matching connections; returns the matched rule tags"""
+        with self._lock:
+            matching = [{"id": r["id"], "tag": r["tag"]} for r in self.rules.values() if rule_matches(r["value"], tweet["text"])]
+            if not matching:
+                return []
+            event = {"data": tweet, "matching_rules": matching}
+            if author:
+                event["includes"] = {"users": [author]}
+            self.history.append((time.time(), event))
+            for client in self._clients:
+                client.put(event)
+        return [m["tag"] for m in matching]
+
+    def post_tweet(self, text: str = None, author: str = None) -> Dict:
+        tweet = self.twitter.make_tweet(text=text, author=author)
+        user = next((u for u in self.twitter.users.values() if u["id"] == tweet["author_id"]), None)
+        self.publish(tweet, {"id": user["id"], "username": user["username"]} if user else None)
+        return tweet
+
+    def post_mention(self, author: str = None) -> Dict:
+        tweet = self.twitter.add_mentions(1, author=author)[0]
+        user = next(u for u in self.twitter.users.values() if u["id"] == tweet["author_id"])
+        self.publish(tweet, {"id": user["id"], "username": user["username"]})
+        return tweet
+
+    def drop_connections(self):
+        with self._lock:
+            for client in self._clients:
+                client.put(None)
+
+    def fail_next(self, *statuses: int):
+        """The next len(statuses) requests get these HTTP error statuses"""
+        with self._lock:
+            self._fail_statuses.extend(statuses)
+
+
+class _OpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"  # Streamed bodies run until the connection closes
+    server_ref: "FakeOpenAIServer" = None
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, status: int, body: Dict):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        try:
+            result = self.server_ref.openai.chat.completions.create(
+                model=body.get("model", "gpt-4"), messages=body.get("messages", []),
+                max_tokens=body.get("max_tokens", 300), stream=bool(body.get("stream")))
+        except FakeBackendError as e:
+            self._json(429 if str(e).startswith("429") else 503, {"error": {"message": str(e)}})
+            return
+        completion_id = f"chatcmpl-{next(self.server_ref._ids)}"
+        if not body.get("stream"):
+            choice = result.choices[0]
+            self._json(200, {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": result.model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": choice.message.content},
+                             "finish_reason": choice.finish_reason}],
+                "usage": vars(result.usage),
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            for chunk in result:
+                choice = chunk.choices[0]
+                event = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": chunk.model,
+                         "choices": [{"index": 0, "delta": {k: v for k, v in vars(choice.delta).items() if v is not None},
+                                      "finish_reason": choice.finish_reason}]}
+                self.wfile.write(b"data: " + json.dumps(event).encode() + b"\n\n")
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except OSError:
+            pass  # The client closed the response: stop generating
+        finally:
+            result.close()
+
+
+class FakeOpenAIServer:
+    """
+    Local stand-in for the OpenAI chat completions endpoint over real HTTP, plain JSON or
+    server-sent events with stream=true. Point the SDK at it with OPENAI_BASE_URL=<server.url>
+    (any OPENAI_API_KEY). Completions come from the wrapped FakeOpenAI, whose requests show how
+    many tokens each client actually read before closing its stream.
+    """
+
+    def __init__(self, openai: FakeOpenAI = None, host: str = "127.0.0.1", port: int = 0):
+        self.openai = openai or FakeOpenAI(seed=4)
+        self._ids = itertools.count(1)
+        handler = type("OpenAIHandler", (_OpenAIHandler,), {"server_ref": self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,249 @@
+"""
+Glitch Bot Follow Decisions (batched author scoring and rate-limited follows)
+
+Each run:
+
+    1. candidates: authors of the latest scan_rows ingested tweets (monitored_content) and queued
+       mentions (priority_queue), minus everyone already followed or decided within redecide_days
+    2. resolve:    their profiles via the shared user cache (caches.USER_CACHE, the entries
+                   get_user_cached uses); misses are fetched 100 per get_users call
+    3. score:      assess_content_quality of each author's best recent tweet with their profile,
+                   so follower counts count; authors of priority mentions (tagging the owner) are
+                   always followed
+    4. follow:     decisions marked "follow" are carried out through the account's write limiter,
+                   at most max_follows_per_run per run and max_follows_per_day per day; the rest
+                   wait for the next run
+
+Decisions and follows are rows in follow_decisions / followed_accounts, so the followed set
+survives restarts and is shared by every worker; the agent state only shows the latest few.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.bots.caches import USER_CACHE, request_key
+from src.bots.config import FOLLOW_CONFIG
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY
+
+log = get_logger("follows")
+
+
+def _chunks(items: List, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class FollowEngine:
+    def __init__(self, db, config: Dict = None, owner_handle: str = None, bot_user_id: str = None):
+        self.db = db
+        self.config = dict(FOLLOW_CONFIG, **(config or {}))
+        self.owner_handle = owner_handle
+        self.bot_user_id = bot_user_id
+
+    def candidates(self, now: float = None) -> List[Dict]:
+        """New authors from recent tweets and mentions: user_id and/or username, best content, priority"""
+        now = now or time.time()
+        scan = self.config["scan_rows"]
+        by_key: Dict[str, Dict] = {}
+        with self.db.get_connection() as conn:
+            # rowid ranges: the newest scan_rows rows without touching the rest of either table
+            for row in conn.execute("""
+                SELECT author_id, content FROM monitored_content
+                WHERE id > (SELECT COALESCE(MAX(id), 0) FROM monitored_content) - ? AND author_id IS NOT NULL
+            """, (scan,)):
+                entry = by_key.setdefault(f"id:{row['author_id']}", {"user_id": row["author_id"], "username": None,
+                                                                      "contents": [], "priority": False})
+                entry["contents"].append(row["content"] or "")
+            for row in conn.execute("""
+                SELECT author, content, is_priority FROM priority_queue
+                WHERE id > (SELECT COALESCE(MAX(id), 0) FROM priority_queue) - ? AND author IS NOT NULL AND author != ''
+            """, (scan,)):
+                entry = by_key.setdefault(f"name:{row['author'].lower()}", {"user_id": None, "username": row["author"],
+                                                                              "contents": [], "priority": False})
+                entry["contents"].append(row["content"] or "")
+                entry["priority"] = entry["priority"] or bool(row["is_priority"])
+            known_ids, known_names = self._known(conn, now)
+        fresh = [c for c in by_key.values()
+                 if c["user_id"] not in known_ids and (c["username"] or "").lower() not in known_names
+                 and (c["user_id"] is None or c["user_id"] != self.bot_user_id)]
+        fresh.sort(key=lambda c: (not c["priority"], -len(c["contents"])))
+        return fresh[:self.config["max_candidates"]]
+
+    def _known(self, conn, now: float) -> Tuple[set, set]:
+        """Ids and lower-case usernames already followed, or decided recently enough not to revisit"""
+        ids, names = set(), set()
+        for row in conn.execute("""
+            SELECT user_id, username FROM followed_accounts
+            UNION ALL
+            SELECT user_id, username FROM follow_decisions WHERE decision != 'skip' OR decided_at >= ?
+        """, (now - self.config["redecide_days"] * 86400,)):
+            ids.add(row["user_id"])
+            if row["username"]:
+                names.add(row["username"].lower())
+        return ids, names
+
+    def resolve(self, client, candidates: List[Dict], read_limiter=None) -> int:
+        """Fill in each candidate's profile from the user cache, fetching misses in bulk; returns API calls made"""
+        calls = 0
+        for field, key in (("user_id", "id"), ("username", "username")):
+            missing = []
+            for candidate in candidates:
+                if candidate.get("profile") or not candidate[field]:
+                    continue
+                cached = USER_CACHE.get(request_key("get_user", **{key: candidate[field]}))
+                if cached and cached.get("data"):
+                    candidate["profile"] = cached["data"]
+                else:
+                    missing.append(candidate)
+            for batch in _chunks(missing, 100):
+                if read_limiter is not None and not read_limiter.try_acquire():
+                    log.info("Read budget exhausted; %d author profiles left unresolved", len(missing))
+                    return calls
+                values = [c[field] for c in batch]
+                response = client.get_users(**{f"{key}s": values}, user_fields=["public_metrics", "description"])
+                calls += 1
+                profiles = {str(u[key]).lower(): u for u in response.get("data") or []}
+                for candidate in batch:
+                    profile = profiles.get(str(candidate[field]).lower())
+                    if profile is None:
+                        continue
+                    candidate["profile"] = profile
+                    USER_CACHE.set(request_key("get_user", id=profile["id"]), {"data": profile})
+                    USER_CACHE.set(request_key("get_user", username=profile["username"]), {"data": profile})
+        return calls
+
+    def score(self, candidates: List[Dict], now: float = None) -> List[Dict]:
+        """Decide each resolved candidate and persist the decisions in one transaction"""
+        from src.bots.glitch_bot_agent import assess_content_quality  # The agent module loads game_sdk
+        now = now or time.time()
+        decisions = []
+        for candidate in candidates:
+            profile = candidate.get("profile")
+            if not profile:
+                continue
+            best = max(((assess_content_quality(text, profile), text) for text in candidate["contents"]),
+                       key=lambda item: item[0][2])
+            (should_follow, reason, score), _ = best
+            if candidate["priority"]:
+                should_follow, reason = True, f"tagged @{self.owner_handle}" if self.owner_handle else "priority mention"
+            decisions.append({
+                "user_id": profile["id"], "username": profile["username"], "score": score,
+                "followers": (profile.get("public_metrics") or {}).get("followers_count"),
+                "decision": "follow" if should_follow else "skip", "reason": reason, "decided_at": now,
+            })
+        with self.db.get_connection() as conn:
+            conn.executemany("""
+                INSERT INTO follow_decisions (user_id, username, score, followers, decision, reason, decided_at, attempts)
+                VALUES (:user_id, :username, :score, :followers, :decision, :reason, :decided_at, 0)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    username = excluded.username, score = excluded.score, followers = excluded.followers,
+                    decision = excluded.decision, reason = excluded.reason, decided_at = excluded.decided_at, attempts = 0
+                WHERE follow_decisions.decision != 'followed'
+            """, decisions)
+            conn.commit()
+        for decision in decisions:
+            REGISTRY.counter("glitchbot_follow_decisions_total", {"decision": decision["decision"]},
+                             "Authors scored by the follow engine").inc()
+        return decisions
+
+    def follow_pending(self, client, write_limiter=None, now: float = None) -> List[Dict]:
+        """Carry out "follow" decisions, best score first, within the per-run and per-day caps"""
+        now = now or time.time()
+        with self.db.get_connection() as conn:
+            today = conn.execute("SELECT COUNT(*) FROM followed_accounts WHERE followed_at >= ?", (now - 86400,)).fetchone()[0]
+            pending = [dict(row) for row in conn.execute("""
+                SELECT * FROM follow_decisions WHERE decision = 'follow' ORDER BY score DESC, decided_at LIMIT ?
+            """, (max(min(self.config["max_follows_per_run"], self.config["max_follows_per_day"] - today), 0),))]
+        followed = []
+        for decision in pending:
+            if write_limiter is not None and not write_limiter.try_acquire():
+                break
+            if self._follow(client, decision, now):
+                followed.append(decision)
+        return followed
+
+    def _follow(self, client, decision: Dict, now: float) -> bool:
+        try:
+            result = client.follow_user(target_user_id=decision["user_id"])
+            ok = bool((result.get("data") or {}).get("following") or (result.get("data") or {}).get("pending_follow"))
+            error = None if ok else "API response issue"
+        except Exception as e:
+            ok, error = False, str(e)
+        with self.db.get_connection() as conn:
+            if ok:
+                conn.execute("""
+                    INSERT OR IGNORE INTO followed_accounts (user_id, username, followed_at, reason) VALUES (?, ?, ?, ?)
+                """, (decision["user_id"], decision["username"], now, decision["reason"]))
+                conn.execute("UPDATE follow_decisions SET decision = 'followed' WHERE user_id = ?", (decision["user_id"],))
+            else:
+                conn.execute("""
+                    UPDATE follow_decisions SET attempts = attempts + 1, last_error = ?,
+                        decision = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE decision END
+                    WHERE user_id = ?
+                """, (error, self.config["max_attempts"], decision["user_id"]))
+            conn.commit()
+        REGISTRY.counter("glitchbot_follows_total", {"result": "followed" if ok else "failed"}, "Follow actions").inc()
+        if ok:
+            log.info("Followed @%s (%s)", decision["username"], decision["reason"])
+        else:
+            log.warning("Could not follow @%s: %s", decision["username"], error)
+        return ok
+
+    def run(self, client, read_limiter=None, write_limiter=None, now: float = None) -> Dict:
+        """One full pass: candidates -> profiles -> decisions -> follows"""
+        now = now or time.time()
+        candidates = self.candidates(now)
+        calls = self.resolve(client, candidates, read_limiter)
+        decisions = self.score(candidates, now)
+        followed = self.follow_pending(client, write_limiter, now)
+        return {"candidates": len(candidates), "profile_calls": calls, "decided": len(decisions),
+                "to_follow": sum(d["decision"] == "follow" for d in decisions), "followed": len(followed)}
+
+    def follow(self, client, username: str, reason: str = "", write_limiter=None) -> Tuple[bool, str]:
+        """Follow one user right away (deduplicated against the followed set); returns (followed, message)"""
+        candidate = {"user_id": None, "username": username.lstrip("@"), "contents": [], "priority": True}
+        with self.db.get_connection() as conn:
+            if conn.execute("SELECT 1 FROM followed_accounts WHERE username = ? COLLATE NOCASE",
+                            (candidate["username"],)).fetchone():
+                return True, f"Already following @{candidate['username']}"
+        self.resolve(client, [candidate])
+        profile = candidate.get("profile")
+        if not profile:
+            return False, f"User @{candidate['username']} not found"
+        with self.db.get_connection() as conn:
+            if conn.execute("SELECT 1 FROM followed_accounts WHERE user_id = ?", (profile["id"],)).fetchone():
+                return True, f"Already following @{profile['username']}"
+        if write_limiter is not None and not write_limiter.acquire(timeout=60):
+            return False, f"Write budget exhausted; not following @{candidate['username']} now"
+        now = time.time()
+        decision = {"user_id": profile["id"], "username": profile["username"], "score": None,
+                    "followers": (profile.get("public_metrics") or {}).get("followers_count"),
+                    "decision": "follow", "reason": reason or "requested", "decided_at": now}
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                INSERT INTO follow_decisions (user_id, username, score, followers, decision, reason, decided_at, attempts)
+                VALUES (:user_id, :username, :score, :followers, :decision, :reason, :decided_at, 0)
+                ON CONFLICT(user_id) DO UPDATE SET decision = 'follow', reason = excluded.reason, decided_at = excluded.decided_at
+            """, decision)
+            conn.commit()
+        if self._follow(client, decision, now):
+            return True, f"Successfully followed @{profile['username']}: {decision['reason']}"
+        return False, f"Failed to follow @{profile['username']}"
+
+    def recent(self, limit: int = 10) -> Dict[str, List[Dict]]:
+        """The latest follows and decisions, for the agent state"""
+        with self.db.get_connection() as conn:
+            follows = [dict(row) for row in conn.execute("""
+                SELECT username, reason, followed_at FROM followed_accounts ORDER BY followed_at DESC LIMIT ?
+            """, (limit,))]
+            decisions = [dict(row) for row in conn.execute("""
+                SELECT username, decision, score, followers, reason FROM follow_decisions ORDER BY decided_at DESC LIMIT ?
+            """, (limit,))]
+        return {"followed_accounts": follows, "follow_decisions": decisions}
+
+    def stats(self) -> Dict:
+        with self.db.get_connection() as conn:
+            return {
+                "followed": conn.execute("SELECT COUNT(*) FROM followed_accounts").fetchone()[0],
+                "decisions": dict(conn.execute("SELECT decision, COUNT(*) FROM follow_decisions GROUP BY decision").fetchall()),
+            }
@@ -4,18 +4,51 @@ Glitch Bot Agent Logic (Workers, Functions)
 from datetime import datetime, timedelta
 import random
 from typing import Tuple
-from game_sdk.game.agent import Agent, WorkerConfig
 from game_sdk.game.custom_types import Function, Argument, FunctionResult, FunctionResultStatus
-from src.bots.config import POSTING_CONFIG, YOUR_TWITTER_HANDLE, QUALITY_INDICATORS, ENHANCED_PERSONALITY, ACCOUNTS_TO_MONITOR, TOPICS_TO_MONITOR, GAME_API_KEY
-from src.bots.glitch_bot_db import TwitterAgentDB
-from src.bots.twitter_utils import get_twitter_client, call_with_rate_limit_handling
+from src.bots.config import MENTION_QUEUE_CONFIG, POSTING_CONFIG, SNAPSHOT_CONFIG, YOUR_TWITTER_HANDLE, QUALITY_INDICATORS, ENHANCED_PERSONALITY, ACCOUNTS_TO_MONITOR, TOPICS_TO_MONITOR
+from src.bots.twitter_utils import call_with_rate_limit_handling
+from src.bots.breakers import BREAKERS
 from src.bots.llm_utils import generate_thread_with_llm
+from src.bots.mention_queue import is_priority_author, parse_tweet_time
+from src.bots.account_rotation import AccountRotation
+from src.bots.search_planner import SearchPlanner
+from src.bots.quote_gate import QuoteGate
+from src.bots.outbox import Outbox
+from src.bots.engagement import EngagementRefresher
+from src.bots.follows import FollowEngine
+from src.bots.analysis import ContentAnalyzer
+from src.bots.knowledge import KnowledgeBuilder, top_knowledge
+from src.bots.accounts import AccountAttribute, current_account, use_account
+from src.bots.caches import TWEET_CACHE, USER_CACHE, request_key
+from src.bots.mention_workers import MentionWorkerPool
+from src.bots.metrics import REGISTRY, instrument
+from src.bots.tracing import annotate
+from src.bots.log_utils import get_logger, log_payload
 import time
 
-db = TwitterAgentDB("enhanced_glitch_bot_v2.db")
+log = get_logger("agent")
+mentions_log = get_logger("agent.mentions")
+posting_log = get_logger("agent.posting")
+timeline_log = get_logger("agent.timeline")
+search_log = get_logger("agent.search")
 
-def get_enhanced_state_fn(function_result: FunctionResult, current_state: dict) -> dict:
-    # ... (copy logic from enhanced_glitch_bot_v2.py)
+# The active account's DB and mention queue (see accounts.py)
+db = AccountAttribute("db")
+mention_queue = AccountAttribute("mention_queue")
+
+# The part of the agent state that paces posting; it outlives the agent (see warm_restart.py)
+PACING_STATE = ("last_post_time", "posts_this_hour", "posting_history")
+
+def _remember_pacing(state: dict):
+    """Keep the pacing on the account, unless another worker's state already saw a later post"""
+    account = current_account()
+    saved = account.agent_state or {}
+    if (state.get("last_post_time") or "") >= (saved.get("last_post_time") or ""):
+        account.agent_state = {key: state[key] for key in PACING_STATE}
+        account.agent_state["posting_history"] = list(state["posting_history"][-SNAPSHOT_CONFIG["posting_history"]:])
+
+def _initial_state() -> dict:
+    """The agent's first state; built only when there is no current state, it costs a few DB reads"""
     initial_state = {
         "knowledge_base": {
             "AI": [], "crypto": [], "biotech": [], "cross_connections": []
@@ -23,48 +56,66 @@ def get_enhanced_state_fn(function_result: FunctionResult, current_state: dict)
         "posting_history": [],
         "mention_queue": [],
         "timeline_insights": [],
-        "engagement_tracking": {},
+        "engagement_tracking": EngagementRefresher(db).summary(),
+        "degraded_upstreams": BREAKERS.degraded(),  # Open / half-open circuits (see breakers.py)
+        "content_analysis": ContentAnalyzer(db).summary(),  # What was ingested in the last day (see analysis.py)
         "last_post_time": None,
-        "posts_this_hour": 0,
-        "hour_started": datetime.now().hour,
+        "posts_this_hour": 0,     # Posts in the last hour (see Outbox.pacing)
         "priority_mentions": [],  # Mentions from @lemoncheli
         "general_mentions": [],   # Mentions from others
         "engagement_metrics": db.get_engagement_metrics(),
-        "followed_accounts": [],  # Track who we've followed
-        "follow_decisions": []    # Track follow decisions and reasoning
+        # The latest follows and decisions; the full history is in the DB (see follows.py)
+        **FollowEngine(db).recent(),
     }
+    if current_account().agent_state:
+        # A re-created agent (or a warm restart) keeps its recent posts; the pacing is re-read below
+        initial_state.update(current_account().agent_state)
+        initial_state["posting_history"] = list(initial_state["posting_history"])
+    initial_state.update(Outbox(db).pacing())
+    for topic in ["AI", "crypto", "biotech"]:
+        # From the in-process top-K cache (see knowledge.py), not a query per state update
+        initial_state["knowledge_base"][topic] = top_knowledge(db, topic, 5)
+    initial_state["mention_queue"] = summarize_mention_queue()
+    _remember_pacing(initial_state)
+    return initial_state
+
+def get_enhanced_state_fn(function_result: FunctionResult, current_state: dict) -> dict:
+    # ... (copy logic from enhanced_glitch_bot_v2.py)
     if current_state is None:
-        for topic in ["AI", "crypto", "biotech"]:
-            knowledge = db.get_knowledge_for_topic(topic)
-            initial_state["knowledge_base"][topic] = knowledge[:5]
-        return initial_state
-    current_hour = datetime.now().hour
-    if current_hour != current_state.get("hour_started", current_hour):
-        current_state["posts_this_hour"] = 0
-        current_state["hour_started"] = current_hour
+        return _initial_state()
+    # Posts also go out from the outbox task and pipeline workers, so the pacing comes from the DB
+    current_state.update(Outbox(db).pacing())
     if function_result and function_result.info:
         info = function_result.info
-        if "thread_posted" in info:
-            current_state["last_post_time"] = datetime.now().isoformat()
-            current_state["posts_this_hour"] += 1
+        if info.get("tweet_posted"):
             current_state["posting_history"].append({
-                "timestamp": datetime.now().isoformat(),
-                "content": info.get("thread_content", ""),
-                "url": info.get("thread_url", "")
+                "timestamp": info.get("post_time") or datetime.now().isoformat(),
+                "content": info.get("tweet_content", ""),
+                "url": info.get("tweet_url", "")
             })
         if "mentions_found" in info:
             for mention in info["mentions_found"]:
-                if YOUR_TWITTER_HANDLE.lower() in mention.get("text", "").lower():
+                if current_account().owner_handle.lower() in mention.get("text", "").lower():
                     current_state["priority_mentions"].append(mention)
                 else:
                     current_state["general_mentions"].append(mention)
-        if "followed_user" in info:
-            current_state["followed_accounts"].append(info["followed_user"])
-        if "follow_decision" in info:
-            current_state["follow_decisions"].append(info["follow_decision"])
+        if "followed_user" in info or "follow_decision" in info:
+            current_state.update(FollowEngine(db).recent())
         current_state["engagement_metrics"] = db.get_engagement_metrics()
+        current_state["engagement_tracking"] = EngagementRefresher(db).summary()
+        current_state["degraded_upstreams"] = BREAKERS.degraded()
+        current_state["content_analysis"] = ContentAnalyzer(db).summary()
+        current_state["mention_queue"] = summarize_mention_queue()
+    _remember_pacing(current_state)
     return current_state
 
+def summarize_mention_queue(limit: int = 5) -> list:
+    """Compact view of the next queued mentions for the agent state"""
+    return [
+        {"mention_id": m["mention_id"], "author": m["author"], "is_priority": bool(m["priority"]), "quality_score": m["quality_score"]}
+        for m in mention_queue.pending(limit)
+    ]
+
 def assess_content_quality(content: str, author_metrics: dict = None) -> Tuple[bool, str, int]:
     quality_score = 0
     reasons = []
@@ -93,60 +144,115 @@ def assess_content_quality(content: str, author_metrics: dict = None) -> Tuple[b
     reason = "; ".join(reasons) if reasons else "No specific indicators"
     return should_follow, reason, quality_score
 
+def get_follow_engine(client=None) -> FollowEngine:
+    account = current_account()
+    return FollowEngine(account.db, owner_handle=account.owner_handle,
+                        bot_user_id=get_bot_user_id(client) if client is not None else account.bot_user_id)
+
 def follow_user_on_twitter(username: str, reason: str = "") -> Tuple[bool, str]:
+    """Follow one user now, unless already followed; recorded in followed_accounts (see follows.py)"""
     try:
-        client = get_twitter_client()
-        user_info = client.get_user(username=username)
-        if not user_info.get("data"):
-            return False, f"User @{username} not found"
-        user_id = user_info["data"]["id"]
-        follow_result = client.follow_user(target_user_id=user_id)
-        if follow_result.get("data", {}).get("following"):
-            return True, f"Successfully followed @{username}: {reason}"
-        else:
-            return False, f"Failed to follow @{username}: API response issue"
+        account = current_account()
+        return get_follow_engine().follow(account.twitter_client(), username, reason, account.write_limiter)
     except Exception as e:
         return False, f"Error following @{username}: {str(e)}"
 
-def add_to_priority_queue(mention_id, author, content, quality_score, is_priority):
+def add_to_priority_queue(mention_id, author, content, quality_score, is_priority, conversation_id=None, mention_created_at=None):
     try:
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS priority_queue (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    mention_id TEXT,
-                    author TEXT,
-                    content TEXT,
-                    quality_score INTEGER,
-                    is_priority BOOLEAN,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            cursor.execute('''
-                INSERT INTO priority_queue (mention_id, author, content, quality_score, is_priority)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (mention_id, author, content, quality_score, int(is_priority)))
-            conn.commit()
-            print(f"[add_to_priority_queue] Added mention {mention_id} to priority queue (priority={is_priority}, score={quality_score})")
+        if mention_queue.enqueue(mention_id, author, content, quality_score, is_priority,
+                                 conversation_id=conversation_id, mention_created_at=mention_created_at):
+            mentions_log.info("Queued mention %s (priority=%s, score=%s)", mention_id, is_priority, quality_score)
     except Exception as e:
-        print(f"[add_to_priority_queue] Error: {e}")
+        mentions_log.error("Could not queue mention %s: %s", mention_id, e)
+
+def _reply_to_queued_mention(item: dict, lease_check) -> Tuple[str, str, dict]:
+    status, message, info = reply_to_mention(item["mention_id"], item["author"] or "", item["content"] or "",
+                                             lease_check=lease_check, attempt=item.get("attempts") or 1)
+    if status == FunctionResultStatus.DONE:
+        return "done", message, info
+    if info.get("lease_lost"):
+        return "lost", message, info
+    if info.get("skipped"):
+        return "skipped", message, info
+    return "failed", message, info
+
+def get_mention_pool() -> MentionWorkerPool:
+    """The active account's worker pool, created on first use"""
+    account = current_account()
+    if account.mention_pool is None:
+        account.mention_pool = MentionWorkerPool(account.mention_queue, _reply_to_queued_mention)
+    return account.mention_pool
+
+def process_mention_queue(max_mentions: str = "20", **kwargs) -> Tuple[FunctionResultStatus, str, dict]:
+    """Reply to queued mentions (priority first) on the worker pool, acking handled ones and nacking failures for retry."""
+    try:
+        limit = int(max_mentions) if max_mentions else None
+    except (TypeError, ValueError):
+        limit = None
+    outcome = get_mention_pool().drain(limit)
+    latency = mention_queue.reply_latencies()
+    queue_stats = mention_queue.stats()
+    for status in ("pending", "leased", "dead", "overdue"):
+        REGISTRY.gauge("glitchbot_mention_queue", {"status": status}, "Queued mentions by status").set(queue_stats.get(status, 0))
+    if latency["replies"]:
+        REGISTRY.gauge("glitchbot_mention_reply_latency_seconds", {"quantile": "0.5"}, "Mention-to-reply latency (last 24h)").set(latency["p50"])
+        REGISTRY.gauge("glitchbot_mention_reply_latency_seconds", {"quantile": "0.95"}).set(latency["p95"])
+    result_info = {
+        "mentions_replied": outcome["replied"],
+        "mentions_skipped": outcome["skipped"],
+        "mentions_failed": outcome["failed"],
+        "mentions_deferred": outcome["deferred"],
+        "queue_stats": queue_stats,
+        "reply_latency": latency
+    }
+    if not any(outcome.values()):
+        return FunctionResultStatus.DONE, "📭 Mention queue is empty", result_info
+    if latency["replies"]:
+        mentions_log.info("Mention-to-reply latency over %d replies: p50=%.1fs p95=%.1fs",
+                          latency["replies"], latency["p50"], latency["p95"])
+    return FunctionResultStatus.DONE, f"📬 Mention queue: {len(outcome['replied'])} replied, {len(outcome['skipped'])} skipped, {len(outcome['failed'])} retrying", result_info
+
+def find_posted_reply(client, mention_id: str):
+    """The bot's recent reply to mention_id, if there is one (an earlier attempt may have posted it and lost the response)"""
+    tweets = client.get_users_tweets(id=get_bot_user_id(client), max_results=MENTION_QUEUE_CONFIG["reconcile_lookback"],
+                                     tweet_fields=["referenced_tweets", "created_at"]).get("data") or []
+    return next((tweet for tweet in tweets
+                 if any(ref.get("type") == "replied_to" and ref.get("id") == str(mention_id)
+                        for ref in tweet.get("referenced_tweets") or [])), None)
 
 def reply_to_mention(mention_id: str, author: str, content: str, **kwargs) -> Tuple[FunctionResultStatus, str, dict]:
     """Reply to a mention with context, priority handling, and smart following. Store the original post if the mention is a reply, and only consider posting about it if it passes the quality threshold."""
     try:
         # Check if already responded
         if db.get_mention_response(mention_id):
-            print(f"[reply_to_mention] Already responded to mention {mention_id}, skipping.")
+            mentions_log.info("Already responded to mention %s, skipping", mention_id)
             return FunctionResultStatus.FAILED, "Already responded to this mention", {"skipped": True}
-        client = get_twitter_client()
-        is_lemoncheli = YOUR_TWITTER_HANDLE.lower() in author.lower()
+        lease_check = kwargs.get("lease_check")
+        annotate(mention_id=mention_id, author=author)
+        account = current_account()
+        client = account.twitter_client()
+        is_lemoncheli = account.owner_handle.lower() in author.lower()
+        # A retry (or a worker taking over an expired lease) first records a reply an earlier attempt posted
+        if kwargs.get("attempt", 1) > 1:
+            posted = find_posted_reply(client, mention_id)
+            if posted:
+                db.store_mention_response(
+                    mention_tweet_id=mention_id,
+                    mention_content=content,
+                    response_content=posted["text"],
+                    response_tweet_id=posted["id"],
+                    context_used="reconciled: posted by an earlier attempt whose response was lost"
+                )
+                reply_url = f"https://x.com/i/web/status/{posted['id']}"
+                mentions_log.info("Mention %s was already answered by %s (response lost), recorded it", mention_id, posted["id"])
+                return FunctionResultStatus.DONE, f"💬 Responded to mention: {reply_url}", {
+                    "response_posted": True, "reply_url": reply_url, "is_priority": is_lemoncheli, "reconciled": True}
         original_post = None
         original_post_score = None
         original_post_id = None
         # Try to fetch the original post if this mention is a reply
         try:
-            mention_tweet = client.get_tweet(id=mention_id, expansions=["author_id", "referenced_tweets.id"], tweet_fields=["author_id", "public_metrics", "referenced_tweets"])
+            mention_tweet = get_tweet_cached(client, id=mention_id, expansions=["author_id", "referenced_tweets.id"], tweet_fields=["author_id", "public_metrics", "referenced_tweets"])
             referenced = mention_tweet.get("data", {}).get("referenced_tweets", [])
             if referenced:
                 # Get the original post id (the tweet being replied to)
@@ -156,7 +262,7 @@ def reply_to_mention(mention_id: str, author: str, content: str, **kwargs) -> Tu
                         break
             if original_post_id:
                 # Fetch the original post
-                orig_tweet = client.get_tweet(id=original_post_id, expansions=["author_id"], tweet_fields=["author_id", "public_metrics"])
+                orig_tweet = get_tweet_cached(client, id=original_post_id, expansions=["author_id"], tweet_fields=["author_id", "public_metrics"])
                 orig_data = orig_tweet.get("data", {})
                 orig_author_id = orig_data.get("author_id")
                 orig_content = orig_data.get("text", "")
@@ -178,9 +284,9 @@ def reply_to_mention(mention_id: str, author: str, content: str, **kwargs) -> Tu
                     "score": original_post_score
                 }
         except Exception as e:
-            print(f"[reply_to_mention] Could not fetch/store original post: {e}")
+            mentions_log.warning("Could not fetch/store original post for mention %s: %s", mention_id, e)
         topic = "AI"  # Or use NLP to extract topic
-        knowledge = db.get_knowledge_for_topic(topic)
+        knowledge = top_knowledge(db, topic)
         from src.bots.llm_utils import generate_reply_to_mention
         # Compose reply: thank the tagger, quick comment on the original post if available
         if original_post:
@@ -196,16 +302,24 @@ def reply_to_mention(mention_id: str, author: str, content: str, **kwargs) -> Tu
         )
         # Only skip if reply is empty
         if not llm_reply or not llm_reply.strip():
-            print(f"[reply_to_mention] Skipping reply: LLM output is empty. Content: '{llm_reply}'")
+            mentions_log.info("Skipping reply to mention %s: LLM output is empty", mention_id)
             return FunctionResultStatus.FAILED, "No meaningful reply generated (empty content)", {}
         # Ensure reply fits Twitter limit
         if len(llm_reply) > 280:
             llm_reply = llm_reply[:270] + "..."
+        # Exactly-once: only the current lease holder may post, and never twice for the same mention
+        if lease_check and not lease_check():
+            mentions_log.warning("Lease on mention %s lost, leaving it to its new owner", mention_id)
+            return FunctionResultStatus.FAILED, "Mention lease lost", {"lease_lost": True}
+        if db.get_mention_response(mention_id):
+            return FunctionResultStatus.FAILED, "Already responded to this mention", {"skipped": True}
+        account.write_limiter.acquire()
         reply = client.create_tweet(
             text=llm_reply,
             in_reply_to_tweet_id=mention_id
         )
         reply_url = f"https://x.com/i/web/status/{reply['data']['id']}"
+        annotate(reply_tweet_id=reply["data"]["id"], original_post_id=original_post_id)
         db.store_mention_response(
             mention_tweet_id=mention_id,
             mention_content=content,
@@ -215,7 +329,9 @@ def reply_to_mention(mention_id: str, author: str, content: str, **kwargs) -> Tu
         )
         # Optionally, consider posting about the original post if it passes the score threshold
         POST_SCORE_THRESHOLD = 15
-        if original_post and original_post_score is not None and original_post_score >= POST_SCORE_THRESHOLD:
+        gate = get_quote_gate()
+        if (original_post and original_post_score is not None and original_post_score >= POST_SCORE_THRESHOLD
+                and (not gate.config["enabled"] or gate.decide(original_post["content"], topic, original_post_score)[0])):
             # Prepare a post for the bot's own timeline (not every mention triggers this)
             from src.bots.llm_utils import generate_quote_tweet_comment
             llm_summary = generate_quote_tweet_comment(
@@ -229,7 +345,8 @@ def reply_to_mention(mention_id: str, author: str, content: str, **kwargs) -> Tu
                 if len(tweet_text) > 280:
                     tweet_text = f"{llm_summary[:250]}...\nhttps://x.com/i/web/status/{original_post_id}"
                 db.store_generated_thread(thread_content=tweet_text, topic=topic)
-                print(f"[reply_to_mention] Prepared timeline post for high-scoring original post: {tweet_text}")
+                posting_log.info("Prepared timeline post for high-scoring original post %s", original_post_id)
+                log_payload(posting_log, "Prepared post text", tweet_text)
         result_info = {
             "response_posted": True,
             "reply_url": reply_url,
@@ -255,62 +372,113 @@ def post_insight_from_timeline(topic: str, **kwargs) -> Tuple[FunctionResultStat
             min_interval = timedelta(hours=POSTING_CONFIG["min_hours_between_posts"])
             if time_since_last < min_interval:
                 return FunctionResultStatus.FAILED, f"⏰ Too soon to post again (wait {min_interval - time_since_last})", {"too_soon": True}
+        # Posts already written go out from the outbox; don't spend an LLM call on another yet
+        outbox = Outbox(current_account().db)
+        ready = outbox.ready()
+        if ready >= outbox.config["max_ready"]:
+            posting_log.info("Outbox holds %d posts waiting for their slots, not writing another", ready)
+            return FunctionResultStatus.FAILED, f"📤 {ready} posts already waiting in the outbox", {"skipped": True, "outbox": outbox.stats()}
         # CURATION: Only post if there is a real, interesting tweet/mention in the DB
         interesting = select_interesting_content_from_db()
         if not interesting:
-            print("[post_insight_from_timeline] No interesting content found in DB. Skipping post.")
+            posting_log.info("No interesting content found in DB, skipping post")
             return FunctionResultStatus.FAILED, "No interesting content to post", {"skipped": True}
-        tweet_id = interesting['tweet_id']
+        status, message, info = prepare_quote_post(interesting['tweet_id'], interesting['content'], topic)
+        if status == FunctionResultStatus.DONE:
+            slots = {row["id"]: row["scheduled_at"] for row in outbox.schedule()}
+            if info["thread_id"] in slots:
+                info["scheduled_at"] = datetime.fromtimestamp(slots[info["thread_id"]]).isoformat()
+        return status, message, info
+    except Exception as e:
+        return FunctionResultStatus.FAILED, f"Tweet creation failed: {str(e)}", {}
+
+def prepare_quote_post(tweet_id: str, content: str, topic: str) -> Tuple[FunctionResultStatus, str, dict]:
+    """Write a quote comment on one stored tweet and store it as a generated thread ready to post"""
+    try:
+        annotate(quoted_tweet_id=tweet_id, topic=topic)
         # Anti-duplication: check if already posted this tweet_id
         if db.has_posted_tweet_id(tweet_id):
-            print(f"[post_insight_from_timeline] Already posted about tweet_id {tweet_id}, skipping.")
+            posting_log.info("Already posted about tweet %s, skipping", tweet_id)
             return FunctionResultStatus.FAILED, "Already posted about this tweet", {"skipped": True}
-        content = interesting['content']
-        from src.bots.llm_utils import generate_quote_tweet_comment
-        knowledge = db.get_knowledge_for_topic(topic)
-        llm_summary = generate_quote_tweet_comment(
-            topic,
-            knowledge,
-            content,
-            tweet_url=f"https://x.com/i/web/status/{tweet_id}"
-        )
+        # Tier 1: the local pre-gate decides whether this tweet is worth an LLM call at all
+        gate = get_quote_gate()
+        if gate.config["enabled"]:
+            allowed, reason = gate.decide(content, topic, assess_content_quality(content)[2])
+            if not allowed:
+                posting_log.info("Pre-gate declined quoting %s (%s)", tweet_id, reason)
+                return FunctionResultStatus.FAILED, "Not worth an LLM call (pre-gate)", {"skipped": True, "gated": reason}
+        knowledge = top_knowledge(db, topic)
+        llm_summary, model = _tiered_quote_comment(topic, knowledge, content, f"https://x.com/i/web/status/{tweet_id}")
+        if llm_summary.upper().startswith("SKIP"):
+            gate.record(tweet_id, content, topic, "skip", model)
+            posting_log.info("%s found nothing worth saying about %s", model, tweet_id)
+            return FunctionResultStatus.FAILED, "Nothing worth saying about this tweet (SKIP)", {"skipped": True}
         # Anti-duplication: check if similar content has been posted recently
         if db.is_similar_content_posted(llm_summary):
-            print(f"[post_insight_from_timeline] Similar content already posted recently, skipping. Content: '{llm_summary}'")
+            gate.record(tweet_id, content, topic, "similar", model)
+            posting_log.info("Similar content already posted recently, skipping quote of %s", tweet_id)
+            log_payload(posting_log, "Rejected summary", llm_summary)
             return FunctionResultStatus.FAILED, "Similar content already posted", {"skipped": True}
         banned_phrases = [
             "Automated",
             "This is an automated post",
             "Generated post",
             "...",
-            "",
-            None
         ]
-        if not llm_summary or any(
+        # (An empty phrase would match every summary through startswith)
+        if not llm_summary or not llm_summary.strip() or any(
             (llm_summary.strip().lower() == phrase.strip().lower()) or
             (llm_summary.strip().lower().startswith(phrase.strip().lower()))
             for phrase in banned_phrases
         ):
-            print(f"[post_insight_from_timeline] Skipping post: LLM summary is empty or generic. Content: '{llm_summary}'")
+            posting_log.info("Skipping quote of %s: LLM summary is empty or generic", tweet_id)
+            log_payload(posting_log, "Rejected summary", llm_summary)
+            if llm_summary.strip():
+                gate.record(tweet_id, content, topic, "banned", model)  # An empty one is a failed call, not a label
             return FunctionResultStatus.FAILED, "No meaningful content to post (blocked generic/bad content)", {"skipped": True}
         # Compose final tweet: quote + summary (if fits)
         tweet_url = f"https://x.com/i/web/status/{tweet_id}"
         tweet_text = f"{llm_summary}\n\n{tweet_url}"
         if len(tweet_text) > 280:
             tweet_text = f"{llm_summary[:250]}...\n{tweet_url}"
-        post_id = db.store_generated_thread(thread_content=tweet_text, topic=topic)
-        print(f"[post_insight_from_timeline] Prepared tweet quoting {tweet_url}: {tweet_text}")
+        thread_id = db.store_generated_thread(thread_content=tweet_text, topic=topic)
+        gate.record(tweet_id, content, topic, "prepared", model)
+        posting_log.info("Prepared post %s quoting %s", thread_id, tweet_url)
+        log_payload(posting_log, "Prepared post text", tweet_text)
         result_info = {
             "tweet_ready": True,
             "tweet_content": tweet_text,
             "topic": topic,
-            "tweet_id": post_id,
+            "thread_id": thread_id,  # The generated_threads row; the tweet id is known once the outbox posts it
             "can_post": True
         }
         return FunctionResultStatus.DONE, f"🐦 Tweet ready quoting real content (posting controls passed)", result_info
     except Exception as e:
         return FunctionResultStatus.FAILED, f"Tweet creation failed: {str(e)}", {}
 
+def get_quote_gate() -> QuoteGate:
+    """The active account's quote pre-gate, created on first use"""
+    account = current_account()
+    if account.quote_gate is None:
+        account.quote_gate = QuoteGate(account.db)
+    return account.quote_gate
+
+def _tiered_quote_comment(topic: str, knowledge: list, content: str, tweet_url: str) -> Tuple[str, str]:
+    """
+    GPT-4's quote comment, refining a draft from the cheaper draft_model when one is configured;
+    a SKIP draft ends it there. Returns (comment or "SKIP", model that decided)
+    """
+    from src.bots.llm_utils import generate_quote_tweet_comment
+    draft_model = get_quote_gate().config["draft_model"]
+    draft = None
+    if draft_model:
+        draft = generate_quote_tweet_comment(topic, knowledge, content, tweet_url, model=draft_model, keep_skip=True)
+        if draft.upper().startswith("SKIP"):
+            REGISTRY.counter("glitchbot_llm_calls_avoided_total", {"reason": "draft_skip"}).inc()
+            return draft, draft_model
+        # An empty draft means the cheap call failed; GPT-4 then writes the comment on its own
+    return generate_quote_tweet_comment(topic, knowledge, content, tweet_url, draft=draft or None, keep_skip=True), "gpt-4"
+
 def select_interesting_content_from_db(limit=10, score_threshold=5):
     """Fetch and score recent monitored_content for interestingness."""
     from src.bots.config import QUALITY_INDICATORS
@@ -340,121 +508,233 @@ def select_interesting_content_from_db(limit=10, score_threshold=5):
     # Only return if the score is above the threshold
     return scored[0][1] if scored and scored[0][0] >= score_threshold else None
 
+def get_bot_user_id(client) -> str:
+    """The active account's own user id, looked up once per process"""
+    account = current_account()
+    if account.bot_user_id is None:
+        me = client.get_me()
+        account.bot_user_id = me["data"]["id"]
+    return account.bot_user_id
+
+def get_tweet_cached(client, **kwargs) -> dict:
+    """client.get_tweet through the process-wide tweet cache (shared by all accounts)"""
+    def load():
+        current_account().read_limiter.acquire()
+        return client.get_tweet(**kwargs)
+    return TWEET_CACHE.get_or_load(request_key("get_tweet", **kwargs), load)
+
+def get_user_cached(client, **kwargs) -> dict:
+    """client.get_user through the process-wide user profile cache (shared by all accounts)"""
+    def load():
+        current_account().read_limiter.acquire()
+        return client.get_user(**kwargs)
+    return USER_CACHE.get_or_load(request_key("get_user", **kwargs), load)
+
+def check_mentions(client) -> Tuple[list, list, list]:
+    """Fetch recent mentions and queue them; returns (all, priority, general) mentions"""
+    mentions = client.get_users_mentions(
+        id=get_bot_user_id(client),
+        max_results=20,
+        expansions=["author_id"],
+        user_fields=["username"],
+        tweet_fields=["author_id", "conversation_id", "created_at"]
+    )
+    mention_data = mentions.get("data", [])
+    usernames = {u["id"]: u.get("username", "") for u in mentions.get("includes", {}).get("users", [])}
+    priority_mentions = []
+    general_mentions = []
+    for mention in mention_data:
+        if queue_mention(mention, usernames):
+            priority_mentions.append(mention)
+        else:
+            general_mentions.append(mention)
+    return mention_data, priority_mentions, general_mentions
+
+def queue_mention(mention: dict, usernames: dict) -> bool:
+    """Score one mention (as returned by the API, polled or streamed) and queue it; returns whether it is a priority mention"""
+    author = usernames.get(mention.get("author_id"), mention.get("author_id") or "")
+    text = mention.get("text", "")
+    is_priority = is_priority_author(author, text, current_account().owner_handle)
+    _, _, quality_score = assess_content_quality(text)
+    add_to_priority_queue(
+        mention["id"], author, text, quality_score, is_priority,
+        conversation_id=mention.get("conversation_id"),
+        mention_created_at=parse_tweet_time(mention.get("created_at"))
+    )
+    return is_priority
+
+def monitor_home_timeline(client) -> list:
+    """Store home timeline tweets, falling back to monitored accounts' tweets if the timeline fails"""
+    timeline_insights = []
+    try:
+        timeline = call_with_rate_limit_handling(client.get_home_timeline, max_results=25)
+        # Defensive: ensure timeline is a dict and has 'data'
+        if not isinstance(timeline, dict) or "data" not in timeline:
+            timeline_log.error("Timeline response is not a dict with 'data' (%s)", type(timeline).__name__)
+            log_payload(timeline_log, "Unexpected timeline response", timeline)
+            timeline_tweets = []
+        else:
+            timeline_tweets = timeline.get("data", [])
+        if timeline_tweets:
+            for tweet in timeline_tweets:
+                tweet_text = tweet.get("text", "")
+                # TEMP: Store all timeline tweets, not just those matching topics
+                timeline_insights.append({
+                    "author": "home_timeline",
+                    "content": tweet_text,
+                    "tweet_id": tweet["id"],
+                    "engagement": tweet.get("public_metrics", {}),
+                    "author_id": tweet.get("author_id")
+                })
+                timeline_log.debug("Storing timeline tweet %s: %.80s", tweet["id"], tweet_text)
+                db.store_monitored_content(
+                    tweet_id=tweet["id"],
+                    content=tweet_text,
+                    topic="home_timeline",
+                    author_id=tweet.get("author_id"),
+                    engagement_metrics=tweet.get("public_metrics", {})
+                )
+        timeline_log.info("Stored %d home timeline tweets", len(timeline_insights))
+        log_payload(timeline_log, "Full timeline response", timeline)
+    except Exception as e:
+        timeline_log.warning("Home timeline monitoring failed, falling back to monitored accounts: %s", e)
+        timeline_insights.extend(poll_monitored_accounts(client))
+    return timeline_insights
+
+def poll_monitored_accounts(client, budget: int = None) -> list:
+    """
+    Read the next due ACCOUNTS_TO_MONITOR (see account_rotation.py), as many as the read budget
+    allows after the reserve kept for mentions; stores every new tweet and returns their insights
+    """
+    rotation = AccountRotation(db)
+    rotation.sync(ACCOUNTS_TO_MONITOR)
+    limiter = current_account().read_limiter
+    unresolved = rotation.unresolved()
+    if unresolved and limiter.try_acquire():
+        # One lookup for up to 100 usernames; ids are stored so this only happens for new accounts
+        # Usernames the lookup doesn't return are not asked for again for unresolved_ttl
+        try:
+            requested = unresolved[:100]
+            users = client.get_users(usernames=requested).get("data") or []
+            user_ids = {u["username"].lower(): u["id"] for u in users}
+            rotation.record_user_ids({name: user_ids[name.lower()] for name in requested if name.lower() in user_ids})
+            missing = [name for name in requested if name.lower() not in user_ids]
+            if missing:
+                timeline_log.info("Monitored accounts not found: %s", missing)
+                rotation.record_lookup_failures(missing)
+        except Exception as e:
+            timeline_log.warning("Could not resolve monitored accounts %s: %s", unresolved[:100], e)
+    if budget is None:
+        reserve = rotation.config["read_reserve"] * limiter.capacity
+        budget = int(limiter.available() - reserve)
+    insights = []
+    for row in rotation.plan(budget, ACCOUNTS_TO_MONITOR):
+        if not limiter.try_acquire():
+            break
+        username = row["username"]
+        try:
+            params = {"id": row["user_id"], "max_results": rotation.config["max_results"],
+                      "tweet_fields": ["created_at", "public_metrics", "author_id"]}
+            if row["since_id"]:
+                params["since_id"] = row["since_id"]
+            tweets = client.get_users_tweets(**params).get("data") or []
+        except Exception as e:
+            timeline_log.warning("Reading @%s failed: %s", username, e)
+            rotation.record_poll(username, 0, 0, error=str(e))
+            continue
+        passed = 0
+        for tweet in tweets:
+            passed += assess_content_quality(tweet["text"])[0]
+            timeline_log.debug("Storing tweet %s from @%s: %.80s", tweet["id"], username, tweet["text"])
+            db.store_monitored_content(
+                tweet_id=tweet["id"],
+                content=tweet["text"],
+                topic=username,
+                author_id=tweet.get("author_id") or row["user_id"],
+                engagement_metrics=tweet.get("public_metrics", {})
+            )
+            insights.append({
+                "author": username,
+                "content": tweet["text"],
+                "tweet_id": tweet["id"],
+                "engagement": tweet.get("public_metrics", {})
+            })
+        newest_id = max((t["id"] for t in tweets), key=int, default=None)
+        rotation.record_poll(username, len(tweets), passed, newest_id)
+    timeline_log.info("Read %d monitored accounts, %d new tweets", len({i["author"] for i in insights}), len(insights))
+    return insights
+
+# Topic tweets are only kept when they mention one of these
+TOPIC_INSIGHT_KEYWORDS = ["breakthrough", "innovation", "announcement"]
+
+def store_topic_tweet(tweet: dict, topic: str) -> dict:
+    """Store a topic tweet (polled or streamed) that passed the insight filter; returns its insight entry"""
+    search_log.debug("Storing %s search tweet %s: %.80s", topic, tweet["id"], tweet["text"])
+    db.store_monitored_content(
+        tweet_id=tweet["id"],
+        content=tweet["text"],
+        topic=topic,
+        author_id=tweet.get("author_id"),
+        engagement_metrics=tweet.get("public_metrics", {})
+    )
+    return {
+        "topic": topic,
+        "content": tweet["text"],
+        "tweet_id": tweet["id"],
+        "engagement": tweet.get("public_metrics", {})
+    }
+
+def _match_topic(text: str, topics: list) -> str:
+    """The first of a packed query's topics the tweet mentions (the search matched at least one)"""
+    lowered = text.lower()
+    return next((t for t in topics if t.lower() in lowered), topics[0])
+
+def search_topics(client, topics: str = None) -> list:
+    """
+    Search recent tweets for monitored topics and store the interesting ones. Topics are OR-packed
+    into a few queries that take turns by yield (see search_planner.py), so every topic is searched
+    every few cycles for queries_per_cycle calls.
+    """
+    planner = SearchPlanner(db)
+    all_topics = TOPICS_TO_MONITOR if not topics else topics.split(",")
+    topic_insights = []
+    for planned in planner.plan(all_topics, TOPIC_INSIGHT_KEYWORDS):
+        try:
+            params = {"query": planned["query"], "max_results": planner.config["max_results"],
+                      "tweet_fields": ["author_id", "created_at", "public_metrics"]}
+            if planned["since_id"]:
+                params["since_id"] = planned["since_id"]
+            tweets = client.search_recent_tweets(**params).get("data") or []
+        except Exception as e:
+            search_log.warning("Topic search failed for %s: %s", planned["query"], e)
+            planner.record_run(planned["query"], 0, 0, error=str(e))
+            continue
+        passed = 0
+        for tweet in tweets:
+            passed += assess_content_quality(tweet["text"])[0]
+            # The query already requires a keyword; re-checked in case a topic term matched it only in a URL
+            if any(keyword in tweet["text"].lower() for keyword in TOPIC_INSIGHT_KEYWORDS):
+                topic_insights.append(store_topic_tweet(tweet, _match_topic(tweet["text"], planned["topics"])))
+        newest_id = max((t["id"] for t in tweets), key=int, default=None)
+        planner.record_run(planned["query"], len(tweets), passed, newest_id)
+    search_log.info("Topic search: %d new insights", len(topic_insights))
+    return topic_insights
+
 def enhanced_monitor_and_respond(topics: str = None, **kwargs) -> Tuple[FunctionResultStatus, str, dict]:
     """Enhanced monitoring with mention responses and timeline checking"""
     try:
-        client = get_twitter_client()
-        me = client.get_me()
-        user_id = me["data"]["id"]
+        client = current_account().twitter_client()
         # 1. Check mentions
-        mentions = client.get_users_mentions(id=user_id, max_results=20)
-        mention_data = mentions.get("data", [])
-        priority_mentions = []
-        general_mentions = []
-        for mention in mention_data:
-            if YOUR_TWITTER_HANDLE.lower() in mention.get("text", "").lower():
-                priority_mentions.append(mention)
-            else:
-                general_mentions.append(mention)
+        mention_data, priority_mentions, general_mentions = check_mentions(client)
         # 2. Monitor HOME TIMELINE
-        timeline_insights = []
-        try:
-            timeline = call_with_rate_limit_handling(client.get_home_timeline, max_results=25)
-            # Defensive: ensure timeline is a dict and has 'data'
-            if not isinstance(timeline, dict) or "data" not in timeline:
-                print(f"[ERROR] Timeline response is not a dict with 'data': {timeline}")
-                timeline_tweets = []
-            else:
-                timeline_tweets = timeline.get("data", [])
-            if timeline_tweets:
-                for tweet in timeline_tweets:
-                    tweet_text = tweet.get("text", "")
-                    # DEBUG: Print every timeline tweet being considered
-                    print(f"[DEBUG] Timeline tweet: {tweet_text[:80]}...")
-                    # TEMP: Store all timeline tweets, not just those matching topics
-                    timeline_insights.append({
-                        "author": "home_timeline",
-                        "content": tweet_text,
-                        "tweet_id": tweet["id"],
-                        "engagement": tweet.get("public_metrics", {}),
-                        "author_id": tweet.get("author_id")
-                    })
-                    print(f"[DEBUG] Storing timeline tweet in DB: {tweet_text[:80]}...")
-                    db.store_monitored_content(
-                        tweet_id=tweet["id"],
-                        content=tweet_text,
-                        topic="home_timeline",
-                        author_id=tweet.get("author_id"),
-                        engagement_metrics=tweet.get("public_metrics", {})
-                    )
-            # Log the entire response for debugging
-            print(f"[DEBUG] Full timeline response: {timeline}")
-        except Exception as e:
-            print(f"Home timeline monitoring failed: {e}")
-            for account in ACCOUNTS_TO_MONITOR[:2]:
-                try:
-                    user_info = client.get_user(username=account)
-                    if user_info.get("data"):
-                        user_tweets = client.get_users_tweets(
-                            id=user_info["data"]["id"],
-                            max_results=5,
-                            tweet_fields=["created_at", "public_metrics"]
-                        )
-                        if user_tweets.get("data"):
-                            for tweet in user_tweets["data"]:
-                                tweet_text = tweet["text"]
-                                print(f"[DEBUG] Fallback timeline tweet: {tweet_text[:80]}...")
-                                print(f"[DEBUG] Storing fallback timeline tweet in DB: {tweet_text[:80]}...")
-                                timeline_insights.append({
-                                    "author": account,
-                                    "content": tweet_text,
-                                    "tweet_id": tweet["id"],
-                                    "engagement": tweet.get("public_metrics", {})
-                                })
-                                db.store_monitored_content(
-                                    tweet_id=tweet["id"],
-                                    content=tweet_text,
-                                    topic=account,
-                                    author_id=tweet.get("author_id"),
-                                    engagement_metrics=tweet.get("public_metrics", {})
-                                )
-                except Exception as e:
-                    print(f"Fallback timeline check failed for {account}: {e}")
-                    continue
+        timeline_insights = monitor_home_timeline(client)
         # 3. Search for topic patterns
-        topic_insights = []
-        all_topics = TOPICS_TO_MONITOR if not topics else topics.split(",")
-        for topic in all_topics[:2]:
-            try:
-                search_results = client.search_recent_tweets(
-                    query=f"{topic.strip()} -is:retweet",
-                    max_results=10,
-                    tweet_fields=["author_id", "created_at", "public_metrics"]
-                )
-                if search_results.get("data"):
-                    for tweet in search_results["data"]:
-                        if any(keyword in tweet["text"].lower() for keyword in ["breakthrough", "innovation", "announcement"]):
-                            topic_insights.append({
-                                "topic": topic,
-                                "content": tweet["text"],
-                                "tweet_id": tweet["id"],
-                                "engagement": tweet.get("public_metrics", {})
-                            })
-                            print(f"[DEBUG] Storing topic search tweet in DB: {tweet['text'][:80]}...")
-                            db.store_monitored_content(
-                                tweet_id=tweet["id"],
-                                content=tweet["text"],
-                                topic=topic,
-                                author_id=tweet.get("author_id"),
-                                engagement_metrics=tweet.get("public_metrics", {})
-                            )
-            except Exception as e:
-                print(f"Topic search failed for {topic}: {e}")
-                continue
+        topic_insights = search_topics(client, topics)
         result_info = {
             "mentions_found": mention_data,
             "priority_mentions_count": len(priority_mentions),
             "general_mentions_count": len(general_mentions),
+            "mention_queue_stats": mention_queue.stats(),
             "timeline_insights_count": len(timeline_insights),
             "topic_insights_count": len(topic_insights),
             "monitoring_completed": True
@@ -463,6 +743,63 @@ def enhanced_monitor_and_respond(topics: str = None, **kwargs) -> Tuple[Function
     except Exception as e:
         return FunctionResultStatus.FAILED, f"Enhanced monitoring failed: {str(e)}", {}
 
+# Scheduled tasks (see glitch_bot_main.build_scheduler). Each returns how much work it found so the
+# scheduler can poll faster while busy and back off while idle.
+
+def run_mentions_task(poll: bool = True) -> int:
+    """poll=False just drains the queue (mentions are arriving through the filtered stream)"""
+    if poll:
+        check_mentions(current_account().twitter_client())
+    _, _, info = process_mention_queue()
+    handled = len(info["mentions_replied"]) + len(info["mentions_skipped"])
+    # Keep polling quickly while claimable mentions are left; ones waiting out a retry delay
+    # (e.g. deferred by the rate limiter) don't count, so an otherwise idle queue backs off
+    return handled + info["queue_stats"].get("ready", 0)
+
+def run_timeline_task() -> int:
+    return len(monitor_home_timeline(current_account().twitter_client()))
+
+def run_account_poll_task() -> int:
+    return len(poll_monitored_accounts(current_account().twitter_client()))
+
+def run_topic_search_task() -> int:
+    return len(search_topics(current_account().twitter_client()))
+
+def run_outbox_task() -> int:
+    """Give new drafts their posting slots and publish whatever is due"""
+    account = current_account()
+    client = account.twitter_client()
+    outbox = Outbox(account.db)
+    scheduled = outbox.schedule()
+    if not outbox.due():
+        return len(scheduled)
+    results = outbox.publish_due(client, account.write_limiter, get_bot_user_id(client))
+    return len(scheduled) + sum(r["status"] == "posted" for r in results)
+
+def run_engagement_task() -> int:
+    """Re-read public_metrics of the bot's recent posts that are due (a fixed number of get_tweets calls)"""
+    account = current_account()
+    return EngagementRefresher(account.db).refresh(account.twitter_client(), account.read_limiter)["refreshed"]
+
+def run_follow_task() -> int:
+    """Score new authors from recent tweets and mentions in one batch and follow the best (see follows.py)"""
+    account = current_account()
+    client = account.twitter_client()
+    result = get_follow_engine(client).run(client, account.read_limiter, account.write_limiter)
+    return result["decided"] + result["followed"]
+
+def run_analysis_task() -> int:
+    """Analyse the backlog of stored tweets, chunk by chunk (see analysis.py)"""
+    return ContentAnalyzer(current_account().db).run()["rows"]
+
+def run_knowledge_task() -> int:
+    """Merge newly analysed tweets into the knowledge base and refresh its cache (see knowledge.py)"""
+    return KnowledgeBuilder(current_account().db).run()["analysis_rows"]
+
+def run_cleanup_task():
+    db.cleanup_old_data()
+    EngagementRefresher(db).prune()
+
 def fetch_and_summarize_tweets(topic: str, client, max_results: int = 10) -> str:
     # ... (copy logic from enhanced_glitch_bot_v2.py)
     pass
@@ -472,60 +809,85 @@ def select_interesting_timeline_tweets(tweets, topic, max_count=2):
     pass
 
 def controlled_post_thread(content: str, **kwargs) -> Tuple[FunctionResultStatus, str, dict]:
-    """Post a single tweet with engagement tracking"""
+    """Post a single tweet through the outbox: stored once, published in its slot, never twice"""
     try:
-        client = get_twitter_client()
+        account = current_account()
+        client = account.twitter_client()
         tweet_text = content.strip()
         if len(tweet_text) > 280:
             tweet_text = tweet_text[:270] + "..."
-        tweet = client.create_tweet(text=tweet_text)
-        tweet_id = tweet["data"]["id"]
+        # Text prepared by post_insight_from_timeline is already in the outbox; this finds that draft
+        thread_id = db.store_generated_thread(thread_content=tweet_text, topic=kwargs.get("topic"))
+        outbox = Outbox(account.db)
+        outbox.schedule()
+        result = outbox.publish(thread_id, client, account.write_limiter, get_bot_user_id(client))
+        if result["status"] == "not_due":
+            when = datetime.fromtimestamp(result["scheduled_at"])
+            return FunctionResultStatus.FAILED, f"📤 Queued in the outbox for {when:%H:%M}", {"scheduled": True, "scheduled_at": when.isoformat()}
+        if result["status"] not in ("posted", "already_posted"):
+            return FunctionResultStatus.FAILED, f"Controlled posting failed: {result['status']} {result.get('error', '')}".strip(), {}
+        tweet_id = result["tweet_id"]
+        annotate(tweet_id=tweet_id)
         tweet_url = f"https://x.com/i/web/status/{tweet_id}"
         result_info = {
-            "tweet_posted": True,
+            "tweet_posted": result["status"] == "posted",
             "tweet_url": tweet_url,
             "tweet_id": tweet_id,
             "tweet_content": tweet_text,
             "post_time": datetime.now().isoformat()
         }
+        if result["status"] == "already_posted":
+            return FunctionResultStatus.DONE, f"📱 Already posted: {tweet_url}", result_info
         return FunctionResultStatus.DONE, f"📱 Posted tweet: {tweet_url}", result_info
     except Exception as e:
         return FunctionResultStatus.FAILED, f"Controlled posting failed: {str(e)}", {}
 
-def create_agent_with_retry(max_retries=5, base_delay=30):
+@instrument("game.create_agent")
+def create_agent_with_retry(max_retries=5, base_delay=30, account=None):
+    from game_sdk.game.agent import Agent
+    account = account or current_account()
+    name = "Enhanced Glitch Bot V2" if account.name == "default" else f"Enhanced Glitch Bot V2 ({account.name})"
+    handle = account.owner_handle
     for attempt in range(max_retries):
         try:
-            print(f"🔄 Creating Enhanced Glitch Bot V2 (attempt {attempt + 1}/{max_retries})...")
-            agent = Agent(
-                api_key=GAME_API_KEY,
-                name="Enhanced Glitch Bot V2",
-                agent_goal=f"Build high-quality network through strategic posting (max 2/hour), responsive mentions (especially to @{YOUR_TWITTER_HANDLE}), auto-follow for @{YOUR_TWITTER_HANDLE} tags, and quality-based following for others.",
-                agent_description=ENHANCED_PERSONALITY,
-                get_agent_state_fn=get_enhanced_state_fn,
-                workers=[enhanced_monitor_worker, controlled_content_worker],
-                model_name="Llama-3.1-405B-Instruct"
-            )
-            print("✅ Enhanced Glitch Bot V2 created successfully!")
+            log.info("Creating %s (attempt %d/%d)", name, attempt + 1, max_retries)
+            # The agent reads its initial state (DB metrics, knowledge) while being built
+            with use_account(account):
+                agent = Agent(
+                    api_key=account.game_api_key,  # Only the default account uses GAME_API_KEY (see accounts.py)
+                    name=name,
+                    agent_goal=f"Build high-quality network through strategic posting (max 2/hour), responsive mentions (especially to @{handle}), auto-follow for @{handle} tags, and quality-based following for others.",
+                    agent_description=ENHANCED_PERSONALITY,
+                    get_agent_state_fn=get_enhanced_state_fn,
+                    workers=game_workers(),
+                    model_name="Llama-3.1-405B-Instruct"
+                )
+            log.info("%s created", name)
             return agent
         except Exception as e:
-            print(f"❌ Error creating agent on attempt {attempt+1}: {e}")
-            import traceback
-            traceback.print_exc()
+            log.error("Error creating agent on attempt %d: %s", attempt + 1, e, exc_info=True)
             if attempt < max_retries - 1:
                 delay = base_delay * (2 ** attempt) + random.uniform(0, 10)
-                print(f"⏰ Rate limited or error. Waiting {delay:.1f} seconds before retry {attempt + 2}/{max_retries}...")
+                log.warning("Rate limited or error; waiting %.1fs before retry %d/%d", delay, attempt + 2, max_retries)
                 time.sleep(delay)
             else:
-                print("❌ Max retries reached. The Game SDK API is currently rate limiting agent creation or another error occurred.")
-                print("💡 Try again in a few minutes, or the platform may be experiencing high load.")
-    print("❌ Failed to create agent after all retries")
+                log.error("Max retries reached: the GAME SDK API is rate limiting agent creation or another error occurred. "
+                          "Try again in a few minutes; the platform may be under high load.")
+    log.error("Failed to create agent after all retries")
     return None
 
 post_insight_fn = Function(
     fn_name="post_insight_from_timeline",
     fn_description="Post a tweet quoting or commenting on an interesting timeline tweet from the DB.",
     args=[Argument(name="topic", type="string", description="Topic for insight")],
-    executable=post_insight_from_timeline
+    executable=instrument("agent.post_insight_from_timeline")(post_insight_from_timeline)
+)
+
+process_mention_queue_fn = Function(
+    fn_name="process_mention_queue",
+    fn_description="Reply to queued mentions concurrently in priority order (@%s first), retrying failures later." % YOUR_TWITTER_HANDLE,
+    args=[Argument(name="max_mentions", type="string", description="Maximum number of queued mentions to handle")],
+    executable=instrument("agent.process_mention_queue")(process_mention_queue)
 )
 
 reply_to_mention_fn = Function(
@@ -536,14 +898,14 @@ reply_to_mention_fn = Function(
         Argument(name="author", type="string", description="Author of the mention"),
         Argument(name="content", type="string", description="Content of the mention")
     ],
-    executable=reply_to_mention
+    executable=instrument("agent.reply_to_mention")(reply_to_mention)
 )
 
 enhanced_monitor_fn = Function(
     fn_name="enhanced_monitor",
     fn_description="Monitor mentions, timelines, and topics with smart response handling",
     args=[Argument(name="topics", type="string", description="Topics to monitor")],
-    executable=enhanced_monitor_and_respond
+    executable=instrument("agent.enhanced_monitor")(enhanced_monitor_and_respond)
 )
 
 smart_respond_follow_fn = Function(
@@ -554,7 +916,7 @@ smart_respond_follow_fn = Function(
         Argument(name="author", type="string", description="Author of the mention"),
         Argument(name="content", type="string", description="Content of the mention")
     ],
-    executable=reply_to_mention
+    executable=instrument("agent.smart_respond_follow")(reply_to_mention)
 )
 
 controlled_create_fn = Function(
@@ -564,29 +926,36 @@ controlled_create_fn = Function(
         Argument(name="topic", type="string", description="Topic for thread"),
         Argument(name="insights", type="string", description="Insights to share")
     ],
-    executable=post_insight_from_timeline
+    executable=instrument("agent.controlled_create")(post_insight_from_timeline)
 )
 
 controlled_post_fn = Function(
     fn_name="controlled_post",
     fn_description="Post threads with engagement tracking",
     args=[Argument(name="content", type="string", description="Content to post")],
-    executable=controlled_post_thread
+    executable=instrument("agent.controlled_post")(controlled_post_thread)
 )
 
-enhanced_monitor_worker = WorkerConfig(
-    id="enhanced_monitor_follow",
-    worker_description=f"Enhanced monitoring specialist - tracks mentions (prioritizing @{YOUR_TWITTER_HANDLE}), timelines, and topics with smart response and follow capabilities.",
-    get_state_fn=get_enhanced_state_fn,
-    action_space=[enhanced_monitor_fn, smart_respond_follow_fn]
-)
-
-controlled_content_worker = WorkerConfig(
-    id="controlled_creator",
-    worker_description="Controlled content creator - generates and posts threads with frequency limits, engagement tracking, and strategic timing.",
-    get_state_fn=get_enhanced_state_fn,
-    action_space=[controlled_create_fn, controlled_post_fn]
-)
+def game_workers() -> list:
+    """
+    The GAME agent's workers. game_sdk.game.agent (and the HTTP client behind it) is imported here
+    rather than at module level, so pipeline workers and CLI commands that never build an agent
+    don't pay for it.
+    """
+    from game_sdk.game.agent import WorkerConfig
+    enhanced_monitor_worker = WorkerConfig(
+        id="enhanced_monitor_follow",
+        worker_description=f"Enhanced monitoring specialist - tracks mentions (prioritizing @{YOUR_TWITTER_HANDLE}), timelines, and topics with smart response and follow capabilities.",
+        get_state_fn=get_enhanced_state_fn,
+        action_space=[enhanced_monitor_fn, process_mention_queue_fn, smart_respond_follow_fn]
+    )
+    controlled_content_worker = WorkerConfig(
+        id="controlled_creator",
+        worker_description="Controlled content creator - generates and posts threads with frequency limits, engagement tracking, and strategic timing.",
+        get_state_fn=get_enhanced_state_fn,
+        action_space=[controlled_create_fn, controlled_post_fn]
+    )
+    return [enhanced_monitor_worker, controlled_content_worker]
 
-def enhanced_glitch_bot_v2():
-    return create_agent_with_retry() 
\ No newline at end of file
+def enhanced_glitch_bot_v2(account=None):
+    return create_agent_with_retry(account=account) 
\ No newline at end of file
@@ -2,20 +2,34 @@
 Glitch Bot Database Helpers
 """
 import sqlite3
+import hashlib
 import json
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from contextlib import contextmanager
-import difflib
+from src.bots.metrics import instrument_methods
+from src.bots.log_utils import get_logger
 
+log = get_logger("db")
+
+# Stored in the file's PRAGMA user_version. Bump it whenever init_database's DDL or a migration
+# changes; files already at this version skip schema setup entirely.
+SCHEMA_VERSION = 7
+
+@instrument_methods("db", exclude=("get_connection",))
 class TwitterAgentDB:
     def __init__(self, db_path: str = "twitter_agent.db"):
         self.db_path = db_path
         self.init_database()
     def init_database(self):
         """Initialize database with required tables"""
-        with sqlite3.connect(self.db_path) as conn:
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
             cursor = conn.cursor()
+            if cursor.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return
+            # Several worker processes share this file; WAL lets readers run alongside the writer
+            cursor.execute("PRAGMA journal_mode=WAL").fetchone()
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS monitored_content (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -28,6 +42,8 @@ class TwitterAgentDB:
                     processed BOOLEAN DEFAULT FALSE
                 )
             """)
+            # Only the analysis backlog (see analysis.py), so it stays small however large the table gets
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_monitored_content_unprocessed ON monitored_content (id) WHERE processed = 0")
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS analysis_results (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -40,6 +56,7 @@ class TwitterAgentDB:
                     FOREIGN KEY (content_id) REFERENCES monitored_content (id)
                 )
             """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_analysis_results_created ON analysis_results (created_at)")
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS generated_threads (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -82,29 +99,257 @@ class TwitterAgentDB:
                     recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS priority_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    mention_id TEXT,
+                    author TEXT,
+                    content TEXT,
+                    quality_score INTEGER DEFAULT 0,
+                    is_priority BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self._migrate_priority_queue(cursor)
+            self._migrate_generated_threads(cursor)
+            self._migrate_mentions_responses(cursor)
+            self._migrate_knowledge_base(cursor)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT,
+                    dedupe_key TEXT,
+                    priority INTEGER DEFAULT 5,
+                    status TEXT DEFAULT 'pending',
+                    attempts INTEGER DEFAULT 0,
+                    visible_at REAL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_token TEXT,
+                    lease_expires_at REAL,
+                    last_error TEXT,
+                    created_at REAL,
+                    completed_at REAL
+                )
+            """)
+            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (dedupe_key)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (status, kind, priority, visible_at)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (lease_token)")
+            # Rotation state for ACCOUNTS_TO_MONITOR (see account_rotation.py)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS monitored_accounts (
+                    username TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    since_id TEXT,
+                    last_polled_at REAL,
+                    polls INTEGER DEFAULT 0,
+                    tweets_seen INTEGER DEFAULT 0,
+                    tweets_passed INTEGER DEFAULT 0,
+                    signal_yield REAL,
+                    last_error TEXT
+                )
+            """)
+            self._migrate_monitored_accounts(cursor)
+            # Quote generations and their outcome, and the pre-gate models trained on them (see quote_gate.py)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS quote_outcomes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    tweet_id TEXT,
+                    topic TEXT,
+                    content TEXT,
+                    outcome TEXT,
+                    label INTEGER,
+                    model TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS gate_models (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    trained_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    samples INTEGER,
+                    positive_rate REAL,
+                    accuracy REAL,
+                    weights TEXT
+                )
+            """)
+            # public_metrics time series of the bot's own posts (see engagement.py)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS engagement_snapshots (
+                    id INTEGER PRIMARY KEY,
+                    tweet_id TEXT NOT NULL,
+                    captured_at INTEGER NOT NULL,
+                    likes INTEGER,
+                    retweets INTEGER,
+                    replies INTEGER,
+                    quotes INTEGER,
+                    impressions INTEGER
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_engagement_snapshots_tweet ON engagement_snapshots (tweet_id, captured_at)")
+            # Who the bot follows and why, and every author it has scored (see follows.py)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS followed_accounts (
+                    user_id TEXT PRIMARY KEY,
+                    username TEXT,
+                    followed_at REAL,
+                    reason TEXT
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_followed_accounts_username ON followed_accounts (username COLLATE NOCASE)")
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS follow_decisions (
+                    user_id TEXT PRIMARY KEY,
+                    username TEXT,
+                    score INTEGER,
+                    followers INTEGER,
+                    decision TEXT,
+                    reason TEXT,
+                    decided_at REAL,
+                    attempts INTEGER DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_follow_decisions_pending ON follow_decisions (decision, score)")
+            # Packed topic searches and their cursors (see search_planner.py)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS search_queries (
+                    query TEXT PRIMARY KEY,
+                    topics TEXT,
+                    since_id TEXT,
+                    last_run_at REAL,
+                    runs INTEGER DEFAULT 0,
+                    results INTEGER DEFAULT 0,
+                    passed INTEGER DEFAULT 0,
+                    signal_yield REAL,
+                    last_error TEXT
+                )
+            """)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             conn.commit()
-            print("✅ Database initialized successfully")
+            log.info("Database %s initialized (schema v%d)", self.db_path, SCHEMA_VERSION)
+    def _migrate_priority_queue(self, cursor):
+        """Bring older priority_queue tables (created lazily by the agent) up to the leasable schema"""
+        cursor.execute("PRAGMA table_info(priority_queue)")
+        existing = {row[1] for row in cursor.fetchall()}
+        columns = {
+            "priority": "INTEGER DEFAULT 0",
+            "status": "TEXT DEFAULT 'pending'",
+            "attempts": "INTEGER DEFAULT 0",
+            "lease_owner": "TEXT",
+            "lease_expires_at": "REAL",
+            "visible_at": "REAL DEFAULT 0",
+            "due_at": "REAL",
+            "last_error": "TEXT",
+            "completed_at": "REAL",
+            "conversation_id": "TEXT",
+            "mention_created_at": "REAL",
+            "outcome": "TEXT",
+        }
+        for name, ddl in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE priority_queue ADD COLUMN {name} {ddl}")
+        if "status" not in existing:
+            # Rows written by the old insert-only queue were never consumed; don't reply to them weeks late
+            cursor.execute("UPDATE priority_queue SET status = 'expired', priority = CASE WHEN is_priority THEN 1 ELSE 0 END")
+        # The legacy table allowed the same mention to be queued many times; keep the oldest copy
+        cursor.execute("""
+            DELETE FROM priority_queue WHERE id NOT IN (
+                SELECT MIN(id) FROM priority_queue GROUP BY mention_id
+            )
+        """)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_priority_queue_mention ON priority_queue (mention_id)")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_priority_queue_pop
+            ON priority_queue (status, priority, quality_score, created_at)
+        """)
+    def _migrate_generated_threads(self, cursor):
+        """Outbox columns for generated_threads (see outbox.py)"""
+        cursor.execute("PRAGMA table_info(generated_threads)")
+        existing = {row[1] for row in cursor.fetchall()}
+        columns = {
+            "status": "TEXT DEFAULT 'draft'",
+            "idempotency_key": "TEXT",
+            "scheduled_at": "REAL",
+            "publish_token": "TEXT",
+            "publish_started_at": "REAL",
+            "attempts": "INTEGER DEFAULT 0",
+            "last_error": "TEXT",
+            "posted_at": "REAL",
+            "metrics_refreshed_at": "REAL",
+        }
+        for name, ddl in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE generated_threads ADD COLUMN {name} {ddl}")
+        if "status" not in existing:
+            # Drafts from before the outbox were never posted and are stale by now
+            cursor.execute("UPDATE generated_threads SET status = CASE WHEN posted THEN 'posted' ELSE 'expired' END")
+            cursor.execute("UPDATE generated_threads SET idempotency_key = 'legacy:' || id")
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_generated_threads_key ON generated_threads (idempotency_key)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_generated_threads_outbox ON generated_threads (status, scheduled_at)")
+        # The agent state's posting pacing (Outbox.pacing) reads the latest posts on every step
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_generated_threads_posted ON generated_threads (posted_at) WHERE posted_at IS NOT NULL")
+    def _migrate_mentions_responses(self, cursor):
+        """Latest public_metrics of each reply (see engagement.py)"""
+        cursor.execute("PRAGMA table_info(mentions_responses)")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, ddl in {"engagement_metrics": "TEXT", "metrics_refreshed_at": "REAL"}.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE mentions_responses ADD COLUMN {name} {ddl}")
+    def _migrate_monitored_accounts(self, cursor):
+        """When get_users last failed to resolve each username (see account_rotation.py)"""
+        cursor.execute("PRAGMA table_info(monitored_accounts)")
+        if "lookup_failed_at" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE monitored_accounts ADD COLUMN lookup_failed_at REAL")
+    def _migrate_knowledge_base(self, cursor):
+        """Upsertable knowledge_base, and the analysis_results backlog it is built from (see knowledge.py)"""
+        cursor.execute("PRAGMA table_info(knowledge_base)")
+        existing = {row[1] for row in cursor.fetchall()}
+        for name, ddl in {"sources": "INTEGER DEFAULT 1", "updated_at": "REAL"}.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE knowledge_base ADD COLUMN {name} {ddl}")
+        cursor.execute("UPDATE knowledge_base SET updated_at = CAST(strftime('%s', last_updated) AS REAL) WHERE updated_at IS NULL")
+        # One row per concept and topic; keep the latest copy of any duplicates
+        cursor.execute("""
+            DELETE FROM knowledge_base WHERE id NOT IN (
+                SELECT MAX(id) FROM knowledge_base GROUP BY topic, key_concept
+            )
+        """)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_knowledge_base_concept ON knowledge_base (topic, key_concept)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_base_top ON knowledge_base (topic, confidence_score)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_base_updated ON knowledge_base (updated_at)")
+        cursor.execute("PRAGMA table_info(analysis_results)")
+        if "knowledge_merged" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE analysis_results ADD COLUMN knowledge_merged INTEGER DEFAULT 0")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_analysis_results_unmerged ON analysis_results (id) WHERE knowledge_merged = 0
+        """)
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+        conn = sqlite3.connect(self.db_path, timeout=30)
         conn.row_factory = sqlite3.Row
+        # Safe with WAL (a crash can lose the last commits, never corrupt the file) and far fewer fsyncs
+        conn.execute("PRAGMA synchronous=NORMAL")
         try:
             yield conn
         finally:
             conn.close()
     def store_monitored_content(self, tweet_id: str, content: str, topic: str, author_id: str = None, engagement_metrics: Dict = None) -> int:
+        """Store a tweet once; seeing it again only refreshes its metrics (its id, and so its analysis, is kept)"""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT OR REPLACE INTO monitored_content 
+                INSERT INTO monitored_content 
                 (tweet_id, content, topic, author_id, engagement_metrics)
                 VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(tweet_id) DO UPDATE SET
+                    engagement_metrics = COALESCE(excluded.engagement_metrics, engagement_metrics)
             """, (
                 tweet_id, content, topic, author_id, 
                 json.dumps(engagement_metrics) if engagement_metrics else None
             ))
             conn.commit()
-            return cursor.lastrowid
+            return cursor.execute("SELECT id FROM monitored_content WHERE tweet_id = ?", (tweet_id,)).fetchone()[0]
     def store_analysis_result(self, content_id: int, topic: str, key_points: List[str], sentiment: str = None, importance_score: int = None) -> int:
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -116,26 +361,59 @@ class TwitterAgentDB:
             conn.commit()
             return cursor.lastrowid
     def store_generated_thread(self, thread_content: str, topic: str, source_analysis_ids: List[int] = None) -> int:
+        """Add a draft to the outbox; the same text (its idempotency key) returns the existing row's id"""
+        idempotency_key = hashlib.sha1(" ".join(thread_content.split()).lower().encode("utf-8")).hexdigest()
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                INSERT INTO generated_threads 
-                (thread_content, topic, source_analysis_ids)
-                VALUES (?, ?, ?)
+                INSERT OR IGNORE INTO generated_threads 
+                (thread_content, topic, source_analysis_ids, idempotency_key)
+                VALUES (?, ?, ?, ?)
             """, (
                 thread_content, topic, 
-                json.dumps(source_analysis_ids) if source_analysis_ids else None
+                json.dumps(source_analysis_ids) if source_analysis_ids else None,
+                idempotency_key
             ))
             conn.commit()
-            return cursor.lastrowid
-    def mark_thread_posted(self, thread_id: int, tweet_id: str, engagement_metrics: Dict = None):
+            if cursor.rowcount:
+                return cursor.lastrowid
+            return cursor.execute("SELECT id FROM generated_threads WHERE idempotency_key = ?", (idempotency_key,)).fetchone()[0]
+    def mark_thread_posted(self, thread_id: int, tweet_id: str, engagement_metrics: Dict = None, publish_token: str = None) -> bool:
+        """
+        Record the tweet id in one statement. A thread is marked posted once: this returns False if it
+        already was, or if publish_token is given and another publisher has taken the row over.
+        """
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE generated_threads 
-                SET posted = TRUE, tweet_id = ?, engagement_metrics = ?
-                WHERE id = ?
-            """, (tweet_id, json.dumps(engagement_metrics) if engagement_metrics else None, thread_id))
+                SET posted = TRUE, status = 'posted', tweet_id = ?, posted_at = ?, publish_token = NULL,
+                    engagement_metrics = COALESCE(?, engagement_metrics)
+                WHERE id = ? AND NOT COALESCE(posted, FALSE) AND (? IS NULL OR publish_token = ?)
+            """, (tweet_id, time.time(), json.dumps(engagement_metrics) if engagement_metrics else None, thread_id,
+                  publish_token, publish_token))
+            conn.commit()
+            return cursor.rowcount == 1
+    def get_generated_thread(self, thread_id: int) -> Optional[Dict]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM generated_threads WHERE id = ?", (thread_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    def get_monitored_content_by_tweet_ids(self, tweet_ids: List[str]) -> List[Dict]:
+        if not tweet_ids:
+            return []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM monitored_content WHERE tweet_id IN ({','.join('?' * len(tweet_ids))})", list(tweet_ids))
+            return [dict(row) for row in cursor.fetchall()]
+    def update_engagement_metrics(self, metrics_by_tweet_id: Dict[str, Dict]):
+        """Refresh engagement_metrics for already-stored tweets in one transaction"""
+        with self.get_connection() as conn:
+            conn.executemany(
+                "UPDATE monitored_content SET engagement_metrics = ? WHERE tweet_id = ?",
+                [(json.dumps(metrics), tweet_id) for tweet_id, metrics in metrics_by_tweet_id.items()]
+            )
             conn.commit()
     def store_mention_response(self, mention_tweet_id: str, mention_content: str, response_content: str, response_tweet_id: str, context_used: str):
         with self.get_connection() as conn:
@@ -147,25 +425,17 @@ class TwitterAgentDB:
             """, (mention_tweet_id, mention_content, response_content, response_tweet_id, context_used))
             conn.commit()
     def update_knowledge_base(self, topic: str, key_concept: str, description: str, source_content_ids: List[int], confidence_score: float = 0.5):
+        """Set one concept outright (knowledge.py merges extracted concepts in batches instead)"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id FROM knowledge_base WHERE topic = ? AND key_concept = ?
-            """, (topic, key_concept))
-            existing = cursor.fetchone()
-            if existing:
-                cursor.execute("""
-                    UPDATE knowledge_base 
-                    SET description = ?, source_content_ids = ?, confidence_score = ?, 
-                        last_updated = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, (description, json.dumps(source_content_ids), confidence_score, existing[0]))
-            else:
-                cursor.execute("""
-                    INSERT INTO knowledge_base 
-                    (topic, key_concept, description, source_content_ids, confidence_score)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (topic, key_concept, description, json.dumps(source_content_ids), confidence_score))
+            conn.execute("""
+                INSERT INTO knowledge_base
+                (topic, key_concept, description, source_content_ids, confidence_score, updated_at)
+                VALUES (?, ?, ?, ?, ?, strftime('%s', 'now'))
+                ON CONFLICT(topic, key_concept) DO UPDATE SET
+                    description = excluded.description, source_content_ids = excluded.source_content_ids,
+                    confidence_score = excluded.confidence_score, updated_at = excluded.updated_at,
+                    last_updated = CURRENT_TIMESTAMP
+            """, (topic, key_concept, description, json.dumps(source_content_ids), confidence_score))
             conn.commit()
     def get_recent_analysis(self, topic: str = None, limit: int = 10) -> List[Dict]:
         with self.get_connection() as conn:
@@ -231,6 +501,7 @@ class TwitterAgentDB:
             cursor.execute("SELECT 1 FROM generated_threads WHERE thread_content LIKE ? LIMIT 1", (f"%{tweet_id}%",))
             return cursor.fetchone() is not None
     def is_similar_content_posted(self, content: str, similarity_threshold: float = 0.9, days: int = 7) -> bool:
+        import difflib
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT thread_content FROM generated_threads WHERE created_at >= datetime('now', ?)", (f'-{days} days',))
@@ -1,110 +1,267 @@
 """
 Glitch Bot Main Runner
+
+Importing this module is cheap: the agent module (and game_sdk behind it), the Twitter plugin,
+the job pipeline and the metrics HTTP server are imported only by the commands that use them,
+and each account's DB is opened on first use (accounts.py). So `printdb` and pipeline workers
+start without loading the GAME SDK. `python -m src.bots.benchmarks startup` measures this.
 """
+import argparse
 import sys
 import os
+import threading
 import time
-from src.bots.config import YOUR_TWITTER_HANDLE, POSTING_CONFIG, ACCOUNTS_TO_MONITOR
-from src.bots.glitch_bot_db import TwitterAgentDB
-from src.bots.glitch_bot_agent import enhanced_glitch_bot_v2
-
-db = TwitterAgentDB("enhanced_glitch_bot_v2.db")
-
-def print_db_contents():
-    print("\n===== DB: monitored_content =====")
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM monitored_content ORDER BY created_at DESC LIMIT 10")
-        for row in cursor.fetchall():
-            print(dict(row))
-    print("\n===== DB: generated_threads =====")
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM generated_threads ORDER BY created_at DESC LIMIT 10")
-        for row in cursor.fetchall():
-            print(dict(row))
-    print("\n===== DB: mentions_responses =====")
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM mentions_responses ORDER BY created_at DESC LIMIT 10")
-        for row in cursor.fetchall():
-            print(dict(row))
-    print("\n===== DB: priority_queue =====")
-    with db.get_connection() as conn:
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT * FROM priority_queue ORDER BY created_at DESC LIMIT 10")
-            for row in cursor.fetchall():
-                print(dict(row))
-        except Exception as e:
-            print("(priority_queue table not found)")
+from src.bots.config import YOUR_TWITTER_HANDLE, POSTING_CONFIG, ACCOUNTS_TO_MONITOR, SCHEDULER_CONFIG, METRICS_CONFIG, STREAM_CONFIG
+from src.bots.accounts import AccountAttribute, load_accounts, set_default_account, use_account
+from src.bots.scheduler import Scheduler, ScheduledTask
+from src.bots.breakers import BREAKERS
+from src.bots.metrics import instrument, snapshot_to_db, start_metrics_server
+from src.bots.tracing import TRACER
+from src.bots.log_utils import configure_logging, get_logger
+
+db = AccountAttribute("db")  # The active account's DB
+log = get_logger("main")
+
+def build_scheduler(agent, clock=None, config: dict = None, account=None, scheduler: Scheduler = None,
+                    stream=None) -> Scheduler:
+    """
+    Register every recurring job with its own cadence from SCHEDULER_CONFIG.
+
+    With account set, the jobs are named "<account>.<job>" and run with that account active, so
+    several accounts can share one scheduler. With a FilteredStream, mention and topic polling
+    stand down while the stream is healthy (it delivers those tweets) and resume if it fails.
+    """
+    from src.bots.glitch_bot_agent import (
+        run_mentions_task, run_timeline_task, run_topic_search_task, run_account_poll_task, run_cleanup_task,
+        run_outbox_task, run_engagement_task, run_follow_task, run_analysis_task,
+        run_knowledge_task
+    )
+    config = {name: dict(task) for name, task in (config or SCHEDULER_CONFIG).items()}
+    # GLITCH_BOT_STEP_DELAY overrides the timeline cadence (seconds)
+    if os.environ.get("GLITCH_BOT_STEP_DELAY"):
+        config["timeline"]["interval"] = int(os.environ["GLITCH_BOT_STEP_DELAY"])
+        config["timeline"]["max_interval"] = max(config["timeline"].get("max_interval", 0), config["timeline"]["interval"])
+    scheduler = scheduler or Scheduler(clock=clock)
+    tasks = {
+        "mentions": run_mentions_task,
+        # The GAME agent decides what to create/post, so its steps run in the posting slots; while the
+        # GAME API is failing its circuit is open and steps fail fast (backing off the task)
+        "posting": BREAKERS.wrap("game", "agent_step", instrument("game.agent_step")(agent.step)),
+        "outbox": run_outbox_task,
+        "timeline": run_timeline_task,
+        "topic_search": run_topic_search_task,
+        "monitored_accounts": run_account_poll_task,
+        "engagement": run_engagement_task,
+        "follows": run_follow_task,
+        "analysis": run_analysis_task,
+        "knowledge": run_knowledge_task,
+        "cleanup": run_cleanup_task,
+        "metrics_snapshot": lambda: snapshot_to_db(db),
+    }
+    if stream is not None:
+        tasks["mentions"] = lambda: run_mentions_task(poll=not stream.healthy())
+        tasks["topic_search"] = lambda: 0 if stream.healthy() else run_topic_search_task()
+    for name, fn in tasks.items():
+        if name in config:
+            if account is not None:
+                name, fn = f"{account.name}.{name}", account.bind(fn)
+            scheduler.add(ScheduledTask.from_config(name, fn, config[name.rsplit(".", 1)[-1]]))
+    return scheduler
+
+def print_db_contents(account):
+    """Latest rows of the account's DB, read-only so a running bot is never blocked (see db_inspect.py)"""
+    from src.bots.db_inspect import print_recent
+    print(f"##### {account.name}: {account.db_path}")
+    try:
+        print_recent(account.db_path)
+    except FileNotFoundError as e:
+        log.warning("%s", e)
+
+def start_stream(accounts, on_mention=None, on_tweet=None):
+    """Connect the filtered stream for these accounts (see streaming.py)"""
+    from src.bots.streaming import FilteredStream, StreamIngestor
+    if not STREAM_CONFIG["bearer_token"]:
+        log.warning("Streaming needs TWITTER_BEARER_TOKEN; falling back to polling")
+        return None
+    try:
+        return FilteredStream(StreamIngestor(accounts, on_mention=on_mention, on_tweet=on_tweet)).start()
+    except Exception as e:
+        log.error("Could not start the filtered stream, falling back to polling: %s", e)
+        return None
 
-def main():
-    if len(sys.argv) > 1 and sys.argv[1] == "printdb":
-        print_db_contents()
+def run_workers(accounts, roles=None, concurrency=None, stop: threading.Event = None, stream: bool = False):
+    """
+    Run pipeline jobs from each account's job table until stopped. Start as many worker processes
+    (on as many hosts sharing the DB file) as needed; they coordinate through job leases.
+    """
+    from src.bots.jobs import JobQueue, JobWorker
+    from src.bots.pipeline import HANDLERS, STREAMED_SOURCES, enqueue_streamed_mention, enqueue_streamed_tweet, schedule_fetches
+    stop = stop or threading.Event()
+    workers = []
+    queues = {account.name: JobQueue(account.db) for account in accounts}
+    filtered_stream = None
+    if stream and (roles is None or "fetch" in roles):
+        filtered_stream = start_stream(
+            accounts,
+            on_mention=lambda account, tweet, is_priority: enqueue_streamed_mention(queues[account.name], is_priority),
+            on_tweet=lambda account, tweet: enqueue_streamed_tweet(queues[account.name], tweet),
+        )
+    for account in accounts:
+        queue = queues[account.name]
+        handlers = {kind: account.bind(fn) for kind, fn in HANDLERS.items()}
+        worker = JobWorker(queue, handlers, roles=roles, concurrency=concurrency)
+        last_housekeeping = [0.0]
+
+        def housekeeping(queue=queue, last=last_housekeeping):
+            # Fetch workers keep the pipeline fed; every worker would do, the dedupe keys make it idempotent
+            now = time.time()
+            if now - last[0] >= queue.config["poll_interval"] * 10:
+                last[0] = now
+                streaming = filtered_stream is not None and filtered_stream.healthy()
+                schedule_fetches(queue, now, skip=STREAMED_SOURCES if streaming else ())
+                queue.purge_done()
+
+        on_idle = housekeeping if "fetch" in worker.roles else None
+        workers.append(threading.Thread(target=account.bind(worker.run_forever), args=(stop, on_idle),
+                                        name=f"worker-{account.name}", daemon=True))
+    for thread in workers:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in workers):
+            for thread in workers:
+                thread.join(timeout=1.0)
+    except KeyboardInterrupt:
+        log.info("Stopping workers")
+        stop.set()
+        for thread in workers:
+            thread.join()
+    if filtered_stream is not None:
+        filtered_stream.stop()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.bots.glitch_bot_main", description="Run Glitch Bot")
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "printdb", "replay", "worker"],
+                        help="'run' the bot (default), 'printdb' to show recent DB rows (python -m src.bots.db_inspect "
+                             "for filters and exports), 'replay' a traffic recording or run a pipeline 'worker'")
+    parser.add_argument("--trace", metavar="PATH", nargs="?", const="glitch_bot_trace.json", default=None,
+                        help="Record span traces (Chrome trace / Perfetto format) to PATH")
+    parser.add_argument("--trace-sample-rate", type=float, default=1.0,
+                        help="Fraction of cycles to trace (default: 1.0)")
+    parser.add_argument("--accounts", metavar="PATH", default=None,
+                        help="JSON file of accounts to run in this process (default: GLITCH_BOT_ACCOUNTS_FILE or the single configured account)")
+    parser.add_argument("--log-level", default=None, help="DEBUG, INFO, WARNING, ... (default: GLITCH_BOT_LOG_LEVEL or INFO)")
+    parser.add_argument("--debug-payloads", action="store_true", default=None,
+                        help="Also log full API responses and LLM outputs at DEBUG level")
+    parser.add_argument("--record", metavar="PATH", default=None,
+                        help="run: append all Twitter/OpenAI traffic to PATH (.gz to compress)")
+    parser.add_argument("--log", metavar="PATH", default=None, help="replay: traffic recording to replay")
+    parser.add_argument("--speed", type=float, default=100.0,
+                        help="replay: time compression factor (default: 100, 0 = as fast as possible)")
+    parser.add_argument("--replay-db", metavar="PATH", default=None,
+                        help="replay: database to write to (default: a scratch file)")
+    parser.add_argument("--stream", action="store_true", default=None,
+                        help="run/worker: ingest mentions and topic tweets from the filtered stream instead of polling "
+                             "(default: GLITCH_BOT_STREAM)")
+    parser.add_argument("--cold-start", action="store_true",
+                        help="run: ignore the state snapshot (GLITCH_BOT_SNAPSHOT) and start from the DB alone")
+    parser.add_argument("--roles", default=None,
+                        help="worker: comma-separated job kinds to run (default: fetch,hydrate,score,generate,post)")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="worker: jobs run at once (default: JOB_QUEUE_CONFIG['concurrency'])")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_logging(level=args.log_level, debug_payloads=args.debug_payloads)
+    accounts = load_accounts(args.accounts)
+    if len(accounts) == 1:
+        # A single account runs unprefixed, unbound tasks: they must find its DB and credentials
+        set_default_account(accounts[0])
+    if args.command == "printdb":
+        for account in accounts:
+            print_db_contents(account)
         sys.exit(0)
-    print("⚡ Starting ENHANCED GLITCH BOT V2...")
-    print("🎯 NEW Smart Following Features:")
-    print(f"   • Priority handling for @{YOUR_TWITTER_HANDLE}")
-    print(f"   • Auto-follow when @{YOUR_TWITTER_HANDLE} tags the bot")
-    print(f"   • Quality-based following for other users")
-    print(f"   • Content quality assessment (15+ score threshold)")
-    print(f"   • Max {POSTING_CONFIG['max_posts_per_hour']} posts/hour")
-    print(f"   • Timeline monitoring of {len(ACCOUNTS_TO_MONITOR)} accounts")
+    if args.trace:
+        TRACER.configure(args.trace, args.trace_sample_rate)
+    if args.command == "replay":
+        if not args.log:
+            log.error("replay needs --log PATH")
+            sys.exit(2)
+        from src.bots.recording import replay_traffic
+        replay_traffic(args.log, speed=args.speed, db_path=args.replay_db)
+        TRACER.shutdown()
+        sys.exit(0)
+    if args.record:
+        if len(accounts) > 1:
+            log.error("--record supports a single account")
+            sys.exit(2)
+        from src.bots.recording import enable_recording
+        enable_recording(args.record)
+    stream_enabled = STREAM_CONFIG["enabled"] if args.stream is None else args.stream
+    if args.command == "worker":
+        from src.bots.jobs import JOB_KINDS
+        roles = [r.strip() for r in args.roles.split(",")] if args.roles else list(JOB_KINDS)
+        unknown = [r for r in roles if r not in JOB_KINDS]
+        if unknown:
+            log.error("Unknown worker role(s): %s", ", ".join(unknown))
+            sys.exit(2)
+        if METRICS_CONFIG["http_port"]:
+            start_metrics_server(METRICS_CONFIG["http_port"], METRICS_CONFIG["http_host"])
+        run_workers(accounts, roles, args.concurrency, stream=stream_enabled)
+        TRACER.shutdown()
+        sys.exit(0)
+    log.info("Starting Enhanced Glitch Bot V2: priority handling and auto-follow for @%s, quality-based following "
+             "for others (15+ score threshold), max %d posts/hour, timeline monitoring of %d accounts",
+             YOUR_TWITTER_HANDLE, POSTING_CONFIG["max_posts_per_hour"], len(ACCOUNTS_TO_MONITOR))
     # Show current metrics
-    metrics = db.get_engagement_metrics()
-    print(f"\n📊 Current Database Metrics:")
-    print(f"   • Content Monitored: {metrics['total_monitored_content']}")
-    print(f"   • Threads Generated: {metrics['total_threads_generated']}")
-    print(f"   • Threads Posted: {metrics['total_threads_posted']}")
-    print(f"   • Mention Responses: {metrics['total_mention_responses']}")
-    print("\n" + "="*60)
-    print("🤖 Enhanced Glitch Bot V2 - Smart Following & Quality Network")
-    print("="*60)
-    # enhanced_glitch_bot_v2.compile()
-    print("✅ Enhanced Glitch Bot V2 compiled!")
-    print("🔄 Starting controlled autonomous operation with smart following...")
-    print(f"⚡ Now prioritizing @{YOUR_TWITTER_HANDLE} with auto-follow...")
-    print("🧠 Quality assessment active for other mentions...")
-    print("🛑 Press Ctrl+C to stop")
-
-    # Configurable delay (default 900s = 15 minutes)
-    DELAY_BETWEEN_STEPS = int(os.environ.get("GLITCH_BOT_STEP_DELAY", POSTING_CONFIG.get("delay_between_steps", 3600)))  # 1 hour for timeline
-    MENTION_CHECK_INTERVAL = 300  # 5 minutes for mentions
-    MAX_BACKOFF = 1800  # 30 minutes
-    backoff = DELAY_BETWEEN_STEPS
+    for account in accounts:
+        log.info("Current database metrics for %s", account.name, extra={"db_metrics": account.db.get_engagement_metrics()})
+    log.info("Starting controlled autonomous operation (Ctrl+C to stop)")
+    from src.bots.glitch_bot_agent import enhanced_glitch_bot_v2
+    from src.bots.warm_restart import WarmRestart
+    if METRICS_CONFIG["http_port"]:
+        start_metrics_server(METRICS_CONFIG["http_port"], METRICS_CONFIG["http_host"])
+    # Posting pacing, rate-limit budgets, task cadences and hot caches from before the restart
+    warm = WarmRestart()
+    if not args.cold_start and warm.load():
+        warm.restore(accounts)
 
     while True:
+        stream = None
+        scheduler = None
         try:
-            agent = enhanced_glitch_bot_v2()
-            agent.compile()
-            while True:
-                try:
-                    agent.run()
-                    time.sleep(MENTION_CHECK_INTERVAL)
-                    backoff = MENTION_CHECK_INTERVAL
-                except Exception as e:
-                    err_str = str(e)
-                    if "429" in err_str or "Too Many Requests" in err_str:
-                        # Identify source
-                        if "twitter" in err_str.lower():
-                            print("[GlitchBot] ⚠️ Rate limited by TWITTER API (429). Backing off for", backoff, "seconds...")
-                        elif "game" in err_str.lower() or "ThrottlerException" in err_str:
-                            print("[GlitchBot] ⚠️ Rate limited by GAME PLATFORM (429). Backing off for", backoff, "seconds...")
-                        else:
-                            print("[GlitchBot] ⚠️ Rate limited (429). Backing off for", backoff, "seconds...")
-                        time.sleep(backoff)
-                        backoff = min(backoff * 2, MAX_BACKOFF)
-                    else:
-                        print("[GlitchBot] ⚠️ Error:", e)
-                        time.sleep(MENTION_CHECK_INTERVAL)
+            scheduler = Scheduler()
+            mention_task = {a.name: f"{a.name}.mentions" if len(accounts) > 1 else "mentions" for a in accounts}
+
+            def wake_mentions(account, tweet, is_priority):
+                # A streamed mention runs its account's mention task now instead of at the next poll
+                if mention_task[account.name] in scheduler.tasks:
+                    scheduler.trigger(mention_task[account.name])
+
+            if stream_enabled:
+                stream = start_stream(accounts, on_mention=wake_mentions)
+            for account in accounts:
+                agent = enhanced_glitch_bot_v2(account)
+                with use_account(account):
+                    agent.compile()
+                build_scheduler(agent, account=account if len(accounts) > 1 else None, scheduler=scheduler, stream=stream)
+            warm.restore_scheduler(scheduler)
+            scheduler.add(ScheduledTask.from_config("state_snapshot", lambda: warm.save(accounts, scheduler),
+                                                    SCHEDULER_CONFIG["state_snapshot"]), run_immediately=False)
+            scheduler.run_forever()
         except KeyboardInterrupt:
-            print("[GlitchBot] Stopped by user.")
+            log.info("Stopped by user")
+            warm.save_quietly(accounts, scheduler)
+            if stream is not None:
+                stream.stop()
+            TRACER.shutdown()
             break
         except Exception as e:
-            print("[GlitchBot] ⚠️ Fatal error:", e)
-            time.sleep(MENTION_CHECK_INTERVAL)
-    # To adjust the delay, set the GLITCH_BOT_STEP_DELAY environment variable or change POSTING_CONFIG['delay_between_steps']
+            log.error("Fatal error: %s", e, exc_info=True)
+            warm.save_quietly(accounts, scheduler)  # The re-created agents resume from here
+            if stream is not None:
+                stream.stop()
+            time.sleep(SCHEDULER_CONFIG["mentions"]["max_interval"])
 
 if __name__ == "__main__":
     main()
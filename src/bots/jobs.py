@@ -0,0 +1,279 @@
+"""
+Glitch Bot Job Queue (typed jobs shared by worker processes through the SQLite DB)
+"""
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List
+
+from src.bots.breakers import CircuitOpen, RateLimited
+from src.bots.config import JOB_QUEUE_CONFIG
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY
+from src.bots.tracing import TRACER, with_current_context
+
+JOB_KINDS = ("fetch", "hydrate", "score", "generate", "post")
+
+log = get_logger("jobs")
+
+
+class JobQueue:
+    """
+    Durable job table. Claiming is one conditional UPDATE tagged with a fresh lease token, so any
+    number of processes (or hosts sharing the DB file) can pull from it without double-claiming.
+    A claimed job stays leased while its worker heartbeats; if the worker dies the lease expires and
+    the job becomes claimable again. Failures retry with exponential backoff until max_attempts,
+    after which the job is parked as 'dead' for inspection (see requeue_dead).
+    """
+
+    def __init__(self, db, config: Dict = None, owner: str = None):
+        self.db = db
+        self.config = dict(JOB_QUEUE_CONFIG, **(config or {}))
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+
+    def enqueue(self, kind: str, payload: Dict = None, priority: int = 5, dedupe_key: str = None,
+                run_at: float = None) -> bool:
+        """Add a job; with dedupe_key set, a second job with the same key is ignored (returns False)"""
+        return self.enqueue_many(kind, [payload], priority, [dedupe_key], run_at) > 0
+
+    def enqueue_many(self, kind: str, payloads: Iterable[Dict], priority: int = 5, dedupe_keys: Iterable[str] = None,
+                     run_at: float = None) -> int:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+        payloads = list(payloads)
+        keys = list(dedupe_keys) if dedupe_keys is not None else [None] * len(payloads)
+        with self.db.get_connection() as conn:
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO jobs (kind, payload, dedupe_key, priority, status, visible_at, created_at)
+                VALUES (?, ?, ?, ?, 'pending', ?, ?)
+            """, [(kind, json.dumps(p or {}), k, priority, run_at or 0, now) for p, k in zip(payloads, keys)])
+            conn.commit()
+            return conn.total_changes - before
+
+    def _expire_leases(self, cursor, now: float):
+        cursor.execute("""
+            UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'dead' ELSE 'pending' END,
+                lease_owner = NULL, lease_token = NULL, lease_expires_at = NULL,
+                last_error = COALESCE(last_error, 'lease expired')
+            WHERE status = 'leased' AND lease_expires_at < ?
+        """, (self.config["max_attempts"], now))
+
+    def claim(self, kinds: Iterable[str], limit: int = 1, lease_seconds: float = None) -> List[Dict]:
+        """Atomically lease up to limit visible jobs of the given kinds (lowest priority value first)"""
+        kinds = list(kinds)
+        now = time.time()
+        token = uuid.uuid4().hex
+        lease = lease_seconds or self.config["lease_seconds"]
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            self._expire_leases(cursor, now)
+            cursor.execute(f"""
+                UPDATE jobs
+                SET status = 'leased', lease_owner = ?, lease_token = ?, lease_expires_at = ?, attempts = attempts + 1
+                WHERE id IN (
+                    SELECT id FROM jobs
+                    WHERE status = 'pending' AND kind IN ({','.join('?' * len(kinds))}) AND visible_at <= ?
+                    ORDER BY priority, visible_at, id
+                    LIMIT ?
+                )
+            """, (self.owner, token, now + lease, *kinds, now, limit))
+            conn.commit()
+            if cursor.rowcount == 0:
+                return []
+            cursor.execute("SELECT * FROM jobs WHERE lease_token = ? ORDER BY priority, id", (token,))
+            jobs = [dict(row) for row in cursor.fetchall()]
+        for job in jobs:
+            job["payload"] = json.loads(job["payload"] or "{}")
+        return jobs
+
+    def heartbeat(self, jobs: List[Dict], lease_seconds: float = None) -> List[int]:
+        """Renew the leases of running jobs; returns the ids whose lease was lost"""
+        if not jobs:
+            return []
+        expires = time.time() + (lease_seconds or self.config["lease_seconds"])
+        lost = []
+        with self.db.get_connection() as conn:
+            for job in jobs:
+                cursor = conn.execute("""
+                    UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = 'leased' AND lease_token = ?
+                """, (expires, job["id"], job["lease_token"]))
+                if cursor.rowcount == 0:
+                    lost.append(job["id"])
+            conn.commit()
+        return lost
+
+    def complete(self, job: Dict) -> bool:
+        """Mark a job done; False if its lease had already been lost (another worker may rerun it)"""
+        with self.db.get_connection() as conn:
+            cursor = conn.execute("""
+                UPDATE jobs SET status = 'done', completed_at = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE id = ? AND lease_token = ?
+            """, (time.time(), job["id"], job["lease_token"]))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def retry_delay(self, attempts: int) -> float:
+        delay = min(self.config["retry_delay"] * (2 ** max(attempts - 1, 0)), self.config["max_retry_delay"])
+        return delay * random.uniform(0.8, 1.2)
+
+    def fail(self, job: Dict, error: str, delay: float = None, count_attempt: bool = True) -> str:
+        """
+        Schedule a retry with backoff, or dead-letter the job once it has used its attempts.
+        count_attempt=False hands back the attempt the claim took (for deferrals that aren't errors).
+        """
+        refund = 0 if count_attempt else 1
+        if count_attempt and job["attempts"] >= self.config["max_attempts"]:
+            status, visible_at = "dead", 0
+        else:
+            status = "pending"
+            visible_at = time.time() + (delay if delay is not None else self.retry_delay(job["attempts"]))
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                UPDATE jobs SET status = ?, visible_at = ?, last_error = ?, attempts = MAX(attempts - ?, 0),
+                    lease_owner = NULL, lease_token = NULL, lease_expires_at = NULL
+                WHERE id = ? AND lease_token = ?
+            """, (status, visible_at, (error or "")[:500], refund, job["id"], job["lease_token"]))
+            conn.commit()
+        return status
+
+    def requeue_dead(self, kind: str = None) -> int:
+        """Give dead-lettered jobs a fresh set of attempts"""
+        with self.db.get_connection() as conn:
+            cursor = conn.execute(f"""
+                UPDATE jobs SET status = 'pending', attempts = 0, visible_at = 0
+                WHERE status = 'dead' {"AND kind = ?" if kind else ""}
+            """, (kind,) if kind else ())
+            conn.commit()
+            return cursor.rowcount
+
+    def purge_done(self, older_than: float = None) -> int:
+        cutoff = time.time() - (older_than if older_than is not None else self.config["keep_done_seconds"])
+        with self.db.get_connection() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE status = 'done' AND completed_at < ?", (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+
+    def count(self, kind: str, statuses: Iterable[str] = ("pending", "leased")) -> int:
+        statuses = list(statuses)
+        with self.db.get_connection() as conn:
+            return conn.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE kind = ? AND status IN ({','.join('?' * len(statuses))})",
+                (kind, *statuses)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Job counts per kind and status"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status").fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for kind, status, n in rows:
+            counts.setdefault(kind, {})[status] = n
+        return counts
+
+
+class RetryLater(Exception):
+    """Raised by a handler to reschedule its job after delay seconds without counting it as an error"""
+
+    def __init__(self, delay: float, reason: str = ""):
+        super().__init__(reason or f"retry in {delay:.0f}s")
+        self.delay = delay
+
+
+class JobWorker:
+    """
+    Claims jobs of its roles and runs them on a small thread pool, heartbeating their leases while
+    they run. handlers maps a job kind to fn(job, queue); raising fails the job (retry/dead-letter),
+    raising RetryLater reschedules it.
+    """
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[Dict, JobQueue], object]],
+                 roles: Iterable[str] = None, concurrency: int = None):
+        self.queue = queue
+        self.handlers = handlers
+        self.roles = [r for r in (roles or handlers) if r in handlers]
+        self.concurrency = concurrency or queue.config["concurrency"]
+        self._running: Dict[int, Dict] = {}
+        self._running_lock = threading.Lock()
+
+    def _run_job(self, job: Dict) -> str:
+        kind = job["kind"]
+        start = time.perf_counter()
+        try:
+            with TRACER.span(f"job.{kind}", job_id=job["id"], attempt=job["attempts"]):
+                self.handlers[kind](job, self.queue)
+            outcome = "done" if self.queue.complete(job) else "lost"
+        except RetryLater as e:
+            # Not the job's fault (e.g. rate limit or posting slot): don't burn an attempt
+            self.queue.fail(job, str(e), delay=e.delay, count_attempt=False)
+            outcome = "deferred"
+        except (CircuitOpen, RateLimited) as e:
+            # The upstream is down or out of budget: wait for its circuit to let calls through again
+            self.queue.fail(job, f"{type(e).__name__}: {e}", delay=e.retry_after or self.queue.config["retry_delay"],
+                            count_attempt=False)
+            outcome = "deferred"
+        except Exception as e:
+            outcome = "dead" if self.queue.fail(job, f"{type(e).__name__}: {e}") == "dead" else "failed"
+            log.warning("Job %s (%s) failed on attempt %d: %s", job["id"], kind, job["attempts"], e)
+        finally:
+            with self._running_lock:
+                self._running.pop(job["id"], None)
+        REGISTRY.counter("glitchbot_jobs_total", {"kind": kind, "outcome": outcome}, "Jobs run by kind and outcome").inc()
+        REGISTRY.histogram("glitchbot_job_seconds", {"kind": kind}, "Job run time").observe(time.perf_counter() - start)
+        return outcome
+
+    def run_once(self, pool: ThreadPoolExecutor = None) -> int:
+        """Claim one batch and run it to completion; returns how many jobs ran"""
+        jobs = self.queue.claim(self.roles, limit=self.concurrency)
+        if not jobs:
+            return 0
+        with self._running_lock:
+            self._running.update({job["id"]: job for job in jobs})
+        if pool is None or len(jobs) == 1:
+            for job in jobs:
+                self._run_job(job)
+        else:
+            list(pool.map(with_current_context(self._run_job), jobs))
+        return len(jobs)
+
+    def _heartbeat_loop(self, stop: threading.Event):
+        while not stop.wait(self.queue.config["heartbeat_interval"]):
+            with self._running_lock:
+                running = list(self._running.values())
+            try:
+                lost = self.queue.heartbeat(running)
+                if lost:
+                    log.warning("Lost leases on jobs %s", lost)
+            except Exception as e:
+                log.error("Heartbeat failed: %s", e)
+
+    def run_forever(self, stop: threading.Event = None, on_idle: Callable[[], object] = None, max_jobs: int = None):
+        """Poll until stop is set (or max_jobs have run), backing off while the queue is empty"""
+        stop = stop or threading.Event()
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat_loop, args=(heartbeat_stop,), name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        wait = self.queue.config["poll_interval"]
+        ran_total = 0
+        log.info("Worker %s started for roles %s", self.queue.owner, ",".join(self.roles))
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+                while not stop.is_set() and (max_jobs is None or ran_total < max_jobs):
+                    if on_idle:
+                        on_idle()
+                    ran = self.run_once(pool)
+                    ran_total += ran
+                    if ran:
+                        wait = self.queue.config["poll_interval"]
+                    else:
+                        stop.wait(wait)
+                        wait = min(wait * 2, self.queue.config["max_poll_interval"])
+        finally:
+            heartbeat_stop.set()
+        return ran_total
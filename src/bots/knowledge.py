@@ -0,0 +1,276 @@
+"""
+Glitch Bot Knowledge Base (concepts merged incrementally from the analysed tweets)
+
+Each run takes analysis_results rows not merged yet (a partial index keeps that backlog cheap to
+find), batch_size at a time, and turns their key points into evidence:
+
+    topic       the knowledge-base topic (KNOWLEDGE_CONFIG["topics"]) of the row's monitored topic,
+                or failing that of the words in the tweet; rows matching no topic are skipped
+    concept     each key point, normalised (lower case, no leading #)
+    confidence  importance / evidence_scale, at most max_evidence, combined across the tweets in
+                the batch that support the concept
+
+A batch is merged in one transaction: a single executemany of INSERT ... ON CONFLICT(topic,
+key_concept) DO UPDATE, which also marks its analysis_results merged. Confidence from
+independent sources combines as 1 - (1 - old) * (1 - new). Old confidence decays first, halving
+every half_life_days since the concept last had evidence. Decay is applied whenever a concept
+is read or merged, never written back on its own. Concepts whose decayed confidence falls below
+min_confidence are deleted.
+
+The top_k concepts per topic live in an in-process cache (KnowledgeCache). The builder refreshes
+it after each run, and the agent state and prompts read it through top_knowledge() without a
+query. A process that doesn't build re-reads a topic after cache_ttl seconds.
+"""
+import json
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.bots.config import KNOWLEDGE_CONFIG
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY
+
+log = get_logger("knowledge")
+
+
+def decay_factor(age_seconds: float, half_life_days: float = None) -> float:
+    half_life = (half_life_days or KNOWLEDGE_CONFIG["half_life_days"]) * 86400
+    return 0.5 ** (max(age_seconds or 0.0, 0.0) / half_life)
+
+
+def _merge_ids(old: Optional[str], new: Optional[str], limit: int) -> str:
+    """Two JSON id lists as one, newest last, without duplicates, at most limit long"""
+    try:
+        ids = (json.loads(old) if old else []) + (json.loads(new) if new else [])
+    except (TypeError, ValueError):
+        ids = json.loads(new) if new else []
+    return json.dumps(list(dict.fromkeys(ids))[-limit:])
+
+
+class KnowledgeCache:
+    """The top concepts per topic, as rows shaped like get_knowledge_for_topic's (confidence already decayed)"""
+
+    def __init__(self):
+        self._topics: Dict[str, Tuple[float, List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, topic: str, ttl: float) -> Optional[List[Dict]]:
+        entry = self._topics.get(topic)
+        if entry is None or time.monotonic() - entry[0] > ttl:
+            return None
+        return entry[1]
+
+    def set(self, topic: str, rows: List[Dict]):
+        with self._lock:
+            self._topics[topic] = (time.monotonic(), rows)
+
+    def clear(self):
+        with self._lock:
+            self._topics.clear()
+
+    def dump(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        return {topic: {"age": round(now - loaded, 1), "rows": rows} for topic, (loaded, rows) in list(self._topics.items())}
+
+    def load(self, data: Dict[str, Dict], elapsed: float = 0.0):
+        """Put back dump()ed topics saved elapsed seconds ago; they expire as if the process had kept running"""
+        now = time.monotonic()
+        with self._lock:
+            for topic, entry in data.items():
+                self._topics[topic] = (now - entry["age"] - elapsed, entry["rows"])
+
+
+_CACHES: Dict[str, KnowledgeCache] = {}
+_caches_lock = threading.Lock()
+
+
+def knowledge_cache(db) -> KnowledgeCache:
+    """The cache for db's file (one per account database per process)"""
+    cache = _CACHES.get(db.db_path)
+    if cache is None:
+        with _caches_lock:
+            cache = _CACHES.setdefault(db.db_path, KnowledgeCache())
+    return cache
+
+
+def dump_knowledge_caches() -> Dict[str, Dict]:
+    """Every database's cached topics, for the warm-restart snapshot (see warm_restart.py)"""
+    return {db_path: cache.dump() for db_path, cache in list(_CACHES.items())}
+
+
+def load_knowledge_caches(data: Dict[str, Dict], elapsed: float = 0.0):
+    for db_path, topics in data.items():
+        with _caches_lock:
+            cache = _CACHES.setdefault(db_path, KnowledgeCache())
+        cache.load(topics, elapsed)
+
+
+class KnowledgeBuilder:
+    def __init__(self, db, config: Dict = None):
+        self.db = db
+        self.config = dict(KNOWLEDGE_CONFIG, **(config or {}))
+        self.cache = knowledge_cache(db)
+        self._terms = {topic: [term.lower() for term in terms] for topic, terms in self.config["topics"].items()}
+        self._patterns = {topic: re.compile(r"\b(?:" + "|".join(re.escape(term) for term in terms) + r")\b")
+                          for topic, terms in self._terms.items()}
+
+    def topic_of(self, monitored_topic: Optional[str], content: str) -> Optional[str]:
+        monitored_topic = (monitored_topic or "").lower()
+        for topic, terms in self._terms.items():
+            if monitored_topic == topic.lower() or monitored_topic in terms:
+                return topic
+        lower = (content or "").lower()
+        for topic, pattern in self._patterns.items():
+            if pattern.search(lower):
+                return topic
+        return None
+
+    def evidence(self, rows: List[Dict]) -> Dict[Tuple[str, str], Dict]:
+        """(topic, concept) -> combined confidence, supporting content ids and the best tweet as description"""
+        found: Dict[Tuple[str, str], Dict] = {}
+        for row in rows:
+            topic = self.topic_of(row["topic"], row["content"])
+            if topic is None:
+                continue
+            try:
+                key_points = json.loads(row["key_points"] or "[]")
+            except (TypeError, ValueError):
+                continue
+            confidence = min(max((row["importance_score"] or 0) / self.config["evidence_scale"], 0.0),
+                             self.config["max_evidence"])
+            if confidence <= 0:
+                continue
+            description = " ".join((row["content"] or "").split())[:200]
+            for point in key_points:
+                concept = str(point).strip().lstrip("#").lower()
+                if len(concept) < 3 or concept in self._terms[topic]:
+                    continue
+                entry = found.setdefault((topic, concept), {"confidence": 0.0, "ids": [], "sources": 0,
+                                                            "description": description, "best": 0.0})
+                entry["confidence"] = 1 - (1 - entry["confidence"]) * (1 - confidence)
+                entry["ids"].append(row["content_id"])
+                entry["sources"] += 1
+                if confidence > entry["best"]:
+                    entry["best"], entry["description"] = confidence, description
+        return found
+
+    def _register_functions(self, conn):
+        conn.create_function("kb_decay", 1, lambda age: decay_factor(age, self.config["half_life_days"]),
+                             deterministic=True)
+        conn.create_function("kb_merge_ids", 2, lambda old, new: _merge_ids(old, new, self.config["max_source_ids"]),
+                             deterministic=True)
+
+    def _merge_batch(self, now: float) -> Tuple[int, int]:
+        """Merge the next batch in one transaction; returns (analysis rows consumed, concepts upserted)"""
+        with self.db.get_connection() as conn:
+            self._register_functions(conn)
+            conn.execute("BEGIN IMMEDIATE")  # One merger at a time, so no batch is merged twice
+            rows = [dict(row) for row in conn.execute("""
+                SELECT a.id, a.content_id, a.topic, a.key_points, a.importance_score, m.content
+                FROM analysis_results a LEFT JOIN monitored_content m ON m.id = a.content_id
+                WHERE a.knowledge_merged = 0 ORDER BY a.id LIMIT ?
+            """, (self.config["batch_size"],))]
+            if not rows:
+                conn.rollback()
+                return 0, 0
+            found = self.evidence(rows)
+            conn.executemany("""
+                INSERT INTO knowledge_base
+                (topic, key_concept, description, source_content_ids, confidence_score, sources, updated_at)
+                VALUES (:topic, :concept, :description, :ids, :confidence, :sources, :now)
+                ON CONFLICT(topic, key_concept) DO UPDATE SET
+                    confidence_score = MIN(:max_confidence, 1 - (1 - knowledge_base.confidence_score
+                        * kb_decay(:now - COALESCE(knowledge_base.updated_at, :now))) * (1 - excluded.confidence_score)),
+                    description = CASE WHEN excluded.confidence_score >= knowledge_base.confidence_score
+                        * kb_decay(:now - COALESCE(knowledge_base.updated_at, :now))
+                        THEN excluded.description ELSE knowledge_base.description END,
+                    source_content_ids = kb_merge_ids(knowledge_base.source_content_ids, excluded.source_content_ids),
+                    sources = COALESCE(knowledge_base.sources, 0) + excluded.sources,
+                    updated_at = excluded.updated_at,
+                    last_updated = CURRENT_TIMESTAMP
+            """, [{"topic": topic, "concept": concept, "description": entry["description"],
+                   "ids": json.dumps(entry["ids"][-self.config["max_source_ids"]:]),
+                   "confidence": min(entry["confidence"], self.config["max_confidence"]), "sources": entry["sources"],
+                   "now": now, "max_confidence": self.config["max_confidence"]}
+                  for (topic, concept), entry in found.items()])
+            conn.execute("""
+                UPDATE analysis_results SET knowledge_merged = 1 WHERE knowledge_merged = 0 AND id BETWEEN ? AND ?
+            """, (rows[0]["id"], rows[-1]["id"]))
+            conn.commit()
+        return len(rows), len(found)
+
+    def prune(self, now: float = None) -> int:
+        """Delete concepts whose decayed confidence has fallen below min_confidence"""
+        now = now or time.time()
+        with self.db.get_connection() as conn:
+            self._register_functions(conn)
+            pruned = conn.execute("""
+                DELETE FROM knowledge_base
+                WHERE COALESCE(confidence_score, 0) * kb_decay(? - COALESCE(updated_at, ?)) < ?
+            """, (now, now, self.config["min_confidence"])).rowcount
+            conn.commit()
+        return pruned
+
+    def load_top(self, topics: List[str] = None, now: float = None) -> Dict[str, List[Dict]]:
+        """The top_k concepts of each topic by decayed confidence, from the DB; stores them in the cache"""
+        now = now or time.time()
+        topics = topics or list(self.config["topics"])
+        k = self.config["top_k"]
+        by_topic: Dict[str, List[Dict]] = {topic: [] for topic in topics}
+        with self.db.get_connection() as conn:
+            for topic in topics:
+                # Stored confidence is undecayed; a few times k candidates are enough to rank the decayed top k
+                for row in conn.execute("""
+                    SELECT topic, key_concept, description, source_content_ids, confidence_score, sources, updated_at,
+                           last_updated
+                    FROM knowledge_base WHERE topic = ? ORDER BY confidence_score DESC LIMIT ?
+                """, (topic, k * 4)):
+                    row = dict(row)
+                    row["confidence_score"] = round((row["confidence_score"] or 0)
+                                                    * decay_factor(now - (row["updated_at"] or now), self.config["half_life_days"]), 4)
+                    by_topic[topic].append(row)
+        for topic, rows in by_topic.items():
+            rows.sort(key=lambda r: -r["confidence_score"])
+            self.cache.set(topic, rows[:k])
+            by_topic[topic] = rows[:k]
+        return by_topic
+
+    def run(self, now: float = None, max_batches: int = None) -> Dict:
+        """Merge new analysis results batch by batch, prune decayed concepts and refresh the cache"""
+        now = now or time.time()
+        stats = {"analysis_rows": 0, "concepts": 0, "batches": 0}
+        for _ in range(max_batches or self.config["max_batches_per_run"]):
+            consumed, concepts = self._merge_batch(now)
+            if not consumed:
+                break
+            stats["analysis_rows"] += consumed
+            stats["concepts"] += concepts
+            stats["batches"] += 1
+        stats["pruned"] = self.prune(now)
+        self.load_top(now=now)
+        REGISTRY.counter("glitchbot_knowledge_concepts_merged_total", {}, "Concept evidence merged into the knowledge base").inc(stats["concepts"])
+        if stats["pruned"]:
+            REGISTRY.counter("glitchbot_knowledge_concepts_pruned_total", {}, "Concepts dropped after decaying").inc(stats["pruned"])
+        if stats["analysis_rows"]:
+            log.info("Merged %d analysed tweets into %d concepts (%d pruned)", stats["analysis_rows"], stats["concepts"], stats["pruned"])
+        return stats
+
+
+def knowledge_topic(topic: str) -> str:
+    """The knowledge-base topic a monitored topic belongs to ("bitcoin" -> "crypto"); unknown topics map to themselves"""
+    lower = (topic or "").lower()
+    for name, terms in KNOWLEDGE_CONFIG["topics"].items():
+        if lower == name.lower() or lower in terms:
+            return name
+    return topic
+
+
+def top_knowledge(db, topic: str, limit: int = None) -> List[Dict]:
+    """The topic's top concepts from the in-process cache, read from the DB only when missing or older than cache_ttl"""
+    topic = knowledge_topic(topic)
+    cache = knowledge_cache(db)
+    rows = cache.get(topic, KNOWLEDGE_CONFIG["cache_ttl"])
+    if rows is None:
+        rows = KnowledgeBuilder(db).load_top([topic])[topic]
+    return rows[:limit] if limit else rows
@@ -1,152 +1,228 @@
 """
 Glitch Bot LLM (OpenAI) Helpers
 """
+import hashlib
 import os
+import re
+import threading
 import time
+from typing import Dict, List, Tuple
+from src.bots.config import LLM_CONFIG, PROMPT_CONFIG
+from src.bots.breakers import BREAKERS, CircuitOpen
+from src.bots.metrics import REGISTRY, instrument
+from src.bots.prompts import ANALYSIS_PROMPT, MENTION_PROMPT, QUOTE_PROMPT, count_tokens, fit_prompt, trim_to_tokens
+from src.bots.tracing import annotate
+from src.bots.log_utils import get_logger, log_payload
+from src.bots.caches import LLM_CACHE, request_key
+
+log = get_logger("llm")
 
 # Simple rate limiter globals
 OPENAI_CALLS_THIS_HOUR = 0
 OPENAI_HOUR_START = time.time()
 OPENAI_MAX_CALLS_PER_HOUR = 10  # Set your desired limit
+# Background work (batch analysis) only spends the budget while this many calls are still left for replies and quotes
+OPENAI_RESERVED_CALLS_PER_HOUR = 6
+_openai_limit_lock = threading.Lock()  # Mention workers share the hourly budget
 
-def can_call_openai():
+def can_call_openai(background: bool = False):
     global OPENAI_CALLS_THIS_HOUR, OPENAI_HOUR_START
-    now = time.time()
-    if now - OPENAI_HOUR_START > 3600:
-        OPENAI_HOUR_START = now
-        OPENAI_CALLS_THIS_HOUR = 0
-    if OPENAI_CALLS_THIS_HOUR < OPENAI_MAX_CALLS_PER_HOUR:
-        OPENAI_CALLS_THIS_HOUR += 1
-        return True
+    limit = OPENAI_MAX_CALLS_PER_HOUR - (OPENAI_RESERVED_CALLS_PER_HOUR if background else 0)
+    with _openai_limit_lock:
+        now = time.time()
+        if now - OPENAI_HOUR_START > 3600:
+            OPENAI_HOUR_START = now
+            OPENAI_CALLS_THIS_HOUR = 0
+        if OPENAI_CALLS_THIS_HOUR < limit:
+            OPENAI_CALLS_THIS_HOUR += 1
+            return True
+    if background:
+        log.info("No spare OpenAI budget this hour (%d calls kept for replies), skipping background LLM call",
+                 OPENAI_RESERVED_CALLS_PER_HOUR)
     else:
-        print(f"[OpenAI] Hourly rate limit ({OPENAI_MAX_CALLS_PER_HOUR}) reached, skipping LLM call.")
-        return False
-
-def generate_thread_with_llm(topic: str, knowledge: list, insights: str, mention_author: str = None, mention_url: str = None) -> str:
-    if not can_call_openai():
-        return ""
-    openai_api_key = os.environ.get("OPENAI_API_KEY")
-    if not openai_api_key:
-        print("[generate_thread_with_llm] OPENAI_API_KEY not set in environment.")
-        return ""
-    try:
-        import openai as openai_new
-        client = openai_new.OpenAI(api_key=openai_api_key)
-    except Exception as e:
-        print(f"[generate_thread_with_llm] OpenAI v1.x import error: {e}")
-        return ""
-    knowledge_text = "\n".join([k["key_concept"] + ": " + k.get("description", "") for k in knowledge]) if knowledge else ""
-    prompt = f"""
-You are Glitch Bot, an AI with a sharp, insightful tone. You have been tagged in a Twitter post by @{mention_author or 'someone'}{f' (see: {mention_url})' if mention_url else ''}.
+        log.warning("Hourly OpenAI rate limit (%d) reached, skipping LLM call", OPENAI_MAX_CALLS_PER_HOUR)
+    return False
 
-Analyze the content of the mention below, extract the most interesting or important information, and share it in a single, engaging tweet. Reference the user who tagged you (@{mention_author or 'someone'}), and summarize the key point or insight from the mention. If there is a link or media, mention it if relevant. Use your unique voice, but be concise and insightful. Do NOT write a thread. Stay under 280 characters.
+_openai_client_override = None
 
-Mention content:
-{insights}
+def set_openai_client(client):
+    """Route every LLM call through client (fakes, recorders); None restores the real OpenAI client"""
+    global _openai_client_override
+    _openai_client_override = client
 
-Knowledge base:
-{knowledge_text}
-"""
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=300,
-            temperature=0.8
-        )
-        content = response.choices[0].message.content.strip()
-        print(f"[generate_thread_with_llm] LLM generated: {content}")
-        return content
-    except Exception as e:
-        print(f"[generate_thread_with_llm] OpenAI v1.x error: {e}")
-        return ""
-
-def generate_reply_to_mention(topic: str, knowledge: list, mention_content: str, mention_author: str = None, mention_url: str = None) -> str:
-    if not can_call_openai():
-        return ""
+def get_openai_client(caller: str = "llm_utils"):
+    """OpenAI v1.x client, or None (after logging why) if it can't be created"""
+    if _openai_client_override is not None:
+        return _openai_client_override
     openai_api_key = os.environ.get("OPENAI_API_KEY")
     if not openai_api_key:
-        print("[generate_reply_to_mention] OPENAI_API_KEY not set in environment.")
-        return ""
+        log.error("[%s] OPENAI_API_KEY not set in environment", caller)
+        return None
     try:
         import openai as openai_new
-        client = openai_new.OpenAI(api_key=openai_api_key)
+        return openai_new.OpenAI(api_key=openai_api_key)
     except Exception as e:
-        print(f"[generate_reply_to_mention] OpenAI v1.x import error: {e}")
-        return ""
-    knowledge_text = "\n".join([k["key_concept"] + ": " + k.get("description", "") for k in knowledge]) if knowledge else ""
-    prompt = f"""
-You are Glitch Bot, an AI with a sharp, insightful tone. You have been tagged in a Twitter post by @{mention_author or 'someone'}{f' (see: {mention_url})' if mention_url else ''}.
-
-Analyze the content of the mention below, extract the most interesting or important information, and share it in a single, engaging tweet reply. Reference the user who tagged you (@{mention_author or 'someone'}), and summarize the key point or insight from the mention. If there is a link or media, mention it if relevant. Use your unique voice, but be concise and insightful. Do NOT write a thread. Stay under 280 characters.
-
-Mention content:
-{mention_content}
-
-Knowledge base:
-{knowledge_text}
-"""
+        log.error("[%s] OpenAI v1.x import error: %s", caller, e)
+        return None
+
+_SENTENCE_END = re.compile(r"[.!?…](?=\s|$)")
+
+def cut_to_length(text: str, max_chars: int) -> str:
+    """
+    text if it fits in max_chars; otherwise its longest prefix ending a sentence, or failing that
+    a cut at a word boundary marked with an ellipsis
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return text
+    ends = [m.end() for m in _SENTENCE_END.finditer(text, 0, max_chars + 1) if m.end() <= max_chars]
+    if ends:
+        return text[:ends[-1]]
+    return text[:max_chars - 1].rsplit(" ", 1)[0].rstrip(" ,;:") + "…"
+
+def _is_skip(text: str) -> bool:
+    return text.lstrip()[:4].upper() == "SKIP"
+
+def _read_stream(stream, max_chars: int = None) -> Tuple[str, str]:
+    """
+    Consume a streamed completion, closing it (which ends generation) as soon as the output starts
+    with SKIP or runs past max_chars; returns the text received and why reading stopped
+    """
+    text, reason = "", "stop"
     try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=300,
-            temperature=0.8
-        )
-        content = response.choices[0].message.content.strip()
-        print(f"[generate_reply_to_mention] LLM generated: {content}")
-        return content
-    except Exception as e:
-        print(f"[generate_reply_to_mention] OpenAI v1.x error: {e}")
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            text += delta
+            if _is_skip(text):
+                reason = "skip"
+                break
+            if max_chars and len(text.strip()) > max_chars:
+                reason = "length"
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return text, reason
+
+def _chat_completion(caller: str, prompt: str, max_tokens: int, temperature: float, model: str = "gpt-4",
+                     max_chars: int = None, keep_skip: bool = False, background: bool = False) -> str:
+    """
+    Run one chat completion. Identical low-temperature prompts (up to LLM_CONFIG["cache_max_temperature"],
+    e.g. a batch analysis repeated after a restart) are answered from the process-wide LLM cache
+    without spending the hourly budget. Creative calls always go to the model, so accounts tagged in
+    the same thread, or a retry after a duplicate was rejected, get fresh text.
+
+    With LLM_CONFIG["stream"] the completion is streamed and cut off once it passes max_chars
+    (keeping whole sentences) or starts with SKIP, so no time or tokens go on text that would be
+    truncated or thrown away. A SKIP answer comes back as "" (or "SKIP" with keep_skip, for callers
+    that need to tell it from a failed call).
+
+    Each model has its own circuit breaker (breakers.py): while it is open the call returns ""
+    at once, without spending the hourly budget or waiting for a timeout. Background calls only use
+    the hourly budget beyond OPENAI_RESERVED_CALLS_PER_HOUR, so they never starve mention replies.
+    """
+    cacheable = temperature <= LLM_CONFIG["cache_max_temperature"]
+    key = request_key(model, hashlib.sha1(prompt.encode("utf-8")).hexdigest(), max_tokens, temperature)
+    cached = LLM_CACHE.get(key) if cacheable else None
+    if cached is not None:
+        annotate(model=model, llm_cache_hit=True)
+        return "" if _is_skip(cached) and not keep_skip else cached
+    if BREAKERS.is_open("openai", model):
+        log.info("[%s] Skipping LLM call: the %s circuit is open", caller, model)
         return ""
-
-def generate_quote_tweet_comment(topic: str, knowledge: list, tweet_content: str, tweet_url: str = None) -> str:
-    if not can_call_openai():
+    if not can_call_openai(background):
         return ""
-    openai_api_key = os.environ.get("OPENAI_API_KEY")
-    if not openai_api_key:
-        print("[generate_quote_tweet_comment] OPENAI_API_KEY not set in environment.")
+    client = get_openai_client(caller)
+    if client is None:
         return ""
     try:
-        import openai as openai_new
-        client = openai_new.OpenAI(api_key=openai_api_key)
-    except Exception as e:
-        print(f"[generate_quote_tweet_comment] OpenAI v1.x import error: {e}")
+        request = {"model": model, "messages": [{"role": "system", "content": prompt}],
+                   "max_tokens": max_tokens, "temperature": temperature}
+        if LLM_CONFIG["stream"]:
+            # Failures part-way through the stream count against the breaker too
+            raw, reason = BREAKERS.call("openai", model, lambda: _read_stream(
+                client.chat.completions.create(stream=True, **request), max_chars))
+            # Streams report no usage (and none at all when cut off), so both counts are estimates
+            prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(raw)
+            content = "SKIP" if reason == "skip" else cut_to_length(raw, max_chars) if max_chars else raw.strip()
+            if reason != "stop":
+                REGISTRY.counter("glitchbot_llm_stream_cutoffs_total", {"caller": caller, "reason": reason},
+                                 "Streamed completions closed early").inc()
+            annotate(llm_streamed=True, llm_stop_reason=reason)
+        else:
+            response = BREAKERS.call("openai", model, client.chat.completions.create, **request)
+            content = response.choices[0].message.content.strip()
+            usage = getattr(response, "usage", None)
+            # Providers that omit usage still get counted, with the local estimate
+            prompt_tokens = getattr(usage, "prompt_tokens", None) or count_tokens(prompt)
+            completion_tokens = getattr(usage, "completion_tokens", None) or count_tokens(content)
+            if max_chars:
+                content = cut_to_length(content, max_chars)
+        annotate(model=model, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        REGISTRY.counter("glitchbot_llm_tokens_total", {"caller": caller, "kind": "prompt"}, "LLM tokens used, by caller").inc(prompt_tokens)
+        REGISTRY.counter("glitchbot_llm_tokens_total", {"caller": caller, "kind": "completion"}).inc(completion_tokens)
+        log.debug("[%s] LLM generated %d chars (%d prompt + %d completion tokens)", caller, len(content), prompt_tokens, completion_tokens)
+        log_payload(log, "[%s] LLM output", content, caller)
+        if content and cacheable:
+            LLM_CACHE.set(key, content)
+        return "" if _is_skip(content) and not keep_skip else content
+    except CircuitOpen as e:
+        log.info("[%s] Skipping LLM call: %s", caller, e)
         return ""
-    knowledge_text = "\n".join([k["key_concept"] + ": " + k.get("description", "") for k in knowledge]) if knowledge else ""
-    prompt = f"""
-You are Glitch Bot, an enigmatic, hacker-inspired AI. You are about to quote tweet the following post on X (Twitter):
-
-Quoted tweet:
-{tweet_content}
-{f'Tweet URL: {tweet_url}' if tweet_url else ''}
-
-Topic: {topic}
-Knowledge base:
-{knowledge_text}
-
-**IMPORTANT RULES:**
-- Only post if you have a genuinely interesting, insightful, or surprising comment about the quoted tweet.
-- NEVER post about your own process, engagement metrics, or strategy.
-- NEVER post generic, obvious, or meta statements (e.g., "Analyzing engagement metrics", "Based on the data", "Here's what I think").
-- If you have nothing genuinely interesting to say, output only: SKIP
-- Your post should be concise, insightful, and relevant to the quoted tweet. Add value, context, or a clever hacker-culture remark. Reference code or digital metaphors if relevant. Do NOT repeat the quoted tweet. Do NOT write a thread. Just the quote tweet comment, nothing else.
-- If in doubt, output only: SKIP
-
-Quote tweet comment (max 200 characters):
-"""
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "system", "content": prompt}],
-            max_tokens=200,
-            temperature=0.85
-        )
-        content = response.choices[0].message.content.strip()
-        print(f"[generate_quote_tweet_comment] LLM generated: {content}")
-        return content
     except Exception as e:
-        print(f"[generate_quote_tweet_comment] OpenAI v1.x error: {e}")
+        log.error("[%s] OpenAI v1.x error: %s", caller, e)
         return ""
 
+@instrument("llm.generate_thread_with_llm")
+def generate_thread_with_llm(topic: str, knowledge: list, insights: str, mention_author: str = None, mention_url: str = None) -> str:
+    prompt, _ = fit_prompt(MENTION_PROMPT, "generate_thread_with_llm", insights, knowledge, topic=topic,
+                           author=mention_author or "someone", source=f" (see: {mention_url})" if mention_url else "",
+                           reply_kind="tweet")
+    return _chat_completion("generate_thread_with_llm", prompt, max_tokens=300, temperature=0.8, max_chars=280)
+
+@instrument("llm.generate_reply_to_mention")
+def generate_reply_to_mention(topic: str, knowledge: list, mention_content: str, mention_author: str = None, mention_url: str = None) -> str:
+    prompt, _ = fit_prompt(MENTION_PROMPT, "generate_reply_to_mention", mention_content, knowledge, topic=topic,
+                           author=mention_author or "someone", source=f" (see: {mention_url})" if mention_url else "",
+                           reply_kind="tweet reply")
+    return _chat_completion("generate_reply_to_mention", prompt, max_tokens=300, temperature=0.8, max_chars=280)
+
+@instrument("llm.generate_quote_tweet_comment")
+def generate_quote_tweet_comment(topic: str, knowledge: list, tweet_content: str, tweet_url: str = None,
+                                 model: str = "gpt-4", draft: str = None, keep_skip: bool = False) -> str:
+    """draft: a cheaper model's comment for this model to refine (or reject with SKIP)"""
+    caller = "generate_quote_tweet_comment" if model == "gpt-4" else f"generate_quote_tweet_comment:{model}"
+    prompt, _ = fit_prompt(QUOTE_PROMPT, "generate_quote_tweet_comment", tweet_content, knowledge, topic=topic,
+                           source=f"Tweet URL: {tweet_url}" if tweet_url else "",
+                           draft=f"\nDraft comment to improve (or reject with SKIP):\n{draft}\n" if draft else "")
+    return _chat_completion(caller, prompt, max_tokens=200, temperature=0.85, model=model, max_chars=200,
+                            keep_skip=keep_skip)
+
+SENTIMENTS = ("positive", "negative", "neutral")
+
+@instrument("llm.analyze_content_batch")
+def analyze_content_batch(texts: List[str], model: str = "gpt-4") -> Dict[int, Dict]:
+    """
+    Sentiment and key points for several tweets from one completion: {index in texts: {"sentiment",
+    "key_points"}} for each answer line that parsed. Tweets cut off by the prompt budget, or
+    skipped by the model, are simply missing.
+    """
+    numbered = "\n".join(f"{i + 1}. {trim_to_tokens(' '.join(text.split()), PROMPT_CONFIG['analysis_item_tokens'])}"
+                         for i, text in enumerate(texts))
+    prompt, _ = fit_prompt(ANALYSIS_PROMPT, "analyze_content_batch", numbered, [])
+    answer = _chat_completion("analyze_content_batch", prompt, max_tokens=40 * len(texts), temperature=0.2, model=model,
+                              background=True)
+    results = {}
+    for line in answer.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) < 3 or not parts[0].rstrip(".").isdigit():
+            continue
+        index, sentiment = int(parts[0].rstrip(".")) - 1, parts[1].lower()
+        if 0 <= index < len(texts) and sentiment in SENTIMENTS:
+            results[index] = {"sentiment": sentiment, "key_points": [p.strip() for p in parts[2].split(";") if p.strip()]}
+    return results
+
 # Add any other LLM helper functions/classes below... 
\ No newline at end of file
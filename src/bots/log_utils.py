@@ -0,0 +1,170 @@
+"""
+Glitch Bot Logging Helpers
+
+Thin layer over the stdlib logging module:
+- every module logs through get_logger(category), e.g. get_logger("agent.timeline")
+- messages use %-style args, so nothing is formatted unless the record is actually emitted
+- noisy categories are sampled (LOGGING_CONFIG["sample_rates"]); warnings and errors never are
+- records go through a bounded queue to a background thread that writes JSON lines (or text),
+  so the bot's threads never block on stdout/disk
+- full API/LLM payloads are only logged with log_payload() and only when debug_payloads is on
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from typing import Dict, Optional
+
+ROOT_LOGGER = "glitchbot"
+
+# Attributes every LogRecord has; anything else came in through extra= and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_debug_payloads = False
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["_DroppingQueueHandler"] = None
+
+
+def get_logger(category: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
+
+
+def log_payload(logger: logging.Logger, msg: str, payload, *args):
+    """Log a full API/LLM payload at DEBUG, only when debug payload logging is enabled"""
+    if _debug_payloads and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(msg, *args, extra={"payload": payload})
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, category, msg, plus any extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "cat": record.name[len(ROOT_LOGGER) + 1:] if record.name.startswith(ROOT_LOGGER + ".") else record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, separators=(",", ":"), default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRS}
+        if fields:
+            line += " " + json.dumps(fields, separators=(",", ":"), default=str, ensure_ascii=False)
+        return line
+
+
+class CategorySampler(logging.Filter):
+    """
+    Keeps a fixed fraction of sub-WARNING records per category (deterministically: rate 0.1 keeps
+    every 10th). Rates are matched on the longest category prefix, e.g. "agent.timeline".
+    """
+
+    def __init__(self, sample_rates: Dict[str, float]):
+        super().__init__()
+        self.sample_rates = {f"{ROOT_LOGGER}.{k}": v for k, v in (sample_rates or {}).items()}
+        self._seen: Dict[str, int] = {}
+        self._rate_cache: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def _rate(self, name: str) -> float:
+        rate = self._rate_cache.get(name)
+        if rate is None:
+            prefixes = [p for p in self.sample_rates if name == p or name.startswith(p + ".")]
+            rate = self.sample_rates[max(prefixes, key=len)] if prefixes else 1.0
+            self._rate_cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+        with self._lock:
+            seen = self._seen.get(record.name, 0) + 1
+            self._seen[record.name] = seen
+        if int(seen * rate) > int((seen - 1) * rate):
+            record.sample_rate = rate
+            return True
+        self.suppressed += 1
+        return False
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: when the writer thread falls behind, records are counted and dropped"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level: str = None, fmt: str = None, path: str = None, debug_payloads: bool = None,
+                      sample_rates: Dict[str, float] = None, queue_size: int = None):
+    """Install the async handler on the 'glitchbot' logger; arguments default to LOGGING_CONFIG"""
+    global _debug_payloads, _listener, _queue_handler
+    from src.bots.config import LOGGING_CONFIG
+    level = (level or LOGGING_CONFIG["level"]).upper()
+    fmt = fmt or LOGGING_CONFIG["format"]
+    path = path if path is not None else LOGGING_CONFIG["file"]
+    _debug_payloads = LOGGING_CONFIG["debug_payloads"] if debug_payloads is None else debug_payloads
+    shutdown_logging()
+
+    output = logging.FileHandler(path, encoding="utf-8") if path else logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    log_queue = queue.Queue(maxsize=queue_size or LOGGING_CONFIG["queue_size"])
+    _queue_handler = _DroppingQueueHandler(log_queue)
+    _queue_handler.addFilter(CategorySampler(LOGGING_CONFIG["sample_rates"] if sample_rates is None else sample_rates))
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(level)
+    root.addHandler(_queue_handler)
+    root.propagate = False
+    return root
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger(ROOT_LOGGER).removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+atexit.register(shutdown_logging)
+
+
+def logging_stats() -> Dict[str, int]:
+    """Records dropped (queue full) and suppressed (sampling) since configure_logging()"""
+    if _queue_handler is None:
+        return {"dropped": 0, "suppressed": 0}
+    sampler = next((f for f in _queue_handler.filters if isinstance(f, CategorySampler)), None)
+    return {"dropped": _queue_handler.dropped, "suppressed": sampler.suppressed if sampler else 0}
@@ -0,0 +1,281 @@
+"""
+Glitch Bot Mention Priority Queue
+"""
+import heapq
+import math
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.bots.config import MENTION_QUEUE_CONFIG, POSTING_CONFIG, YOUR_TWITTER_HANDLE
+
+# When a mention was posted (or queued, for rows without the tweet's created_at)
+_MENTION_TIME = "COALESCE(mention_created_at, CAST(strftime('%s', created_at) AS REAL))"
+
+
+def is_priority_author(author: str, content: str = "", handle: str = None) -> bool:
+    """Mentions from (or explicitly tagging) the owner's handle (YOUR_TWITTER_HANDLE by default) jump the queue"""
+    handle = (handle or YOUR_TWITTER_HANDLE).lower()
+    return handle in (author or "").lower() or handle in (content or "").lower()
+
+
+def parse_tweet_time(created_at: str) -> Optional[float]:
+    """Twitter's ISO-8601 created_at (e.g. 2024-05-01T12:00:00.000Z) as a Unix timestamp"""
+    if not created_at:
+        return None
+    try:
+        return datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile; None for an empty sample"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class MentionQueue:
+    """
+    Durable priority queue of mentions backed by the priority_queue table.
+
+    The DB is the source of truth: enqueue is idempotent on mention_id and every lease is an
+    atomic conditional UPDATE, so several processes can share one queue. Each instance keeps a
+    small heap of the best pending rows so that popping does not hit SQLite for every mention.
+    """
+
+    def __init__(self, db, config: Dict = None, priority_handle: str = None):
+        self.db = db
+        self.priority_handle = priority_handle
+        self.config = dict(MENTION_QUEUE_CONFIG, **(config or {}))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._heap = []
+        self._heap_loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _response_deadline(self, is_priority: bool, now: float) -> float:
+        minutes = POSTING_CONFIG["priority_response_time"] if is_priority else POSTING_CONFIG["general_response_time"]
+        return now + minutes * 60
+
+    def enqueue(self, mention_id: str, author: str, content: str, quality_score: int = 0, is_priority: bool = None,
+                conversation_id: str = None, mention_created_at: float = None) -> bool:
+        """Queue a mention once; returns False if it was already queued"""
+        if is_priority is None:
+            is_priority = is_priority_author(author, content, self.priority_handle)
+        now = time.time()
+        priority = 1 if is_priority else 0
+        quality_score = int(quality_score or 0)
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR IGNORE INTO priority_queue
+                (mention_id, author, content, quality_score, is_priority, priority, status, visible_at, due_at,
+                 conversation_id, mention_created_at)
+                VALUES (?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?, ?)
+            """, (mention_id, author, content, quality_score, int(is_priority), priority,
+                  self._response_deadline(is_priority, mention_created_at or now), conversation_id, mention_created_at))
+            conn.commit()
+            inserted = cursor.rowcount > 0
+            if inserted:
+                cursor.execute("SELECT created_at FROM priority_queue WHERE mention_id = ?", (mention_id,))
+                created_at = cursor.fetchone()[0]
+        if inserted:
+            with self._lock:
+                heapq.heappush(self._heap, (-priority, -quality_score, created_at, mention_id))
+        return inserted
+
+    def _reclaim_expired(self, cursor, now: float):
+        cursor.execute("""
+            UPDATE priority_queue SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL
+            WHERE status = 'leased' AND lease_expires_at < ?
+        """, (now,))
+
+    def _refill(self, now: float):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            self._reclaim_expired(cursor, now)
+            conn.commit()
+            cursor.execute("""
+                SELECT mention_id, priority, quality_score, created_at FROM priority_queue
+                WHERE status = 'pending' AND visible_at <= ?
+                ORDER BY priority DESC, quality_score DESC, created_at ASC
+                LIMIT ?
+            """, (now, self.config["cache_size"]))
+            rows = cursor.fetchall()
+        self._heap = [(-row["priority"], -(row["quality_score"] or 0), row["created_at"], row["mention_id"]) for row in rows]
+        heapq.heapify(self._heap)
+        self._heap_loaded_at = now
+
+    def lease(self, visibility_timeout: float = None) -> Optional[Dict]:
+        """Atomically claim the highest-priority visible mention, or None if the queue is empty"""
+        timeout = visibility_timeout or self.config["visibility_timeout"]
+        with self._lock:
+            now = time.time()
+            refilled = False
+            if not self._heap or now - self._heap_loaded_at > self.config["cache_ttl"] or self._priority_waiting(now):
+                self._refill(now)
+                refilled = True
+            while True:
+                if not self._heap:
+                    if refilled:
+                        return None
+                    self._refill(now)
+                    refilled = True
+                    continue
+                _, _, _, mention_id = heapq.heappop(self._heap)
+                with self.db.get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        UPDATE priority_queue
+                        SET status = 'leased', lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1
+                        WHERE mention_id = ? AND status = 'pending' AND visible_at <= ?
+                    """, (self.owner, now + timeout, mention_id, now))
+                    conn.commit()
+                    if cursor.rowcount == 0:
+                        # Another worker took it (or it was acked) since the heap was filled
+                        continue
+                    cursor.execute("SELECT * FROM priority_queue WHERE mention_id = ?", (mention_id,))
+                    return dict(cursor.fetchone())
+
+    def _priority_waiting(self, now: float) -> bool:
+        """True if another process queued a priority mention the cached heap doesn't know about"""
+        if self._heap and self._heap[0][0] < 0:
+            return False
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT 1 FROM priority_queue WHERE status = 'pending' AND priority > 0 AND visible_at <= ? LIMIT 1
+            """, (now,))
+            return cursor.fetchone() is not None
+
+    def ack(self, mention_id: str, outcome: str = "replied") -> bool:
+        """Mark a leased mention as handled ('replied' or 'skipped'); False if this worker lost the lease"""
+        with self.db.get_connection() as conn:
+            cursor = conn.execute("""
+                UPDATE priority_queue
+                SET status = 'done', outcome = ?, lease_owner = NULL, lease_expires_at = NULL, completed_at = ?
+                WHERE mention_id = ? AND status = 'leased' AND lease_owner = ?
+            """, (outcome, time.time(), mention_id, self.owner))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def nack(self, mention_id: str, error: str = None, delay: float = None) -> bool:
+        """Requeue a leased mention (or park it as 'dead' after max_attempts); False if this worker lost the lease"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT attempts FROM priority_queue WHERE mention_id = ?", (mention_id,))
+            row = cursor.fetchone()
+            if not row:
+                return False
+            attempts = row["attempts"] or 0
+            if attempts >= self.config["max_attempts"]:
+                status, visible_at = "dead", 0
+            else:
+                status = "pending"
+                visible_at = time.time() + (delay if delay is not None else self.config["retry_delay"] * (2 ** max(attempts - 1, 0)))
+            cursor.execute("""
+                UPDATE priority_queue
+                SET status = ?, visible_at = ?, last_error = ?, lease_owner = NULL, lease_expires_at = NULL
+                WHERE mention_id = ? AND status = 'leased' AND lease_owner = ?
+            """, (status, visible_at, error, mention_id, self.owner))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def defer(self, mention_id: str, delay: float) -> bool:
+        """Return a leased mention for delay seconds without using an attempt; False if this worker lost the lease"""
+        with self.db.get_connection() as conn:
+            cursor = conn.execute("""
+                UPDATE priority_queue
+                SET status = 'pending', visible_at = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, lease_expires_at = NULL
+                WHERE mention_id = ? AND status = 'leased' AND lease_owner = ?
+            """, (time.time() + delay, mention_id, self.owner))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def waiting_behind(self, items: List[Dict]) -> set:
+        """
+        Ids of the leased items that have an earlier mention in the same conversation (or, outside a
+        conversation, from the same author) still pending or leased elsewhere: replying now would
+        overtake it. Earlier mentions among items themselves don't count.
+        """
+        ids = [item["mention_id"] for item in items]
+        blocked = set()
+        with self.db.get_connection() as conn:
+            for item in items:
+                if item.get("conversation_id"):
+                    same_thread, key = "conversation_id = ?", item["conversation_id"]
+                else:
+                    same_thread, key = "conversation_id IS NULL AND lower(author) = ?", (item.get("author") or "").lower()
+                row = conn.execute(f"""
+                    SELECT 1 FROM priority_queue
+                    WHERE {same_thread} AND status IN ('pending', 'leased')
+                      AND {_MENTION_TIME} < (SELECT {_MENTION_TIME} FROM priority_queue WHERE mention_id = ?)
+                      AND mention_id NOT IN ({','.join('?' * len(ids))})
+                    LIMIT 1
+                """, (key, item["mention_id"], *ids)).fetchone()
+                if row:
+                    blocked.add(item["mention_id"])
+        return blocked
+
+    def extend_lease(self, mention_id: str, visibility_timeout: float = None) -> bool:
+        """Push out the lease deadline for long-running work; False if the lease was lost"""
+        timeout = visibility_timeout or self.config["visibility_timeout"]
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE priority_queue SET lease_expires_at = ?
+                WHERE mention_id = ? AND status = 'leased' AND lease_owner = ?
+            """, (time.time() + timeout, mention_id, self.owner))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def stats(self) -> Dict:
+        """Counts per status plus how many pending mentions are already past their response SLA"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT status, COUNT(*) FROM priority_queue GROUP BY status")
+            counts = {row[0]: row[1] for row in cursor.fetchall()}
+            cursor.execute("""
+                SELECT COUNT(*) FROM priority_queue WHERE status IN ('pending', 'leased') AND due_at < ?
+            """, (time.time(),))
+            counts["overdue"] = cursor.fetchone()[0]
+            # Pending mentions that can be claimed now; the rest wait out a retry delay
+            cursor.execute("SELECT COUNT(*) FROM priority_queue WHERE status = 'pending' AND visible_at <= ?", (time.time(),))
+            counts["ready"] = cursor.fetchone()[0]
+        return counts
+
+    def reply_latencies(self, window_seconds: float = 86400) -> Dict:
+        """p50/p95 mention-to-reply latency (seconds) over replies completed in the window"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT priority, completed_at - COALESCE(mention_created_at, CAST(strftime('%s', created_at) AS REAL))
+                FROM priority_queue
+                WHERE status = 'done' AND outcome = 'replied' AND completed_at >= ?
+            """, (time.time() - window_seconds,))
+            rows = cursor.fetchall()
+        all_latencies = [row[1] for row in rows if row[1] is not None]
+        priority_latencies = [row[1] for row in rows if row[1] is not None and row[0]]
+        return {
+            "replies": len(all_latencies),
+            "p50": percentile(all_latencies, 50),
+            "p95": percentile(all_latencies, 95),
+            "priority_p50": percentile(priority_latencies, 50),
+            "priority_p95": percentile(priority_latencies, 95),
+        }
+
+    def pending(self, limit: int = 10) -> List[Dict]:
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT * FROM priority_queue WHERE status = 'pending'
+                ORDER BY priority DESC, quality_score DESC, created_at ASC
+                LIMIT ?
+            """, (limit,))
+            return [dict(row) for row in cursor.fetchall()]
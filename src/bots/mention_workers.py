@@ -0,0 +1,113 @@
+"""
+Glitch Bot Concurrent Mention Workers
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+from src.bots.config import MENTION_QUEUE_CONFIG
+from src.bots.mention_queue import MentionQueue
+from src.bots.tracing import TRACER, with_current_context
+
+
+def ordering_key(item: Dict) -> str:
+    """Mentions in the same conversation (or from the same author) are replied to in order"""
+    if item.get("conversation_id"):
+        return f"conversation:{item['conversation_id']}"
+    return f"author:{(item.get('author') or '').lower()}"
+
+
+class MentionWorkerPool:
+    """
+    Bounded pool that replies to queued mentions concurrently.
+
+    A drain leases a batch from the MentionQueue, groups it by ordering_key and runs each group
+    sequentially on one worker thread, so different conversations proceed in parallel while replies
+    within a conversation keep their original order. Order also holds across drains: a mention with
+    an earlier one still unanswered outside the batch (waiting out a retry, or leased by another
+    worker) is deferred for order_delay, as is the rest of a group after a mention in it fails.
+
+    Before posting, the handler calls lease_check, which renews the lease and refuses to post if
+    another worker has taken the mention over. Together with reply_to_mention's mentions_responses
+    check, and its lookup of a reply an earlier attempt posted but lost the response to, this keeps
+    replies exactly-once.
+
+    handler(item, lease_check) must return (status, message, info) like the agent Functions, where
+    status is "done", "skipped", "lost" (lease taken over; left untouched) or "failed".
+    """
+
+    def __init__(self, queue: MentionQueue, handler: Callable[[Dict, Callable[[], bool]], Tuple[str, str, dict]],
+                 max_workers: int = None, batch_size: int = None):
+        self.queue = queue
+        self.handler = handler
+        self.max_workers = max_workers or MENTION_QUEUE_CONFIG["max_workers"]
+        self.batch_size = batch_size or MENTION_QUEUE_CONFIG["batch_size"]
+
+    def _lease_batch(self, limit: int) -> List[Dict]:
+        items = []
+        while len(items) < limit:
+            item = self.queue.lease()
+            if not item:
+                break
+            items.append(item)
+        return items
+
+    def _defer(self, items: List[Dict]) -> List[Tuple[str, str]]:
+        for item in items:
+            self.queue.defer(item["mention_id"], self.queue.config["order_delay"])
+        return [(item["mention_id"], "deferred") for item in items]
+
+    def _run_group(self, items: List[Dict]) -> List[Tuple[str, str]]:
+        outcomes = []
+        for position, item in enumerate(items):
+            if outcomes and outcomes[-1][1] == "failed":
+                # The failed mention is retried later; the ones after it must not overtake it
+                return outcomes + self._defer(items[position:])
+            mention_id = item["mention_id"]
+            lease_check = lambda mention_id=mention_id: self.queue.extend_lease(mention_id)
+            try:
+                with TRACER.span("mentions.reply", mention_id=mention_id, priority=item.get("priority"),
+                                 conversation_id=item.get("conversation_id")):
+                    status, message, _ = self.handler(item, lease_check)
+            except Exception as e:
+                status, message = "failed", str(e)
+            if status == "done":
+                settled = self.queue.ack(mention_id, outcome="replied")
+            elif status == "skipped":
+                settled = self.queue.ack(mention_id, outcome="skipped")
+            elif status != "lost":
+                settled = self.queue.nack(mention_id, error=message)
+            else:
+                settled = False
+            if not settled:
+                # The lease expired and another worker has the mention now; its outcome is that worker's to record
+                status = "lost"
+            outcomes.append((mention_id, status))
+        return outcomes
+
+    def drain(self, max_mentions: int = None) -> Dict:
+        """Lease up to max_mentions mentions and process them; returns per-outcome mention ids"""
+        items = self._lease_batch(max_mentions or self.batch_size)
+        groups = OrderedDict()
+        for item in items:
+            groups.setdefault(ordering_key(item), []).append(item)
+        result = {"replied": [], "skipped": [], "failed": [], "deferred": []}
+        blocked = self.queue.waiting_behind(items) if items else set()
+        for key, group in list(groups.items()):
+            # Priority decides which conversation goes first; inside a conversation, oldest mention first
+            group.sort(key=lambda i: (i.get("mention_created_at") or 0, i.get("created_at") or ""))
+            first_blocked = next((n for n, item in enumerate(group) if item["mention_id"] in blocked), None)
+            if first_blocked is not None:
+                result["deferred"] += [mention_id for mention_id, _ in self._defer(group[first_blocked:])]
+                del group[first_blocked:]
+            if not group:
+                del groups[key]
+        if not groups:
+            return result
+        with TRACER.span("mentions.drain", leased=len(items), groups=len(groups)), \
+                ThreadPoolExecutor(max_workers=min(self.max_workers, len(groups)), thread_name_prefix="mention-worker") as pool:
+            for outcomes in pool.map(with_current_context(self._run_group), groups.values()):
+                for mention_id, status in outcomes:
+                    key = {"done": "replied", "skipped": "skipped", "deferred": "deferred"}.get(status, "failed")
+                    result[key].append(mention_id)
+        return result
@@ -0,0 +1,260 @@
+"""
+Glitch Bot Metrics (counters, gauges, latency histograms)
+"""
+import functools
+import json
+import threading
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, Tuple
+
+from src.bots.log_utils import get_logger
+from src.bots.tracing import TRACER
+
+# Latency buckets in seconds: SQLite calls land in the first few, Twitter/OpenAI/GAME calls in the rest
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _format_labels(key: Tuple, extra: Tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    # Plain attribute updates keep the hot path lock-free; under heavy threading a rare lost
+    # increment is an acceptable trade for sub-microsecond overhead.
+    __slots__ = ("value",)
+    def __init__(self):
+        self.value = 0
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+    def __init__(self):
+        self.value = 0
+    def set(self, value: float):
+        self.value = value
+    def inc(self, amount: float = 1):
+        self.value += amount
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+    def quantile(self, q: float) -> float:
+        """Upper bucket bound containing the q-quantile (coarse, but free to compute)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            running += n
+            if running >= target:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Holds every metric by (name, labels). Metric objects are created once and then updated directly."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Dict[Tuple, object]] = {}
+        self._types: Dict[str, str] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: str, factory, name: str, labels: Dict, help_text: str):
+        key = _label_key(labels)
+        family = self._metrics.get(name)
+        if family is not None and key in family:
+            return family[key]
+        with self._lock:
+            family = self._metrics.setdefault(name, {})
+            if key not in family:
+                family[key] = factory()
+                self._types[name] = kind
+                if help_text:
+                    self._help[name] = help_text
+            return family[key]
+
+    def counter(self, name: str, labels: Dict = None, help_text: str = "") -> Counter:
+        return self._get("counter", Counter, name, labels, help_text)
+
+    def gauge(self, name: str, labels: Dict = None, help_text: str = "") -> Gauge:
+        return self._get("gauge", Gauge, name, labels, help_text)
+
+    def histogram(self, name: str, labels: Dict = None, help_text: str = "", buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get("histogram", lambda: Histogram(buckets), name, labels, help_text)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for name in sorted(self._metrics):
+            kind = self._types[name]
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, metric in sorted(self._metrics[name].items()):
+                if kind == "histogram":
+                    running = 0
+                    for bound, n in zip(metric.buckets + (float("inf"),), metric.counts):
+                        running += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', le),))} {running}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {metric.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {metric.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        """Compact JSON-able view: counters/gauges as values, histograms as count/sum/p50/p95"""
+        result = {}
+        for name, family in self._metrics.items():
+            kind = self._types[name]
+            for key, metric in family.items():
+                label = name + _format_labels(key)
+                if kind == "histogram":
+                    if metric.count:
+                        result[label] = {
+                            "count": metric.count,
+                            "sum": round(metric.sum, 6),
+                            "p50": metric.quantile(0.5),
+                            "p95": metric.quantile(0.95),
+                        }
+                else:
+                    result[label] = metric.value
+        return result
+
+
+REGISTRY = MetricsRegistry()
+
+
+def instrument(name: str, registry: MetricsRegistry = None):
+    """Decorator recording call count, error count and latency for fn under the given name (and a span when tracing)"""
+    registry = registry or REGISTRY
+    def decorator(fn):
+        latency = registry.histogram("glitchbot_call_duration_seconds", {"fn": name}, "Call latency by function")
+        errors = registry.counter("glitchbot_call_errors_total", {"fn": name}, "Calls that raised, by function")
+        # observe() is inlined: this wrapper sits on every DB/API call, so each attribute lookup counts
+        buckets, counts = latency.buckets, latency.counts
+        def traced_call(args, kwargs):
+            with TRACER.span(name):
+                return timed_call(*args, **kwargs)
+        def timed_call(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                errors.value += 1
+                raise
+            finally:
+                elapsed = perf_counter() - start
+                counts[bisect_left(buckets, elapsed)] += 1
+                latency.sum += elapsed
+                latency.count += 1
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if TRACER.enabled:
+                return traced_call(args, kwargs)
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                errors.value += 1
+                raise
+            finally:
+                elapsed = perf_counter() - start
+                counts[bisect_left(buckets, elapsed)] += 1
+                latency.sum += elapsed
+                latency.count += 1
+        wrapper.__wrapped_metric__ = name
+        return wrapper
+    return decorator
+
+
+def instrument_methods(prefix: str, exclude: Tuple[str, ...] = ()):
+    """Class decorator instrumenting every public method as '<prefix>.<method>'"""
+    def decorator(cls):
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or attr in exclude or not callable(value):
+                continue
+            setattr(cls, attr, instrument(f"{prefix}.{attr}")(value))
+        return cls
+    return decorator
+
+
+def snapshot_to_db(db, registry: MetricsRegistry = None):
+    """Append the current metrics snapshot as one agent_metrics row"""
+    registry = registry or REGISTRY
+    with db.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO agent_metrics (metric_name, metric_value) VALUES (?, ?)",
+            ("snapshot", json.dumps(registry.snapshot(), separators=(",", ":")))
+        )
+        conn.commit()
+
+
+# Sections of /status: name -> fn returning something JSON-serialisable (e.g. breakers.py's upstreams)
+STATUS_SECTIONS: Dict[str, Callable[[], object]] = {}
+
+
+def register_status(name: str, fn: Callable[[], object]):
+    STATUS_SECTIONS[name] = fn
+
+
+def status_snapshot() -> Dict:
+    return {name: fn() for name, fn in STATUS_SECTIONS.items()}
+
+
+def _metrics_handler(registry: MetricsRegistry):
+    # http.server is imported only by processes that serve metrics
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/status":
+                body, content_type = json.dumps(status_snapshot(), default=str).encode("utf-8"), "application/json"
+            elif path in ("/metrics", "/"):
+                body, content_type = registry.render_prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would otherwise flood stderr
+
+    return MetricsHandler
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = None):
+    """Serve /metrics in Prometheus text format (and /status as JSON) from a daemon thread; returns the ThreadingHTTPServer"""
+    from http.server import ThreadingHTTPServer
+    server = ThreadingHTTPServer((host, port), _metrics_handler(registry or REGISTRY))
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    get_logger("metrics").info("Serving Prometheus metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
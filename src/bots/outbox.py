@@ -0,0 +1,216 @@
+"""
+Glitch Bot Posting Outbox
+
+Every post the bot writes is a row in generated_threads, and it is published only from here:
+
+    draft -> scheduled -> publishing -> posted
+                      \\-> failed (after max_attempts)     draft -> expired (older than max_draft_age)
+
+schedule() gives each draft the next free posting slot. Slots are post_slot_seconds() apart, which
+satisfies both max_posts_per_hour and min_hours_between_posts. publish() claims a due row with a
+one-statement UPDATE and a fresh publish token, so only one worker or process can post it. The
+tweet id is recorded with a single conditional UPDATE (mark_thread_posted).
+
+The idempotency key (a hash of the normalised text, unique in generated_threads) makes storing
+the same text twice return the existing draft. It also covers the one unsafe window: a
+create_tweet that succeeded but whose response was lost. Before posting a row again, publish()
+looks for the text among the bot's own recent tweets. The API never returns the text verbatim
+(URLs come back as t.co links, & and < as HTML entities), so texts are compared in
+published_form(), and a quoted tweet, when both sides have one, must be the same. A
+duplicate-content rejection from the API is resolved the same way. Either way the draft goes out
+exactly once, and ready drafts are posted as they are instead of being regenerated.
+"""
+import html
+import re
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.bots.config import OUTBOX_CONFIG, POSTING_CONFIG
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY
+
+log = get_logger("outbox")
+
+_URL = re.compile(r"https?://\S+")
+_STATUS_URL = re.compile(r"https?://(?:www\.)?(?:x|twitter)\.com/\S*?status/(\d+)")
+
+
+def published_form(text: str) -> str:
+    """Text comparable with what the API returns for it: entities unescaped, URLs dropped, whitespace collapsed"""
+    return " ".join(_URL.sub(" ", html.unescape(text or "")).split())
+
+
+def _quoted_ids(tweet: Dict) -> set:
+    return {ref["id"] for ref in tweet.get("referenced_tweets") or [] if ref.get("type") == "quoted"}
+
+READY_STATUSES = ("draft", "scheduled", "publishing")
+
+
+def post_slot_seconds() -> float:
+    """Spacing between posts that satisfies both max_posts_per_hour and min_hours_between_posts"""
+    return max(3600 / POSTING_CONFIG["max_posts_per_hour"], POSTING_CONFIG["min_hours_between_posts"] * 3600)
+
+
+class Outbox:
+    def __init__(self, db, config: Dict = None):
+        self.db = db
+        self.config = dict(OUTBOX_CONFIG, **(config or {}))
+
+    def ready(self) -> int:
+        """Drafts waiting to go out (scheduled or not)"""
+        with self.db.get_connection() as conn:
+            return conn.execute(f"""
+                SELECT COUNT(*) FROM generated_threads WHERE status IN ({','.join('?' * len(READY_STATUSES))})
+            """, READY_STATUSES).fetchone()[0]
+
+    def pacing(self, now: float = None) -> Dict:
+        """
+        Posts published in the last hour and when the latest went out, for the agent state. Read from
+        posted_at, so every post counts: the GAME agent's, the outbox task's and pipeline workers'.
+        """
+        now = now or time.time()
+        with self.db.get_connection() as conn:
+            last, recent = conn.execute("""
+                SELECT MAX(posted_at), (SELECT COUNT(*) FROM generated_threads WHERE posted_at >= ?)
+                FROM generated_threads WHERE posted_at IS NOT NULL
+            """, (now - 3600,)).fetchone()
+        return {"posts_this_hour": recent, "last_post_time": datetime.fromtimestamp(last).isoformat() if last else None}
+
+    def schedule(self, now: float = None) -> List[Dict]:
+        """Expire stale drafts and give the rest consecutive free slots; returns the rows scheduled"""
+        now = now or time.time()
+        spacing = post_slot_seconds()
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # One scheduler at a time, so slots are never handed out twice
+            conn.execute("""
+                UPDATE generated_threads SET status = 'expired'
+                WHERE status = 'draft' AND created_at < datetime('now', ?)
+            """, (f"-{int(self.config['max_draft_age'])} seconds",))
+            last = conn.execute("""
+                SELECT MAX(t) FROM (
+                    SELECT MAX(posted_at) AS t FROM generated_threads WHERE status = 'posted'
+                    UNION ALL
+                    SELECT MAX(scheduled_at) FROM generated_threads WHERE status IN ('scheduled', 'publishing')
+                )
+            """).fetchone()[0]
+            slot = max(now, last + spacing) if last else now
+            drafts = [dict(row) for row in conn.execute(
+                "SELECT id, thread_content FROM generated_threads WHERE status = 'draft' ORDER BY id")]
+            for row in drafts:
+                row["scheduled_at"] = slot
+                conn.execute("UPDATE generated_threads SET status = 'scheduled', scheduled_at = ? WHERE id = ?", (slot, row["id"]))
+                slot += spacing
+            conn.commit()
+        for row in drafts:
+            log.info("Thread %s scheduled for %s", row["id"], time.strftime("%H:%M", time.localtime(row["scheduled_at"])))
+        return drafts
+
+    def _claim(self, thread_id: int, now: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        with self.db.get_connection() as conn:
+            claimed = conn.execute("""
+                UPDATE generated_threads
+                SET status = 'publishing', publish_token = ?, publish_started_at = ?, attempts = attempts + 1
+                WHERE id = ? AND (
+                    (status = 'scheduled' AND scheduled_at <= ?)
+                    OR (status = 'publishing' AND publish_started_at < ?)
+                )
+            """, (token, now, thread_id, now, now - self.config["publish_lease"])).rowcount
+            conn.commit()
+        return token if claimed else None
+
+    def _release(self, row: Dict, token: str, error: str, now: float) -> str:
+        """Give a failed publish back to the schedule, or park it once it has used max_attempts"""
+        status = "failed" if row["attempts"] >= self.config["max_attempts"] else "scheduled"
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                UPDATE generated_threads SET status = ?, scheduled_at = ?, publish_token = NULL, last_error = ?
+                WHERE id = ? AND publish_token = ?
+            """, (status, now + self.config["retry_delay"], error, row["id"], token))
+            conn.commit()
+        return status
+
+    def _find_published(self, client, bot_user_id: str, text: str) -> Optional[str]:
+        """The id of the bot's recent tweet with this text (as the API renders it) and the same quoted tweet, if any"""
+        if not bot_user_id:
+            return None
+        tweets = client.get_users_tweets(id=bot_user_id, max_results=self.config["reconcile_lookback"],
+                                         tweet_fields=["referenced_tweets", "created_at"]).get("data") or []
+        wanted, quoted = published_form(text), set(_STATUS_URL.findall(text))
+        for tweet in tweets:
+            if published_form(tweet["text"]) != wanted:
+                continue
+            if quoted and _quoted_ids(tweet) and not quoted & _quoted_ids(tweet):
+                continue
+            return tweet["id"]
+        return None
+
+    def publish(self, thread_id: int, client, write_limiter=None, bot_user_id: str = None, now: float = None) -> Dict:
+        """
+        Post one scheduled thread if it is due and nobody else is posting it. Returns {"status": ...}:
+        posted, already_posted, not_due, busy (another publisher holds it), rate_limited, retry or failed
+        """
+        now = now or time.time()
+        row = self.db.get_generated_thread(thread_id)
+        if row is None or row["status"] == "posted":
+            return {"status": "already_posted", "tweet_id": row and row["tweet_id"]}
+        if row["status"] == "scheduled" and row["scheduled_at"] > now:
+            return {"status": "not_due", "scheduled_at": row["scheduled_at"]}
+        if write_limiter is not None and not write_limiter.try_acquire():
+            return {"status": "rate_limited"}
+        token = self._claim(thread_id, now)
+        if token is None:
+            return {"status": "busy"}
+        row = self.db.get_generated_thread(thread_id)
+        text = row["thread_content"]
+        try:
+            # An earlier attempt may have posted before losing its response
+            tweet_id = self._find_published(client, bot_user_id, text) if row["attempts"] > 1 else None
+            outcome = "reconciled" if tweet_id else "posted"
+            if tweet_id is None:
+                try:
+                    tweet_id = client.create_tweet(text=text)["data"]["id"]
+                except Exception as e:
+                    if "duplicate" not in str(e).lower():
+                        raise
+                    tweet_id = self._find_published(client, bot_user_id, text)
+                    outcome = "reconciled"
+                    if tweet_id is None:
+                        raise
+        except Exception as e:
+            status = self._release(row, token, str(e), now)
+            REGISTRY.counter("glitchbot_outbox_publish_total", {"outcome": status}, "Outbox publish attempts by outcome").inc()
+            log.warning("Publishing thread %s failed (attempt %d, now %s): %s", thread_id, row["attempts"], status, e)
+            return {"status": "failed" if status == "failed" else "retry", "error": str(e)}
+        if not self.db.mark_thread_posted(thread_id, tweet_id, publish_token=token):
+            log.warning("Thread %s was recorded by another publisher while posting it as %s", thread_id, tweet_id)
+        REGISTRY.counter("glitchbot_outbox_publish_total", {"outcome": outcome}).inc()
+        log.info("Posted thread %s as tweet %s%s", thread_id, tweet_id, " (found after a lost response)" if outcome == "reconciled" else "")
+        return {"status": "posted", "tweet_id": tweet_id, "text": text}
+
+    def due(self, now: float = None, limit: int = 1) -> List[int]:
+        """Ids ready to publish now: due scheduled rows and abandoned publishes, oldest slot first"""
+        now = now or time.time()
+        with self.db.get_connection() as conn:
+            return [row[0] for row in conn.execute("""
+                SELECT id FROM generated_threads
+                WHERE (status = 'scheduled' AND scheduled_at <= ?) OR (status = 'publishing' AND publish_started_at < ?)
+                ORDER BY scheduled_at LIMIT ?
+            """, (now, now - self.config["publish_lease"], limit))]
+
+    def publish_due(self, client, write_limiter=None, bot_user_id: str = None, now: float = None, limit: int = 1) -> List[Dict]:
+        results = []
+        for thread_id in self.due(now, limit):
+            result = self.publish(thread_id, client, write_limiter, bot_user_id, now)
+            results.append(dict(result, thread_id=thread_id))
+            if result["status"] == "rate_limited":
+                break
+        return results
+
+    def stats(self) -> Dict:
+        with self.db.get_connection() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM generated_threads GROUP BY status").fetchall())
+            next_at = conn.execute("SELECT MIN(scheduled_at) FROM generated_threads WHERE status = 'scheduled'").fetchone()[0]
+        return {"by_status": counts, "next_slot_at": next_at}
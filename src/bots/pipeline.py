@@ -0,0 +1,198 @@
+"""
+Glitch Bot Pipeline (job handlers for `glitch_bot_main worker`)
+
+The bot's work split into typed jobs so it can run across several worker processes:
+
+    fetch    -> pull mentions / home timeline / topic search / monitored accounts, store tweets;
+                re-read the metrics of our own recent posts (engagement.py); score new authors and
+                follow the best (follows.py); analyse the backlog of stored tweets (analysis.py) and
+                merge the results into the knowledge base (knowledge.py)
+    hydrate  -> refresh public_metrics for stored tweets, 100 ids per get_tweets call
+    score    -> rate stored tweets, keep the analysis (marking them processed), pick candidates for quoting
+    generate -> write a quote post (or drain the mention queue) with the LLM, into the outbox
+    post     -> publish a generated post in its posting slot (see outbox.py)
+
+Each handler takes (job, queue) and enqueues the next stage itself. Handlers run with the job's
+account active (see accounts.py), so the agent helpers they reuse see the right DB and client.
+"""
+import json
+import time
+from typing import Dict, List
+
+from src.bots.accounts import current_account
+from src.bots.analysis import ContentAnalyzer
+from src.bots.config import TOPICS_TO_MONITOR
+from src.bots.engagement import EngagementRefresher
+from src.bots.knowledge import KnowledgeBuilder
+from src.bots.jobs import JobQueue, RetryLater
+from src.bots.outbox import Outbox
+from src.bots.log_utils import get_logger
+
+log = get_logger("pipeline")
+
+def _agent():
+    # Imported lazily: the agent module pulls in game_sdk
+    from src.bots import glitch_bot_agent
+    return glitch_bot_agent
+
+
+def _chunks(items: List, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# Sources the filtered stream delivers; their polling fetches are skipped while it is healthy
+STREAMED_SOURCES = ("mentions", "topic_search")
+
+
+def schedule_fetches(queue: JobQueue, now: float = None, skip=()) -> int:
+    """Enqueue each source's fetch for the current interval; the dedupe key makes this safe to call from every worker"""
+    now = now or time.time()
+    added = 0
+    for source, interval in queue.config["fetch_intervals"].items():
+        if source in skip:
+            continue
+        window = int(now // interval)
+        added += queue.enqueue("fetch", {"source": source}, priority=1 if source == "mentions" else 5,
+                               dedupe_key=f"fetch:{source}:{window}", run_at=window * interval)
+    return added
+
+
+def _enqueue_hydrate(queue: JobQueue, insights: List[Dict]) -> int:
+    tweet_ids = [item["tweet_id"] for item in insights]
+    batches = list(_chunks(tweet_ids, queue.config["hydrate_batch"]))
+    return queue.enqueue_many("hydrate", [{"tweet_ids": batch} for batch in batches])
+
+
+def handle_fetch(job: Dict, queue: JobQueue):
+    agent = _agent()
+    source = job["payload"]["source"]
+    client = current_account().twitter_client()
+    if source == "mentions":
+        mention_data, _, _ = agent.check_mentions(client)
+        if mention_data:
+            queue.enqueue("generate", {"mentions": True}, priority=1,
+                          dedupe_key=f"generate:mentions:{int(time.time() // queue.config['fetch_intervals']['mentions'])}")
+    elif source == "home_timeline":
+        _enqueue_hydrate(queue, agent.monitor_home_timeline(client))
+    elif source == "topic_search":
+        _enqueue_hydrate(queue, agent.search_topics(client))
+    elif source == "monitored_accounts":
+        # get_users_tweets already returned fresh public_metrics, so these go straight to scoring
+        tweet_ids = [item["tweet_id"] for item in agent.poll_monitored_accounts(client)]
+        queue.enqueue_many("score", [{"tweet_ids": batch} for batch in _chunks(tweet_ids, queue.config["hydrate_batch"])])
+    elif source == "engagement":
+        account = current_account()
+        EngagementRefresher(account.db).refresh(client, account.read_limiter)
+    elif source == "follows":
+        account = current_account()
+        agent.get_follow_engine(client).run(client, account.read_limiter, account.write_limiter)
+    elif source == "analysis":
+        ContentAnalyzer(current_account().db).run()
+    elif source == "knowledge":
+        KnowledgeBuilder(current_account().db).run()
+    else:
+        raise ValueError(f"Unknown fetch source: {source}")
+
+
+def enqueue_streamed_mention(queue: JobQueue, is_priority: bool = False) -> bool:
+    """
+    A mention arrived on the filtered stream: have a worker drain the mention queue within seconds.
+    Mentions are batched in 5s windows; the job runs when its window closes, so it covers every
+    mention that arrived during it.
+    """
+    window = int(time.time() // 5) + 1
+    return queue.enqueue("generate", {"mentions": True}, priority=0 if is_priority else 1,
+                         dedupe_key=f"generate:mentions:{window}", run_at=window * 5)
+
+
+def enqueue_streamed_tweet(queue: JobQueue, tweet: Dict) -> bool:
+    """A topic tweet arrived on the filtered stream with its metrics already attached, so it skips hydrate"""
+    return queue.enqueue("score", {"tweet_ids": [tweet["id"]]})
+
+
+def handle_hydrate(job: Dict, queue: JobQueue):
+    tweet_ids = job["payload"]["tweet_ids"]
+    account = current_account()
+    if not account.read_limiter.try_acquire():
+        raise RetryLater(60, "read budget exhausted")
+    response = account.twitter_client().get_tweets(ids=tweet_ids, tweet_fields=["public_metrics"])
+    metrics = {tweet["id"]: tweet["public_metrics"] for tweet in response.get("data", []) if tweet.get("public_metrics")}
+    if metrics:
+        account.db.update_engagement_metrics(metrics)
+    queue.enqueue("score", {"tweet_ids": tweet_ids})
+
+
+def score_content(item: Dict) -> int:
+    """Content quality plus engagement (likes / 10 + retweets / 5), as used to pick tweets worth quoting"""
+    _, _, score = _agent().assess_content_quality(item.get("content") or "")
+    metrics = item.get("engagement_metrics")
+    try:
+        metrics = json.loads(metrics) if isinstance(metrics, str) else (metrics or {})
+        score += int(metrics.get("like_count", 0)) // 10 + int(metrics.get("retweet_count", 0)) // 5
+    except (TypeError, ValueError):
+        pass
+    return score
+
+
+def handle_score(job: Dict, queue: JobQueue):
+    analyzer = ContentAnalyzer(current_account().db)
+    rows = analyzer.db.get_monitored_content_by_tweet_ids(job["payload"]["tweet_ids"])
+    results = [analyzer.analyze_local(row) for row in rows]
+    analyzer.store(results)  # One transaction; the batch analysis stage then skips these rows
+    candidates = [row for row, result in zip(rows, results) if result["importance_score"] >= queue.config["generate_score"]]
+    for row in candidates:
+        topic = row["topic"] if row["topic"] in TOPICS_TO_MONITOR else TOPICS_TO_MONITOR[0]
+        queue.enqueue("generate", {"tweet_id": row["tweet_id"], "content": row["content"], "topic": topic},
+                      dedupe_key=f"generate:{row['tweet_id']}")
+
+
+def _enqueue_scheduled_posts(queue: JobQueue, outbox: Outbox) -> int:
+    """Slot new drafts and create each one's post job, due when its slot opens"""
+    added = 0
+    for row in outbox.schedule():
+        added += queue.enqueue("post", {"thread_id": row["id"]}, priority=3, dedupe_key=f"post:{row['id']}",
+                               run_at=row["scheduled_at"])
+        log.info("Thread %s scheduled for %s", row["id"], time.strftime("%H:%M", time.localtime(row["scheduled_at"])))
+    return added
+
+
+def handle_generate(job: Dict, queue: JobQueue):
+    agent = _agent()
+    payload = job["payload"]
+    if payload.get("mentions"):
+        agent.process_mention_queue()
+        return
+    outbox = Outbox(current_account().db)
+    if outbox.ready() >= outbox.config["max_ready"]:
+        # The posting slots are booked for a while; by then fresher candidates will have been scored
+        log.info("Outbox full, not quoting %s", payload["tweet_id"])
+        return
+    status, message, info = agent.prepare_quote_post(payload["tweet_id"], payload["content"], payload["topic"])
+    if status != agent.FunctionResultStatus.DONE:
+        if info.get("skipped"):
+            log.info("Not quoting %s: %s", payload["tweet_id"], message)
+            return
+        raise RuntimeError(message)
+    _enqueue_scheduled_posts(queue, outbox)
+
+
+def handle_post(job: Dict, queue: JobQueue):
+    account = current_account()
+    client = account.twitter_client()
+    outbox = Outbox(account.db)
+    _enqueue_scheduled_posts(queue, outbox)  # Drafts written outside the pipeline (mentions, the GAME agent)
+    result = outbox.publish(job["payload"]["thread_id"], client, account.write_limiter, _agent().get_bot_user_id(client))
+    if result["status"] == "not_due":
+        raise RetryLater(result["scheduled_at"] - time.time(), "slot not open yet")
+    if result["status"] in ("rate_limited", "retry"):
+        raise RetryLater(outbox.config["retry_delay"] if result["status"] == "retry" else 60, result["status"])
+
+
+HANDLERS = {
+    "fetch": handle_fetch,
+    "hydrate": handle_hydrate,
+    "score": handle_score,
+    "generate": handle_generate,
+    "post": handle_post,
+}
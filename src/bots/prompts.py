@@ -0,0 +1,152 @@
+"""
+Glitch Bot Prompt Assembly (shared templates, token budgets)
+
+Every generator prompt is built here from a template parsed once at import. The mention text or
+quoted tweet and the knowledge-base rows are fitted into a per-caller token budget
+(PROMPT_CONFIG["budgets"]). Knowledge rows are ranked by word overlap with the content (then
+confidence) and cut to snippet_tokens each. Long content is cut at a word boundary. Only the
+top-ranked snippets that still fit are kept.
+
+Token counts are a local estimate (about four characters per word piece, one per punctuation
+mark), close enough to the GPT-4 tokenizer for budgeting without a download or API call.
+"""
+import re
+import string
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from src.bots.config import PROMPT_CONFIG
+from src.bots.metrics import REGISTRY
+
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"\w{4,}")  # Overlap ignores short words, which are mostly stop words
+
+TOKEN_BUCKETS = (50, 100, 200, 300, 400, 500, 600, 800, 1000, 1500, 2000, 4000)
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    return sum(max(1, (len(piece) + 3) // 4) for piece in _PIECE.findall(text))
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """text cut at a word boundary (marked with an ellipsis) so it takes at most max_tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 1:
+        return ""
+    words = text.split()
+    lo, hi = 0, len(words)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid])) + 1 <= max_tokens:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + "…" if lo else ""
+
+
+class PromptTemplate:
+    """A str.format template parsed once; fixed_tokens is the cost of its literal text"""
+
+    def __init__(self, text: str):
+        self.text = text.strip()
+        parsed = list(string.Formatter().parse(self.text))
+        self.fields = Counter(name for _, name, _, _ in parsed if name)
+        self.fixed_tokens = count_tokens("".join(literal for literal, _, _, _ in parsed))
+
+    def render(self, **fields) -> str:
+        return self.text.format(**fields)
+
+
+# The mention instructions, shared by the thread and reply generators
+MENTION_PROMPT = PromptTemplate("""
+You are Glitch Bot, an AI with a sharp, insightful tone. You have been tagged in a Twitter post by @{author}{source}.
+
+Analyze the content of the mention below, extract the most interesting or important information, and share it in a single, engaging {reply_kind}. Reference the user who tagged you (@{author}), and summarize the key point or insight from the mention. If there is a link or media, mention it if relevant. Use your unique voice, but be concise and insightful. Do NOT write a thread. Stay under 280 characters.
+
+Mention content:
+{content}
+
+Knowledge base:
+{knowledge}
+""")
+
+QUOTE_PROMPT = PromptTemplate("""
+You are Glitch Bot, an enigmatic, hacker-inspired AI. You are about to quote tweet the following post on X (Twitter):
+
+Quoted tweet:
+{content}
+{source}
+
+Topic: {topic}
+Knowledge base:
+{knowledge}
+
+**IMPORTANT RULES:**
+- Only post if you have a genuinely interesting, insightful, or surprising comment about the quoted tweet.
+- NEVER post about your own process, engagement metrics, or strategy.
+- NEVER post generic, obvious, or meta statements (e.g., "Analyzing engagement metrics", "Based on the data", "Here's what I think").
+- If you have nothing genuinely interesting to say, output only: SKIP
+- Your post should be concise, insightful, and relevant to the quoted tweet. Add value, context, or a clever hacker-culture remark. Reference code or digital metaphors if relevant. Do NOT repeat the quoted tweet. Do NOT write a thread. Just the quote tweet comment, nothing else.
+- If in doubt, output only: SKIP
+{draft}
+Quote tweet comment (max 200 characters):
+""")
+
+# Batched analysis of ingested tweets (see analysis.py): one line back per numbered tweet
+ANALYSIS_PROMPT = PromptTemplate("""
+You are Glitch Bot's research assistant. For each numbered tweet below, give its sentiment and up to three key points (a few words each).
+
+Answer with exactly one line per tweet, in the same order and nothing else:
+<number> | <positive, negative or neutral> | <key point>; <key point>; <key point>
+
+Tweets:
+{content}
+""")
+
+
+def rank_knowledge(knowledge: List[Dict], context: str) -> List[str]:
+    """Knowledge rows as "concept: description" snippets, most relevant to context first"""
+    words = set(_WORD.findall(context.lower()))
+    ranked, seen = [], set()
+    for row in knowledge or []:
+        snippet = f"{row['key_concept']}: {row.get('description') or ''}".strip()
+        if snippet in seen:
+            continue
+        seen.add(snippet)
+        overlap = len(words & set(_WORD.findall(snippet.lower())))
+        ranked.append((-overlap, -(row.get("confidence_score") or 0), len(ranked), snippet))
+    return [snippet for *_, snippet in sorted(ranked)]
+
+
+def fit_prompt(template: PromptTemplate, caller: str, content: str, knowledge: List[Dict], budget: int = None,
+               **fields) -> Tuple[str, Dict]:
+    """
+    Render template with content and knowledge trimmed to budget prompt tokens; returns the prompt
+    and {"tokens", "content_trimmed", "snippets", "snippets_dropped"}
+    """
+    budget = budget or PROMPT_CONFIG["budgets"][caller]
+    content = (content or "").strip()
+    free = max(budget - template.fixed_tokens - sum(count_tokens(str(value)) * template.fields[name]
+                                                    for name, value in fields.items()), 0)
+    snippets = [trim_to_tokens(s, PROMPT_CONFIG["snippet_tokens"])
+                for s in rank_knowledge(knowledge, f"{fields.get('topic', '')} {content}")[:PROMPT_CONFIG["max_snippets"]]]
+    wanted = sum(count_tokens(s) + 1 for s in snippets)
+    fitted = trim_to_tokens(content, max(free - wanted, int(free * PROMPT_CONFIG["content_share"])))
+    left = free - count_tokens(fitted)
+    kept = []
+    for snippet in snippets:
+        cost = count_tokens(snippet) + 1
+        if snippet and cost <= left:
+            kept.append(snippet)
+            left -= cost
+    prompt = template.render(content=fitted, knowledge="\n".join(kept), **fields)
+    info = {"tokens": count_tokens(prompt), "content_trimmed": fitted != content,
+            "snippets": len(kept), "snippets_dropped": len(knowledge or []) - len(kept)}
+    REGISTRY.histogram("glitchbot_prompt_tokens", {"caller": caller}, "Estimated prompt tokens per LLM call",
+                       buckets=TOKEN_BUCKETS).observe(info["tokens"])
+    if info["content_trimmed"]:
+        REGISTRY.counter("glitchbot_prompt_trimmed_total", {"caller": caller}, "Prompts whose content was cut to fit the budget").inc()
+    return prompt, info
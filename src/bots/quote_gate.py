@@ -0,0 +1,170 @@
+"""
+Glitch Bot Quote Gate (local pre-filter before the GPT-4 quote call)
+
+Most candidate tweets end in SKIP, a banned/generic comment or a near-duplicate, each after a
+full GPT-4 call. The gate decides offline whether a candidate is worth that call:
+
+    1. rules:  assess_content_quality below min_quality (e.g. negative indicators) -> no call
+    2. model:  a logistic regression over hashed words and the quality indicators, trained on
+               quote_outcomes (prepared = 1; skip / banned / similar = 0), predicts whether the
+               call will produce a usable post; below threshold -> no call
+
+A share of the model's rejections (explore_rate) goes through anyway, so the history keeps
+labels for the kind of tweet the model turns down. The model retrains itself every
+retrain_every outcomes once min_samples exist; until then only the rules apply. Weights are
+stored in gate_models, so every worker and restart uses the latest model.
+"""
+import json
+import math
+import random
+import re
+import threading
+import zlib
+from typing import Dict, List, Tuple
+
+from src.bots.config import QUALITY_INDICATORS, QUOTE_GATE_CONFIG
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY
+
+log = get_logger("quote_gate")
+
+POSITIVE_OUTCOMES = ("prepared",)
+OUTCOMES = ("prepared", "skip", "banned", "similar")
+
+_TOKEN = re.compile(r"[a-z0-9$#@']+")
+
+
+def features(content: str, topic: str = None, buckets: int = None) -> Dict[int, float]:
+    """Sparse feature vector: hashed words, topic, quality-indicator counts and shape flags"""
+    buckets = buckets or QUOTE_GATE_CONFIG["features"]
+    text = (content or "").lower()
+
+    def slot(name: str) -> int:
+        return zlib.crc32(name.encode("utf-8")) % buckets
+
+    vector = {slot("bias"): 1.0}
+    for word in set(_TOKEN.findall(text)):
+        vector[slot(f"w:{word}")] = 1.0
+    if topic:
+        vector[slot(f"topic:{topic.lower()}")] = 1.0
+    vector[slot("q:high")] = sum(1 for kw in QUALITY_INDICATORS["high_quality"] if kw in text) / 3
+    vector[slot("q:negative")] = sum(1 for kw in QUALITY_INDICATORS["negative_indicators"] if kw in text)
+    vector[slot(f"len:{min(len(text) // 70, 4)}")] = 1.0
+    if "http" in text:
+        vector[slot("has:link")] = 1.0
+    if re.search(r"\d", text):
+        vector[slot("has:number")] = 1.0
+    return vector
+
+
+def _sigmoid(z: float) -> float:
+    return 1 / (1 + math.exp(-max(min(z, 30), -30)))
+
+
+class QuoteGate:
+    def __init__(self, db, config: Dict = None, seed: int = None):
+        self.db = db
+        self.config = dict(QUOTE_GATE_CONFIG, **(config or {}))
+        self.rng = random.Random(seed)
+        self.weights: Dict[int, float] = {}
+        self.model_id = None
+        self._since_train = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> bool:
+        """Pick up the newest stored model (possibly trained by another worker)"""
+        with self.db.get_connection() as conn:
+            row = conn.execute("SELECT id, weights FROM gate_models ORDER BY id DESC LIMIT 1").fetchone()
+        if row is None or row["id"] == self.model_id:
+            return False
+        self.weights = {int(k): v for k, v in json.loads(row["weights"]).items()}
+        self.model_id = row["id"]
+        return True
+
+    def score(self, content: str, topic: str = None) -> float:
+        """Predicted chance that a GPT-4 quote of content becomes a usable post (None before the first training)"""
+        if not self.weights:
+            return None
+        vector = features(content, topic, self.config["features"])
+        return _sigmoid(sum(self.weights.get(i, 0.0) * v for i, v in vector.items()))
+
+    def decide(self, content: str, topic: str = None, quality_score: int = 0) -> Tuple[bool, str]:
+        """Whether to spend the expensive call on this candidate, and why"""
+        if quality_score < self.config["min_quality"]:
+            decision = (False, "quality")
+        else:
+            p = self.score(content, topic)
+            if p is None or p >= self.config["threshold"]:
+                decision = (True, "model" if p is not None else "untrained")
+            elif self.rng.random() < self.config["explore_rate"]:
+                decision = (True, "explore")
+            else:
+                decision = (False, "model")
+        allowed, reason = decision
+        REGISTRY.counter("glitchbot_quote_gate_total", {"decision": "call" if allowed else "skip", "reason": reason},
+                         "Quote candidates by pre-gate decision").inc()
+        if not allowed:
+            REGISTRY.counter("glitchbot_llm_calls_avoided_total", {"reason": f"gate_{reason}"},
+                             "Expensive LLM calls not made").inc()
+        return decision
+
+    def record(self, tweet_id: str, content: str, topic: str, outcome: str, model: str = None):
+        """Label a finished generation; retrains once retrain_every new labels have come in"""
+        if outcome not in OUTCOMES:
+            raise ValueError(f"Unknown quote outcome: {outcome}")
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                INSERT INTO quote_outcomes (tweet_id, topic, content, outcome, label, model) VALUES (?, ?, ?, ?, ?, ?)
+            """, (tweet_id, topic, content, outcome, int(outcome in POSITIVE_OUTCOMES), model))
+            conn.commit()
+        with self._lock:
+            self._since_train += 1
+            due = self._since_train >= self.config["retrain_every"]
+            if due:
+                self._since_train = 0
+        if due:
+            self.train()
+
+    def train(self) -> Dict:
+        """Fit on the latest max_samples outcomes with SGD; stores the weights if there are enough samples"""
+        with self.db.get_connection() as conn:
+            rows = conn.execute("SELECT content, topic, label FROM quote_outcomes ORDER BY id DESC LIMIT ?",
+                                (self.config["max_samples"],)).fetchall()
+        if len(rows) < self.config["min_samples"]:
+            return {"trained": False, "samples": len(rows)}
+        samples = [(features(r["content"], r["topic"], self.config["features"]), r["label"]) for r in rows]
+        positives = sum(label for _, label in samples)
+        # Weight the rarer class up so a mostly-SKIP history doesn't teach "always skip"
+        class_weight = {1: len(samples) / (2 * max(positives, 1)), 0: len(samples) / (2 * max(len(samples) - positives, 1))}
+        weights: Dict[int, float] = {}
+        rng = random.Random(len(samples))
+        rate, l2 = self.config["learning_rate"], self.config["l2"]
+        for _ in range(self.config["epochs"]):
+            rng.shuffle(samples)
+            for vector, label in samples:
+                p = _sigmoid(sum(weights.get(i, 0.0) * v for i, v in vector.items()))
+                step = rate * class_weight[label] * (label - p)
+                for i, v in vector.items():
+                    w = weights.get(i, 0.0)
+                    weights[i] = w + step * v - rate * l2 * w
+        correct = sum((_sigmoid(sum(weights.get(i, 0.0) * v for i, v in vector.items())) >= 0.5) == bool(label)
+                      for vector, label in samples)
+        info = {"trained": True, "samples": len(samples), "positive_rate": round(positives / len(samples), 3),
+                "accuracy": round(correct / len(samples), 3)}
+        with self.db.get_connection() as conn:
+            conn.execute("INSERT INTO gate_models (samples, positive_rate, accuracy, weights) VALUES (?, ?, ?, ?)",
+                         (info["samples"], info["positive_rate"], info["accuracy"],
+                          json.dumps({str(i): round(w, 5) for i, w in weights.items() if abs(w) > 1e-5})))
+            conn.execute("DELETE FROM gate_models WHERE id NOT IN (SELECT id FROM gate_models ORDER BY id DESC LIMIT 5)")
+            conn.commit()
+        self.load()
+        log.info("Quote gate retrained on %d outcomes (%.0f%% usable, training accuracy %.2f)",
+                 info["samples"], info["positive_rate"] * 100, info["accuracy"])
+        return info
+
+    def stats(self) -> List[Dict]:
+        with self.db.get_connection() as conn:
+            return [dict(row) for row in conn.execute("""
+                SELECT outcome, COUNT(*) AS n FROM quote_outcomes GROUP BY outcome ORDER BY outcome
+            """)]
@@ -0,0 +1,311 @@
+"""
+Glitch Bot Traffic Record & Replay
+
+Recording wraps the Twitter plugin client and the OpenAI client and appends every call (arguments,
+response or error, duration) to a compact JSON-lines log (gzip-compressed when the path ends in .gz).
+Replay feeds that log back through the real enhanced_monitor_and_respond -> reply_to_mention ->
+post_insight_from_timeline path, optionally time-compressed, so a day of traffic can be re-run in minutes.
+
+    python -m src.bots.glitch_bot_main --record traffic.jsonl.gz
+    python -m src.bots.glitch_bot_main replay --log traffic.jsonl.gz --speed 100
+"""
+import gzip
+import hashlib
+import itertools
+import json
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+from src.bots.fakes import FakeChatStream, chat_pieces, make_chat_completion
+from src.bots.log_utils import get_logger
+
+log = get_logger("recording")
+
+TWITTER = "tw"
+OPENAI = "ai"
+
+
+def _open(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _call_key(kwargs: Dict) -> str:
+    return json.dumps(kwargs, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _openai_key(kwargs: Dict) -> str:
+    digest = hashlib.sha1(_call_key(kwargs.get("messages", [])).encode("utf-8")).hexdigest()[:16]
+    return f"{kwargs.get('model')}:{digest}"
+
+
+class TrafficRecorder:
+    """Append-only writer; one short JSON object per call"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = _open(path, "a")
+        self._lock = threading.Lock()
+
+    def write(self, service: str, method: str, key: str, started: float, duration: float,
+              response=None, error: Exception = None):
+        entry = {"t": round(started, 3), "s": service, "m": method, "k": key, "d": round(duration, 4)}
+        if error is not None:
+            entry["e"] = f"{type(error).__name__}: {error}"
+        else:
+            entry["r"] = response
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RecordingTwitterClient:
+    """Proxy around the plugin's twitter_client that records each method call"""
+
+    def __init__(self, client, recorder: TrafficRecorder):
+        self._client = client
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+        def recorded(*args, **kwargs):
+            if args:
+                kwargs = dict(kwargs, _args=list(args))
+                call_args = args
+            else:
+                call_args = ()
+            call_kwargs = {k: v for k, v in kwargs.items() if k != "_args"}
+            started = time.time()
+            t0 = time.perf_counter()
+            try:
+                response = attr(*call_args, **call_kwargs)
+            except Exception as e:
+                self._recorder.write(TWITTER, name, _call_key(kwargs), started, time.perf_counter() - t0, error=e)
+                raise
+            self._recorder.write(TWITTER, name, _call_key(kwargs), started, time.perf_counter() - t0, response=response)
+            return response
+        return recorded
+
+
+class _Namespace:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class RecordingOpenAI:
+    """Proxy exposing chat.completions.create like the OpenAI v1 client, recording each completion"""
+
+    def __init__(self, client, recorder: TrafficRecorder):
+        self._client = client
+        self._recorder = recorder
+        self.chat = _Namespace(completions=_Namespace(create=self._create))
+
+    def _create(self, **kwargs):
+        started = time.time()
+        t0 = time.perf_counter()
+        try:
+            response = self._client.chat.completions.create(**kwargs)
+        except Exception as e:
+            self._recorder.write(OPENAI, "chat.completions.create", _openai_key(kwargs), started, time.perf_counter() - t0, error=e)
+            raise
+        if kwargs.get("stream"):
+            return _RecordedStream(response, lambda text, finish: self._recorder.write(
+                OPENAI, "chat.completions.create", _openai_key(kwargs), started, time.perf_counter() - t0,
+                response={"c": text, "f": finish, "model": kwargs.get("model"), "p": 0, "o": 0}))
+        usage = getattr(response, "usage", None)
+        self._recorder.write(OPENAI, "chat.completions.create", _openai_key(kwargs), started, time.perf_counter() - t0, response={
+            "c": response.choices[0].message.content,
+            "f": getattr(response.choices[0], "finish_reason", None),
+            "model": getattr(response, "model", kwargs.get("model")),
+            "p": getattr(usage, "prompt_tokens", 0),
+            "o": getattr(usage, "completion_tokens", 0),
+        })
+        return response
+
+
+class _RecordedStream:
+    """Passes a completion stream through and records what the caller read once it is closed or exhausted"""
+
+    def __init__(self, stream, record):
+        self._stream = stream
+        self._record = record
+        self._parts = []
+        self._finish = None
+        self._recorded = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if chunk.choices:
+                self._parts.append(chunk.choices[0].delta.content or "")
+                self._finish = chunk.choices[0].finish_reason or self._finish
+            yield chunk
+        self.close()
+
+    def close(self):
+        close = getattr(self._stream, "close", None)
+        if close:
+            close()
+        if not self._recorded:
+            self._recorded = True
+            self._record("".join(self._parts), self._finish)
+
+
+def enable_recording(path: str) -> TrafficRecorder:
+    """Route all Twitter and OpenAI traffic through recording proxies"""
+    from src.bots.llm_utils import get_openai_client, set_openai_client
+    from src.bots.accounts import current_account
+    from src.bots.twitter_utils import create_plugin_client, set_twitter_client
+    recorder = TrafficRecorder(path)
+    set_twitter_client(RecordingTwitterClient(create_plugin_client(current_account().twitter_token), recorder))
+    openai_client = get_openai_client("recording")
+    if openai_client is not None:
+        set_openai_client(RecordingOpenAI(openai_client, recorder))
+    log.info("Appending API traffic to %s", path)
+    return recorder
+
+
+class ReplayError(Exception):
+    """Re-raised in place of a recorded upstream error"""
+
+
+class TrafficLog:
+    """
+    A loaded recording. Calls are matched by (service, method, arguments) first and fall back to the
+    next unused entry for the same method, so replays stay deterministic even if arguments drift.
+    """
+
+    def __init__(self, path: str):
+        self.entries = []
+        with _open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    self.entries.append(json.loads(line))
+        self.entries.sort(key=lambda e: e["t"])
+        self._by_key = defaultdict(deque)
+        self._by_method = defaultdict(deque)
+        for i, entry in enumerate(self.entries):
+            self._by_key[(entry["s"], entry["m"], entry["k"])].append(i)
+            self._by_method[(entry["s"], entry["m"])].append(i)
+        self._used = set()
+        self._lock = threading.Lock()
+        self.misses = 0
+
+    def take(self, service: str, method: str, key: str) -> Optional[Dict]:
+        with self._lock:
+            for queue in (self._by_key.get((service, method, key)), self._by_method.get((service, method))):
+                while queue:
+                    i = queue.popleft()
+                    if i not in self._used:
+                        self._used.add(i)
+                        return self.entries[i]
+            self.misses += 1
+            return None
+
+    def cycle_starts(self):
+        """Recorded start times of monitoring cycles (each begins by polling mentions)"""
+        return [e["t"] for e in self.entries if e["s"] == TWITTER and e["m"] == "get_users_mentions"]
+
+
+class _Replayer:
+    def __init__(self, log: TrafficLog, speed: float):
+        self.log = log
+        self.speed = speed
+
+    def _replay(self, entry: Dict):
+        if self.speed and entry.get("d"):
+            time.sleep(entry["d"] / self.speed)
+        if "e" in entry:
+            raise ReplayError(entry["e"])
+        return entry.get("r")
+
+
+class ReplayTwitterClient(_Replayer):
+    """Serves recorded Twitter responses; unrecorded reads return empty pages"""
+    _ids = itertools.count(9 * 10 ** 17)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        def replayed(*args, **kwargs):
+            if args:
+                kwargs = dict(kwargs, _args=list(args))
+            entry = self.log.take(TWITTER, name, _call_key(kwargs))
+            if entry is None:
+                if name == "create_tweet":
+                    return {"data": {"id": str(next(self._ids)), "text": kwargs.get("text", "")}}
+                return {"data": []}
+            return self._replay(entry)
+        return replayed
+
+
+class ReplayOpenAI(_Replayer):
+    """Serves recorded completions; unrecorded prompts get 'SKIP' so nothing new is generated"""
+
+    def __init__(self, log: TrafficLog, speed: float):
+        super().__init__(log, speed)
+        self.chat = _Namespace(completions=_Namespace(create=self._create))
+
+    def _create(self, **kwargs):
+        entry = self.log.take(OPENAI, "chat.completions.create", _openai_key(kwargs))
+        r = self._replay(entry) if entry is not None else {"c": "SKIP"}
+        model = r.get("model") or kwargs.get("model", "gpt-4")
+        if kwargs.get("stream"):
+            return FakeChatStream(chat_pieces(r["c"] or ""), model)
+        return make_chat_completion(r["c"], model, r.get("p", 0), r.get("o", 0),
+                                    r.get("f") or "stop")
+
+
+def replay_traffic(path: str, speed: float = 100.0, db_path: str = None, topic: str = "AI") -> Dict:
+    """
+    Re-run recorded traffic through the agent's monitor -> reply -> post path.
+
+    Cycles start at the recorded mention polls, with gaps and API latencies divided by speed
+    (speed=0 runs back-to-back). Writes go to db_path, a scratch DB by default.
+    """
+    from src.bots.benchmarks import _lift_rate_limits, use_database
+    from src.bots.llm_utils import set_openai_client
+    from src.bots.twitter_utils import set_twitter_client
+    traffic = TrafficLog(path)
+    set_twitter_client(ReplayTwitterClient(traffic, speed))
+    set_openai_client(ReplayOpenAI(traffic, speed))
+    _lift_rate_limits()
+    agent = use_database(db_path or tempfile.mkstemp(prefix="glitchbot-replay-", suffix=".db")[1])
+    starts = traffic.cycle_starts() or ([traffic.entries[0]["t"]] if traffic.entries else [])
+    replies = posts = 0
+    wall_start = time.perf_counter()
+    for cycle_start in starts:
+        if speed:
+            wait = (cycle_start - starts[0]) / speed - (time.perf_counter() - wall_start)
+            if wait > 0:
+                time.sleep(wait)
+        agent.enhanced_monitor_and_respond()
+        _, _, info = agent.process_mention_queue()
+        replies += len(info["mentions_replied"])
+        status, _, _ = agent.post_insight_from_timeline(topic, current_state={})
+        posts += status == agent.FunctionResultStatus.DONE
+    wall = time.perf_counter() - wall_start
+    recorded_span = (traffic.entries[-1]["t"] - traffic.entries[0]["t"]) if traffic.entries else 0.0
+    summary = {
+        "cycles": len(starts),
+        "recorded_seconds": round(recorded_span, 1),
+        "replay_seconds": round(wall, 2),
+        "compression": round(recorded_span / wall, 1) if wall > 0 else None,
+        "replies": replies,
+        "posts_prepared": posts,
+        "unmatched_calls": traffic.misses,
+        "db_path": agent.db.db_path,
+    }
+    log.info("Replay finished", extra=summary)
+    return summary
@@ -0,0 +1,260 @@
+"""
+Glitch Bot Task Scheduler
+"""
+import heapq
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.bots.breakers import UpstreamError
+from src.bots.log_utils import get_logger
+from src.bots.tracing import TRACER
+
+log = get_logger("scheduler")
+
+
+class SystemClock:
+    """Wall clock used in production"""
+    def time(self) -> float:
+        return time.time()
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            time.sleep(seconds)
+
+
+class FakeClock:
+    """Deterministic clock for tests: sleep() just advances time"""
+    def __init__(self, start: float = 0.0):
+        self.now = start
+    def time(self) -> float:
+        return self.now
+    def sleep(self, seconds: float):
+        if seconds > 0:
+            self.now += seconds
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class ScheduledTask:
+    """
+    A recurring job.
+
+    interval:     base seconds between runs
+    priority:     lower runs first when several tasks are due at once
+    jitter:       random seconds (0..jitter) added to each delay so tasks don't fire in lockstep
+    deadline:     if a run starts more than this many seconds late it is skipped (counted as missed)
+    align:        schedule on multiples of interval (e.g. posting slots at :00 and :30)
+    min_interval: delay after a run that found work; idle runs back off towards max_interval
+    max_interval: ceiling for idle backoff and for error backoff
+    idle_backoff: multiplier applied to the delay after each run that found nothing to do
+
+    fn() may return a truthy value when it did work and a falsy one when it was idle; None
+    (no opinion) keeps the base interval.
+    """
+    def __init__(self, name: str, fn: Callable[[], object], interval: float, priority: int = 5,
+                 jitter: float = 0.0, deadline: float = None, align: bool = False,
+                 min_interval: float = None, max_interval: float = None, idle_backoff: float = 1.0):
+        self.name = name
+        self.fn = fn
+        self.interval = float(interval)
+        self.priority = priority
+        self.jitter = jitter
+        self.deadline = deadline
+        self.align = align
+        self.min_interval = float(min_interval) if min_interval else self.interval
+        self.max_interval = float(max_interval) if max_interval else self.interval
+        self.idle_backoff = idle_backoff
+        self.current_interval = self.interval
+        self.next_run = 0.0
+        self.runs = 0
+        self.errors = 0
+        self.missed = 0
+        self.consecutive_errors = 0
+        self.last_run = None
+        self.last_duration = None
+        self.last_error = None
+
+    @classmethod
+    def from_config(cls, name: str, fn: Callable[[], object], config: Dict) -> "ScheduledTask":
+        return cls(name, fn, **config)
+
+    def status(self) -> Dict:
+        return {
+            "name": self.name,
+            "next_run": self.next_run,
+            "interval": self.current_interval,
+            "runs": self.runs,
+            "errors": self.errors,
+            "missed": self.missed,
+            "last_run": self.last_run,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+        }
+
+
+class Scheduler:
+    """
+    Runs ScheduledTasks on their own cadences from a single thread.
+
+    Tasks are kept in a heap keyed by (next_run, priority). A failing task only delays itself
+    (exponential backoff up to its max_interval); the rest keep their schedule.
+    """
+
+    def __init__(self, clock=None, rng: random.Random = None):
+        self.clock = clock or SystemClock()
+        self.rng = rng or random.Random()
+        self.tasks: Dict[str, ScheduledTask] = {}
+        self._heap = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._heap_lock = threading.Lock()  # trigger() may be called from other threads
+
+    def add(self, task: ScheduledTask, run_immediately: bool = True) -> ScheduledTask:
+        now = self.clock.time()
+        if task.align:
+            task.next_run = self._next_aligned(task, now) if not run_immediately else now
+        else:
+            task.next_run = now if run_immediately else now + task.interval
+        self.tasks[task.name] = task
+        with self._heap_lock:
+            heapq.heappush(self._heap, (task.next_run, task.priority, task.name))
+        return task
+
+    def _next_aligned(self, task: ScheduledTask, now: float) -> float:
+        return (int(now // task.interval) + 1) * task.interval
+
+    def _reschedule(self, task: ScheduledTask, now: float, result=None, failed: bool = False):
+        if failed:
+            delay = min(task.interval * (2 ** task.consecutive_errors), max(task.max_interval, task.interval))
+        elif result is None:
+            delay = task.interval
+        elif result:
+            delay = task.min_interval
+        else:
+            delay = min(task.current_interval * task.idle_backoff, task.max_interval)
+        task.current_interval = delay
+        if task.align and not failed:
+            task.next_run = self._next_aligned(task, now)
+        else:
+            task.next_run = now + delay
+        if task.jitter:
+            task.next_run += self.rng.uniform(0, task.jitter)
+        with self._heap_lock:
+            heapq.heappush(self._heap, (task.next_run, task.priority, task.name))
+
+    def trigger(self, name: str):
+        """Make a task due now (e.g. a priority mention arrived through another channel); thread-safe"""
+        task = self.tasks[name]
+        with self._heap_lock:
+            task.next_run = self.clock.time()
+            heapq.heappush(self._heap, (task.next_run, task.priority, task.name))
+        self._wake.set()
+
+    def _pop_due(self, now: float) -> Optional[ScheduledTask]:
+        with self._heap_lock:
+            while self._heap and self._heap[0][0] <= now:
+                next_run, _, name = heapq.heappop(self._heap)
+                task = self.tasks.get(name)
+                # Stale heap entries are left behind by trigger()/reschedule; skip them
+                if task and task.next_run == next_run:
+                    return task
+        return None
+
+    def run_pending(self) -> List[str]:
+        """Run every task that is due, in (next_run, priority) order; returns the names that ran"""
+        ran = []
+        now = self.clock.time()
+        due = []
+        while True:
+            task = self._pop_due(now)
+            if not task:
+                break
+            due.append(task)
+        due.sort(key=lambda t: (t.priority, t.next_run))
+        for task in due:
+            start = self.clock.time()
+            if task.deadline is not None and start - task.next_run > task.deadline:
+                task.missed += 1
+                log.warning("Skipping %s: %.0fs past its slot (deadline %ss)", task.name, start - task.next_run, task.deadline)
+                self._reschedule(task, start)
+                continue
+            try:
+                with TRACER.span(f"task.{task.name}", interval=task.current_interval):
+                    result = task.fn()
+                failed = False
+                task.consecutive_errors = 0
+                task.last_error = None
+            except Exception as e:
+                result, failed = None, True
+                task.errors += 1
+                task.consecutive_errors += 1
+                task.last_error = str(e)
+                if isinstance(e, UpstreamError):
+                    # Rate limits and open circuits are the upstream's state, not a bug: no traceback
+                    log.warning("Task %s failed: %s: %s", task.name, type(e).__name__, e)
+                else:
+                    log.error("Task %s failed: %s", task.name, e, exc_info=True)
+            end = self.clock.time()
+            task.runs += 1
+            task.last_run = start
+            task.last_duration = end - start
+            self._reschedule(task, end, result, failed)
+            ran.append(task.name)
+        return ran
+
+    def seconds_until_next(self) -> Optional[float]:
+        with self._heap_lock:
+            if not self._heap:
+                return None
+            next_run = self._heap[0][0]
+        return max(0.0, next_run - self.clock.time())
+
+    def run_forever(self, max_idle_sleep: float = 60.0):
+        """Loop until stop() is called; sleeps exactly until the next task is due"""
+        while not self._stop.is_set():
+            self.run_pending()
+            wait = self.seconds_until_next()
+            wait = min(wait if wait is not None else max_idle_sleep, max_idle_sleep)
+            if isinstance(self.clock, SystemClock):
+                # Interruptible, so trigger() from another thread takes effect immediately
+                self._wake.wait(wait)
+                self._wake.clear()
+            else:
+                self.clock.sleep(wait)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def status(self) -> List[Dict]:
+        return [task.status() for task in sorted(self.tasks.values(), key=lambda t: t.next_run)]
+
+    def dump(self) -> Dict[str, Dict]:
+        """Where each task is in its cadence: when it is next due (wall clock) and its backed-off interval"""
+        offset = time.time() - self.clock.time()
+        return {name: {"due_at": task.next_run + offset, "interval": task.current_interval,
+                       "consecutive_errors": task.consecutive_errors}
+                for name, task in self.tasks.items()}
+
+    def restore(self, state: Dict[str, Dict]) -> int:
+        """
+        Resume the cadences dump() saved, possibly in an earlier process; tasks it doesn't name keep
+        their schedule. Tasks that fell due while the process was down run at once, unless they are
+        past their deadline (a missed posting slot is skipped as usual). Returns the tasks restored.
+        """
+        now = self.clock.time()
+        offset = time.time() - now
+        restored = 0
+        with self._heap_lock:
+            for name, saved in state.items():
+                task = self.tasks.get(name)
+                if task is None:
+                    continue
+                task.next_run = saved["due_at"] - offset
+                task.current_interval = saved["interval"]
+                task.consecutive_errors = saved["consecutive_errors"]
+                heapq.heappush(self._heap, (task.next_run, task.priority, task.name))
+                restored += 1
+        self._wake.set()
+        return restored
@@ -0,0 +1,105 @@
+"""
+Glitch Bot Search Planner (packed, rotating topic searches)
+
+TOPICS_TO_MONITOR is packed into OR-combined queries, e.g.
+    (AI OR "machine learning" OR LLM) (breakthrough OR innovation OR announcement) -is:retweet
+each within the search API's query-length limit. Every cycle runs the queries_per_cycle packs with
+the highest priority: smoothed signal yield (share of results passing assess_content_quality)
+times seconds since the pack last ran, with never-run packs first. So the whole topic list is
+covered every few cycles for the same number of calls, and productive packs run more often.
+Each pack keeps its own since_id in the search_queries table, so reruns only return new tweets.
+"""
+import json
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from src.bots.config import SEARCH_CONFIG
+
+
+def quote_term(term: str) -> str:
+    term = term.strip()
+    return f'"{term}"' if " " in term else term
+
+
+def pack_terms(terms: Iterable[str], suffix: str = "", max_length: int = None, max_terms: int = None) -> List[Tuple[List[str], str]]:
+    """
+    Greedily OR-pack terms into queries "(a OR b ...)<suffix>" no longer than max_length and with at
+    most max_terms terms each; returns (terms, query) pairs in input order
+    """
+    max_length = max_length or SEARCH_CONFIG["max_query_length"]
+    packs: List[Tuple[List[str], str]] = []
+    current: List[str] = []
+
+    def build(group: List[str]) -> str:
+        return f"({' OR '.join(quote_term(t) for t in group)}){suffix}"
+
+    for term in (t.strip() for t in terms):
+        if not term:
+            continue
+        candidate = current + [term]
+        if current and (len(build(candidate)) > max_length or (max_terms and len(candidate) > max_terms)):
+            packs.append((current, build(current)))
+            candidate = [term]
+        current = candidate
+    if current:
+        packs.append((current, build(current)))
+    return packs
+
+
+class SearchPlanner:
+    def __init__(self, db, config: Dict = None):
+        self.db = db
+        self.config = dict(SEARCH_CONFIG, **(config or {}))
+
+    def packs(self, topics: Iterable[str], keywords: Iterable[str] = ()) -> List[Tuple[List[str], str]]:
+        keywords = list(keywords)
+        suffix = (f" ({' OR '.join(keywords)})" if keywords else "") + " -is:retweet"
+        return pack_terms(topics, suffix, self.config["max_query_length"], self.config["max_topics_per_query"])
+
+    def priority(self, row: Dict, now: float) -> float:
+        if not row or row["last_run_at"] is None:
+            return float("inf")
+        signal = row["signal_yield"] if row["signal_yield"] is not None else self.config["prior_yield"]
+        return max(signal, self.config["min_yield"]) * (now - row["last_run_at"])
+
+    def plan(self, topics: Iterable[str], keywords: Iterable[str] = (), limit: int = None, now: float = None) -> List[Dict]:
+        """The packed queries to run this cycle: dicts with query, topics and since_id"""
+        now = now or time.time()
+        packs = self.packs(topics, keywords)
+        with self.db.get_connection() as conn:
+            conn.executemany("INSERT OR IGNORE INTO search_queries (query, topics) VALUES (?, ?)",
+                             [(query, json.dumps(group)) for group, query in packs])
+            conn.commit()
+            rows = {row["query"]: dict(row) for row in conn.execute(
+                f"SELECT * FROM search_queries WHERE query IN ({','.join('?' * len(packs))})", [q for _, q in packs]
+            )} if packs else {}
+        order = sorted(range(len(packs)), key=lambda i: (-self.priority(rows.get(packs[i][1]), now), i))
+        chosen = order[:limit or self.config["queries_per_cycle"]]
+        return [{"query": packs[i][1], "topics": packs[i][0], "since_id": (rows.get(packs[i][1]) or {}).get("since_id")}
+                for i in chosen]
+
+    def record_run(self, query: str, returned: int, passed: int, newest_id: str = None, error: str = None, now: float = None):
+        """Advance the query's cursor and fold this run's pass rate into its yield"""
+        alpha = self.config["yield_alpha"]
+        with self.db.get_connection() as conn:
+            conn.execute("""
+                UPDATE search_queries SET
+                    last_run_at = ?,
+                    runs = runs + 1,
+                    results = results + ?,
+                    passed = passed + ?,
+                    since_id = COALESCE(?, since_id),
+                    signal_yield = CASE WHEN ? > 0
+                        THEN (1 - ?) * COALESCE(signal_yield, ?) + ? * (CAST(? AS REAL) / ?)
+                        ELSE signal_yield END,
+                    last_error = ?
+                WHERE query = ?
+            """, (now or time.time(), returned, passed, newest_id, returned, alpha, self.config["prior_yield"], alpha,
+                  passed, max(returned, 1), error, query))
+            conn.commit()
+
+    def stats(self) -> List[Dict]:
+        with self.db.get_connection() as conn:
+            return [dict(row) for row in conn.execute("""
+                SELECT query, runs, results, passed, signal_yield, last_run_at, since_id FROM search_queries ORDER BY query
+            """)]
@@ -0,0 +1,313 @@
+"""
+Glitch Bot Streaming Ingestion (Twitter v2 filtered stream)
+
+Instead of polling mentions and topic searches, keep one long-lived filtered-stream connection
+whose rules are built from each account's handle and TOPICS_TO_MONITOR. Matching tweets are stored
+(and mentions queued) within a second of being posted, and quiet periods cost no API budget.
+
+One connection serves every account in the process: rules are tagged
+"glitchbot:<kind>:<account>" and events are routed by the tags they matched. Rules without the
+"glitchbot:" prefix belong to someone else and are left alone.
+
+After a reconnect the stream is resumed: backfill_minutes (if the access level allows it) asks the
+API to replay what was missed, and StreamIngestor.catch_up() runs one REST poll to cover longer gaps.
+Events already seen are dropped, so overlapping backfill and catch-up are harmless.
+"""
+import http.client
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from src.bots.accounts import Account, use_account
+from src.bots.config import STREAM_CONFIG, TOPICS_TO_MONITOR
+from src.bots.log_utils import get_logger, log_payload
+from src.bots.mention_queue import parse_tweet_time
+from src.bots.metrics import REGISTRY
+from src.bots.search_planner import pack_terms
+
+log = get_logger("stream")
+
+TAG_PREFIX = "glitchbot:"
+
+
+def topic_rules(topics: List[str], keywords: List[str], tag: str, max_length: int = None) -> List[Dict]:
+    """OR-pack topics into as few rules as fit max_length; each rule also requires one of keywords"""
+    suffix = f" ({' OR '.join(keywords)}) -is:retweet" if keywords else " -is:retweet"
+    return [{"value": value, "tag": tag}
+            for _, value in pack_terms(topics, suffix, max_length or STREAM_CONFIG["max_rule_length"])]
+
+
+def bot_username(account: Account) -> str:
+    """The account's own @handle, from get_me (which also fills in the cached bot user id)"""
+    me = account.twitter_client().get_me()["data"]
+    account.bot_user_id = account.bot_user_id or me["id"]
+    return me["username"]
+
+
+def account_rules(account: Account, topics: List[str] = None) -> List[Dict]:
+    """Stream rules for one account: mentions of its handle, plus its topic searches"""
+    from src.bots.glitch_bot_agent import TOPIC_INSIGHT_KEYWORDS
+    rules = [{"value": f"@{bot_username(account)} -is:retweet", "tag": f"{TAG_PREFIX}mentions:{account.name}"}]
+    rules += topic_rules(topics or TOPICS_TO_MONITOR, TOPIC_INSIGHT_KEYWORDS, f"{TAG_PREFIX}topics:{account.name}")
+    return rules
+
+
+class StreamIngestor:
+    """
+    Routes stream events to their accounts and hands them to the same ingestion code the pollers
+    use (queue_mention / store_topic_tweet). on_mention(account, tweet, is_priority) and
+    on_tweet(account, tweet) run after a tweet is stored, e.g. to wake the mention task or to
+    enqueue pipeline jobs; after a catch-up poll on_mention is called with tweet=None.
+    """
+
+    def __init__(self, accounts: List[Account], topics: List[str] = None,
+                 on_mention: Callable[[Account, Dict, bool], object] = None,
+                 on_tweet: Callable[[Account, Dict], object] = None, remember: int = 10000):
+        self.accounts = {account.name: account for account in accounts}
+        self.topics = topics or TOPICS_TO_MONITOR
+        self.on_mention = on_mention
+        self.on_tweet = on_tweet
+        self._seen: "OrderedDict[tuple, None]" = OrderedDict()
+        self._remember = remember
+        self._events = REGISTRY.counter("glitchbot_stream_events_total", {"kind": "tweet"}, "Filtered-stream events")
+        self._duplicates = REGISTRY.counter("glitchbot_stream_events_total", {"kind": "duplicate"})
+        self._lag = REGISTRY.histogram("glitchbot_stream_lag_seconds", None, "Time from a tweet being posted to it being stored")
+
+    def rules(self) -> List[Dict]:
+        rules = []
+        for account in self.accounts.values():
+            with use_account(account):
+                rules += account_rules(account, self.topics)
+        return rules
+
+    def _first_time(self, key: tuple) -> bool:
+        if key in self._seen:
+            return False
+        self._seen[key] = None
+        if len(self._seen) > self._remember:
+            self._seen.popitem(last=False)
+        return True
+
+    def _topic_for(self, text: str) -> str:
+        lowered = text.lower()
+        return next((t for t in self.topics if t.strip().lower() in lowered), self.topics[0])
+
+    def handle(self, event: Dict) -> int:
+        """Ingest one stream event; returns how many (account, tweet) pairs were stored"""
+        from src.bots import glitch_bot_agent as agent
+        tweet = event.get("data")
+        if not tweet:
+            if event.get("errors"):
+                log.warning("Stream error event: %s", event["errors"])
+            return 0
+        self._events.inc()
+        usernames = {u["id"]: u.get("username", "") for u in event.get("includes", {}).get("users", [])}
+        stored = 0
+        for rule in event.get("matching_rules", []):
+            tag = rule.get("tag") or ""
+            if not tag.startswith(TAG_PREFIX):
+                continue
+            kind, _, name = tag[len(TAG_PREFIX):].partition(":")
+            account = self.accounts.get(name)
+            if account is None or not self._first_time((name, kind, tweet["id"])):
+                self._duplicates.inc()
+                continue
+            with use_account(account):
+                if kind == "mentions":
+                    is_priority = agent.queue_mention(tweet, usernames)
+                    if self.on_mention:
+                        self.on_mention(account, tweet, is_priority)
+                elif kind == "topics":
+                    agent.store_topic_tweet(tweet, self._topic_for(tweet.get("text", "")))
+                    if self.on_tweet:
+                        self.on_tweet(account, tweet)
+                else:
+                    continue
+            stored += 1
+        posted_at = parse_tweet_time(tweet.get("created_at"))
+        if stored and posted_at:
+            self._lag.observe(max(time.time() - posted_at, 0.0))
+        return stored
+
+    def catch_up(self):
+        """One REST poll per account, to cover a gap longer than the stream can backfill"""
+        from src.bots import glitch_bot_agent as agent
+        for account in self.accounts.values():
+            with use_account(account):
+                client = account.twitter_client()
+                try:
+                    agent.check_mentions(client)
+                    agent.search_topics(client, ",".join(self.topics))
+                except Exception as e:
+                    log.warning("Catch-up poll for %s failed: %s", account.name, e)
+                if self.on_mention:
+                    self.on_mention(account, None, False)
+
+
+class FilteredStream:
+    """
+    Keeps a filtered-stream connection open on a background thread, reconnecting with the
+    backoff Twitter asks for: linear for network errors, exponential for HTTP errors, and a
+    longer exponential backoff for 429s. A connection that is silent for stall_timeout (no tweets
+    and no keep-alives) is treated as dead.
+    """
+
+    def __init__(self, ingestor: StreamIngestor, url: str = None, bearer_token: str = None, config: Dict = None):
+        self.ingestor = ingestor
+        self.config = dict(STREAM_CONFIG, **(config or {}))
+        self.url = (url or self.config["url"]).rstrip("/")
+        self.bearer_token = bearer_token or self.config["bearer_token"]
+        self.connected = False
+        self.connections = 0
+        self.last_data_at: Optional[float] = None
+        self._response = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._reconnects = REGISTRY.counter("glitchbot_stream_reconnects_total", None, "Filtered-stream reconnects")
+
+    def _request(self, path: str = "", params: Dict = None, body: Dict = None, timeout: float = 30):
+        url = self.url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        headers = {"Authorization": f"Bearer {self.bearer_token}", "User-Agent": "glitchbot"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        return urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=timeout)
+
+    def sync_rules(self, rules: List[Dict] = None) -> Dict[str, int]:
+        """Make the stream's glitchbot rules exactly `rules` (default: the ingestor's); returns counts"""
+        rules = self.ingestor.rules() if rules is None else rules
+        with self._request("/rules") as response:
+            existing = [r for r in json.load(response).get("data") or [] if (r.get("tag") or "").startswith(TAG_PREFIX)]
+        wanted = {(r["value"], r["tag"]) for r in rules}
+        have = {(r["value"], r["tag"]) for r in existing}
+        stale = [r["id"] for r in existing if (r["value"], r["tag"]) not in wanted]
+        missing = [r for r in rules if (r["value"], r["tag"]) not in have]
+        if stale:
+            self._request("/rules", body={"delete": {"ids": stale}}).close()
+        if missing:
+            self._request("/rules", body={"add": missing}).close()
+        log.info("Stream rules synced: %d kept, %d added, %d deleted", len(have) - len(stale), len(missing), len(stale))
+        return {"kept": len(have) - len(stale), "added": len(missing), "deleted": len(stale)}
+
+    def _params(self, resuming: bool) -> Dict:
+        params = {
+            "tweet.fields": ",".join(self.config["tweet_fields"]),
+            "expansions": "author_id",
+            "user.fields": "username",
+        }
+        if resuming and self.config["backfill_minutes"]:
+            params["backfill_minutes"] = self.config["backfill_minutes"]
+        return params
+
+    def healthy(self) -> bool:
+        """Connected and heard from recently; pollers can stand down while this holds"""
+        return (self.connected and self.last_data_at is not None
+                and time.monotonic() - self.last_data_at < self.config["stall_timeout"])
+
+    def _consume(self, response):
+        for raw in response:
+            if self._stop.is_set():
+                return
+            self.last_data_at = time.monotonic()
+            line = raw.strip()
+            if not line:
+                continue  # Keep-alive
+            try:
+                event = json.loads(line)
+            except ValueError:
+                log.warning("Unparseable stream line (%d bytes)", len(line))
+                continue
+            log_payload(log, "Stream event", event)
+            try:
+                self.ingestor.handle(event)
+            except Exception as e:
+                log.error("Failed to ingest stream event: %s", e, exc_info=True)
+
+    def run(self):
+        """Connect, consume, reconnect; returns when stop() is called"""
+        network_delay = http_delay = rate_delay = 0.0
+        while not self._stop.is_set():
+            delay = 0.0
+            try:
+                response = self._request(params=self._params(self.connections > 0), timeout=self.config["stall_timeout"])
+            except urllib.error.HTTPError as e:
+                if e.code == 429:
+                    rate_delay = min(rate_delay * 2 if rate_delay else self.config["rate_limit_backoff"],
+                                     self.config["max_rate_limit_backoff"])
+                    delay = rate_delay
+                else:
+                    http_delay = min(http_delay * 2 if http_delay else self.config["http_backoff"], self.config["max_http_backoff"])
+                    delay = http_delay
+                log.warning("Stream connect failed with HTTP %s; retrying in %.1fs", e.code, delay)
+            except (urllib.error.URLError, OSError) as e:
+                network_delay = min(network_delay + self.config["network_backoff"], self.config["max_network_backoff"])
+                delay = network_delay
+                log.warning("Stream connect failed (%s); retrying in %.1fs", e, delay)
+            else:
+                resuming = self.connections > 0
+                self._response = response
+                self.connections += 1
+                self.connected = True
+                self.last_data_at = time.monotonic()
+                network_delay = http_delay = rate_delay = 0.0
+                log.info("Filtered stream connected (connection %d)", self.connections)
+                if resuming:
+                    self._reconnects.inc()
+                    self.ingestor.catch_up()
+                try:
+                    self._consume(response)
+                    if not self._stop.is_set():
+                        log.warning("Filtered stream closed by server; reconnecting")
+                except (OSError, http.client.HTTPException, socket.timeout, ValueError) as e:
+                    if not self._stop.is_set():
+                        log.warning("Filtered stream dropped (%s); reconnecting", e)
+                finally:
+                    self.connected = False
+                    self._response = None
+                    try:
+                        response.close()
+                    except Exception:
+                        pass
+                # A server-side close right after connecting must not turn into a hot loop
+                if self.connections > 1 and time.monotonic() - self.last_data_at < 1.0:
+                    network_delay = min(network_delay + self.config["network_backoff"], self.config["max_network_backoff"])
+                    delay = network_delay
+            if delay:
+                self._stop.wait(delay)
+
+    def start(self, sync_rules: bool = True) -> "FilteredStream":
+        if sync_rules:
+            self.sync_rules()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="filtered-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            try:
+                # Unblock the reader thread, which is waiting on the socket
+                response.fp.raw._sock.shutdown(socket.SHUT_RDWR)
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> Dict:
+        return {
+            "connected": self.connected,
+            "healthy": self.healthy(),
+            "connections": self.connections,
+            "seconds_since_data": round(time.monotonic() - self.last_data_at, 1) if self.last_data_at else None,
+        }
@@ -0,0 +1,164 @@
+"""
+Glitch Bot Span Tracing (Chrome trace / Perfetto export)
+"""
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Optional
+
+from src.bots.log_utils import get_logger
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled", "attrs", "start_wall", "start")
+
+    def __init__(self, name: str, trace_id: str, span_id: str, parent_id: Optional[str], sampled: bool, attrs: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attrs = attrs
+        self.start_wall = time.time()
+        self.start = perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class TraceFileExporter:
+    """
+    Appends spans as Chrome trace "complete" events, one per line.
+
+    The file uses the JSON Array Format of the Chrome trace event spec: it starts with '[' and every
+    event line ends with ','. The closing ']' is optional in that format, so the file stays appendable
+    across restarts and loads as-is in chrome://tracing, Perfetto and speedscope.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a", encoding="utf-8")
+        if new_file:
+            self._file.write("[\n")
+        self._pid = os.getpid()
+
+    def export(self, span: Span, duration: float):
+        args = {k: v for k, v in span.attrs.items() if v is not None}
+        args["trace_id"] = span.trace_id
+        args["span_id"] = span.span_id
+        if span.parent_id:
+            args["parent_id"] = span.parent_id
+        event = {
+            "name": span.name,
+            "cat": span.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": int(span.start_wall * 1e6),
+            "dur": max(int(duration * 1e6), 1),
+            "pid": self._pid,
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        line = json.dumps(event, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + ",\n")
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("glitchbot_current_span", default=None)
+
+
+class Tracer:
+    """
+    Nested spans tracked through contextvars. Sampling is decided once per trace (at the root span);
+    children of an unsampled root are skipped cheaply. Disabled tracing costs one attribute check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.exporter: Optional[TraceFileExporter] = None
+        self._rng = random.Random()
+
+    def configure(self, path: str, sample_rate: float = 1.0):
+        self.exporter = TraceFileExporter(path)
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self.enabled = True
+        get_logger("tracing").info("Writing spans to %s (sample rate %.0f%%)", path, self.sample_rate * 100)
+
+    def shutdown(self):
+        self.enabled = False
+        if self.exporter:
+            self.exporter.close()
+            self.exporter = None
+
+    def _new_id(self) -> str:
+        return "%016x" % self._rng.getrandbits(64)
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        if not self.enabled:
+            yield None
+            return
+        parent = _current_span.get()
+        if parent is None:
+            span = Span(name, self._new_id(), self._new_id(), None, self._rng.random() < self.sample_rate, attrs)
+        else:
+            span = Span(name, parent.trace_id, self._new_id(), parent.span_id, parent.sampled, attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            if span.sampled and self.exporter:
+                self.exporter.export(span, perf_counter() - span.start)
+                if parent is None:
+                    self.exporter.flush()
+
+    def traced(self, name: str):
+        """Decorator form of span()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+TRACER = Tracer()
+
+
+def annotate(**attrs):
+    """Attach attributes (tweet ids, token counts, ...) to the current span, if any"""
+    span = _current_span.get()
+    if span is not None and span.sampled:
+        span.attrs.update(attrs)
+
+
+def with_current_context(fn):
+    """Bind fn to the caller's context so spans started in pool threads nest under the caller's span"""
+    ctx = contextvars.copy_context()
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+    return wrapper
@@ -4,39 +4,134 @@ Glitch Bot Twitter API Helpers
 # Move all Twitter API helper functions and classes from enhanced_glitch_bot_v2.py here.
 # Example placeholder (replace with actual Twitter code):
 
-from twitter_plugin_gamesdk.twitter_plugin import TwitterPlugin
-from src.bots.config import TWITTER_TOKEN
+from src.bots.config import TWITTER_RATE_LIMITS
+from src.bots.breakers import BREAKERS, CircuitOpen, UpstreamError, classify_error
+from src.bots.metrics import REGISTRY, instrument
+from src.bots.log_utils import get_logger
+import threading
 import time
 import random
 
+log = get_logger("twitter")
+
+class TokenBucket:
+    """Thread-safe token bucket so concurrent workers share one API budget"""
+    def __init__(self, capacity: int, window_seconds: float):
+        self.capacity = capacity
+        self.refill_rate = capacity / float(window_seconds)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+    def try_acquire(self, tokens: int = 1) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+    def snapshot(self) -> dict:
+        """Tokens left, stamped with the wall clock so restore() can add what refilled in between (see warm_restart.py)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return {"tokens": round(self.tokens, 3), "saved_at": time.time()}
+    def restore(self, state: dict):
+        with self._lock:
+            elapsed = max(time.time() - state["saved_at"], 0.0)
+            self.tokens = min(self.capacity, state["tokens"] + elapsed * self.refill_rate)
+            self.updated_at = time.monotonic()
+    def available(self) -> float:
+        """Tokens that could be taken right now (without taking them)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+    def acquire(self, tokens: int = 1, timeout: float = None) -> bool:
+        """Block until tokens are available; False if that would take longer than timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return True
+                wait = (tokens - self.tokens) / self.refill_rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(min(wait, 1.0))
+
+twitter_read_limiter = TokenBucket(TWITTER_RATE_LIMITS["reads_per_window"], TWITTER_RATE_LIMITS["window_seconds"])
+twitter_write_limiter = TokenBucket(TWITTER_RATE_LIMITS["writes_per_window"], TWITTER_RATE_LIMITS["window_seconds"])
+
 # Helper: Rate limit/backoff wrapper for API calls
-def call_with_rate_limit_handling(api_func, *args, max_retries=5, base_sleep=300, **kwargs):
+@instrument("twitter.call_with_rate_limit_handling")
+def call_with_rate_limit_handling(api_func, *args, max_retries=2, base_sleep=5, **kwargs):
     """
-    Calls an API function, handling 429 Too Many Requests errors with backoff.
-    Sleeps for 5 minutes (300s) on first 429, doubles on each subsequent 429 up to max_retries.
+    Calls an API function, retrying transient failures (5xx, timeouts) after base_sleep, doubling.
+    A rate limit is not slept through: it opens the endpoint's circuit (breakers.py) until the limit
+    resets, so RateLimited / CircuitOpen are raised at once and the caller moves on to other work.
     """
-    retries = 0
-    while retries <= max_retries:
+    name = getattr(api_func, "__name__", "unknown")
+    for attempt in range(max_retries + 1):
         try:
             return api_func(*args, **kwargs)
+        except CircuitOpen:
+            raise
         except Exception as e:
-            err_str = str(e)
-            if '429' in err_str or 'Too Many Requests' in err_str:
-                sleep_time = base_sleep * (2 ** retries)
-                print(f"[RateLimit] 429 detected. Sleeping for {sleep_time//60} min (retry {retries+1}/{max_retries})...")
-                time.sleep(sleep_time + random.uniform(0, 30))
-                retries += 1
-            else:
+            kind = e.kind if isinstance(e, UpstreamError) else classify_error(e)
+            if kind == "rate_limited":
+                REGISTRY.counter("glitchbot_rate_limited_total", {"endpoint": name}, "429 responses by endpoint").inc()
+            if kind != "unavailable" or attempt == max_retries:
                 raise
-    print(f"[RateLimit] Max retries exceeded for API call: {api_func.__name__}")
-    raise Exception("Max retries exceeded for API call due to repeated 429 errors.")
+            sleep_time = base_sleep * (2 ** attempt)
+            log.warning("%s unavailable; retrying in %ds (retry %d/%d): %s", name, sleep_time, attempt + 1, max_retries, e)
+            time.sleep(sleep_time + random.uniform(0, 1))
+
+class InstrumentedClient:
+    """
+    Proxy that records latency/errors of every Twitter client method as 'twitter.<method>', behind
+    that method's circuit breaker (upstream "twitter", or "twitter:<account>" per token)
+    """
+    def __init__(self, client, upstream: str = "twitter"):
+        self._client = client
+        self._upstream = upstream
+        self._wrapped = {}
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            # Rejected calls never reach the client, so they don't count as Twitter latency or errors
+            wrapped = self._wrapped[name] = BREAKERS.wrap(self._upstream, name, instrument(f"twitter.{name}")(attr))
+        return wrapped
+
+_twitter_client_override = None
+
+def set_twitter_client(client):
+    """Route every Twitter call through client (fakes, recorders); None restores the plugin client"""
+    global _twitter_client_override
+    _twitter_client_override = client
+
+def has_twitter_client_override() -> bool:
+    return _twitter_client_override is not None
 
 # Twitter client setup
-def get_twitter_client():
-    """Initialize Twitter client"""
+def get_twitter_client(token: str = None, upstream: str = "twitter"):
+    """Initialize Twitter client for the account owning token (accounts.py supplies each account's own)"""
+    if _twitter_client_override is not None:
+        return InstrumentedClient(_twitter_client_override)
+    return InstrumentedClient(create_plugin_client(token), upstream)
+
+def create_plugin_client(token: str = None):
+    """The raw twitter_client from the GAME Twitter plugin (no instrumentation or overrides)"""
+    # Imported here: the plugin and its HTTP stack are only needed once a live client is built
+    from twitter_plugin_gamesdk.twitter_plugin import TwitterPlugin
     options = {
         "credentials": {
-            "game_twitter_access_token": TWITTER_TOKEN
+            "game_twitter_access_token": token
         }
     }
     twitter_plugin = TwitterPlugin(options)
@@ -0,0 +1,164 @@
+"""
+Glitch Bot Warm Restart (periodic snapshot of the in-memory state the DB doesn't hold)
+
+The run command writes a snapshot every state_snapshot interval, when it is stopped and before
+its loop re-creates the agents after an error. Each snapshot holds:
+
+    accounts   per account: the agent state's posting pacing (posts this hour, last post time,
+               recent posts), the read and write token buckets and the bot's user id
+    scheduler  when each task is next due, and its backed-off interval
+    caches     the shared user / tweet / LLM caches and the knowledge top-K, with their TTLs
+    breakers   open circuits, with what is left of their open period
+
+The file is gzipped compact JSON tagged with SNAPSHOT_VERSION. Saving writes a temporary file
+in the same directory, fsyncs it and renames it over the previous snapshot, so a crash mid-write
+leaves the previous snapshot intact. On startup the snapshot is restored before the agents are
+built. Buckets refill, TTLs run down and circuits close by the time the process was down. A
+snapshot that is unreadable, of another version or older than max_age is ignored (cold start).
+"""
+import gzip
+import json
+import os
+import tempfile
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from src.bots.breakers import BREAKERS
+from src.bots.caches import LLM_CACHE, TWEET_CACHE, USER_CACHE
+from src.bots.config import SNAPSHOT_CONFIG
+from src.bots.knowledge import dump_knowledge_caches, load_knowledge_caches
+from src.bots.log_utils import get_logger
+from src.bots.metrics import REGISTRY
+
+log = get_logger("warm_restart")
+
+# Bump whenever the snapshot's layout changes; snapshots of other versions are ignored
+SNAPSHOT_VERSION = 1
+
+SHARED_CACHES = (USER_CACHE, TWEET_CACHE, LLM_CACHE)
+
+
+def _fsync_dir(directory: str):
+    """Make a rename durable (not supported everywhere, e.g. on Windows)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class WarmRestart:
+    def __init__(self, path: str = None, config: Dict = None):
+        self.config = dict(SNAPSHOT_CONFIG, **(config or {}))
+        self.path = path or self.config["path"]
+        self.snapshot: Optional[Dict] = None  # The last snapshot loaded or saved
+
+    def capture(self, accounts: List, scheduler=None) -> Dict:
+        previous = self.snapshot or {}
+        return {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": time.time(),
+            "accounts": {account.name: {
+                "agent_state": account.agent_state,
+                "bot_user_id": account.bot_user_id,
+                "read_limiter": account.read_limiter.snapshot(),
+                "write_limiter": account.write_limiter.snapshot(),
+            } for account in accounts},
+            # Tasks not registered yet (the loop failed while building agents) keep their saved slot
+            "scheduler": dict(previous.get("scheduler", {}), **(scheduler.dump() if scheduler is not None else {})),
+            "caches": {cache.name: cache.dump() for cache in SHARED_CACHES if cache.name in self.config["caches"]},
+            "knowledge": dump_knowledge_caches(),
+            "breakers": BREAKERS.dump(),
+        }
+
+    def save(self, accounts: List, scheduler=None) -> Dict:
+        """Write a snapshot atomically: a reader sees the previous snapshot or this one, never part of one"""
+        start = time.monotonic()
+        snapshot = self.capture(accounts, scheduler)
+        data = gzip.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"),
+                             compresslevel=self.config["compress_level"])
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".snapshot-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        _fsync_dir(directory)
+        self.snapshot = snapshot
+        REGISTRY.histogram("glitchbot_snapshot_seconds", {"op": "save"}, "Time to write / restore the warm-restart snapshot").observe(time.monotonic() - start)
+        REGISTRY.gauge("glitchbot_snapshot_bytes", {}, "Size of the last warm-restart snapshot").set(len(data))
+        return snapshot
+
+    def save_quietly(self, accounts: List, scheduler=None):
+        """save(), logging a failure instead of raising (for shutdown and error paths)"""
+        try:
+            self.save(accounts, scheduler)
+        except Exception as e:
+            log.warning("Could not write the state snapshot %s: %s", self.path, e)
+
+    def load(self) -> Optional[Dict]:
+        """The snapshot on disk, or None (and a cold start) if there is no usable one"""
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = json.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, zlib.error) as e:
+            log.warning("Ignoring unreadable state snapshot %s: %s", self.path, e)
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+            log.warning("Ignoring state snapshot %s: version %s, expected %d", self.path,
+                        snapshot.get("version") if isinstance(snapshot, dict) else None, SNAPSHOT_VERSION)
+            return None
+        age = time.time() - snapshot["saved_at"]
+        if age > self.config["max_age"]:
+            log.info("Ignoring state snapshot %s: %.0f minutes old", self.path, age / 60)
+            return None
+        self.snapshot = snapshot
+        return snapshot
+
+    def restore(self, accounts: List) -> bool:
+        """Put the loaded snapshot's account state, caches and open circuits back; run before building the agents"""
+        snapshot = self.snapshot
+        if not snapshot:
+            return False
+        start = time.monotonic()
+        elapsed = max(time.time() - snapshot["saved_at"], 0.0)
+        restored = 0
+        for account in accounts:
+            saved = snapshot["accounts"].get(account.name)
+            if not saved:
+                continue
+            account.agent_state = saved["agent_state"] or account.agent_state
+            account.bot_user_id = account.bot_user_id or saved["bot_user_id"]
+            account.read_limiter.restore(saved["read_limiter"])
+            account.write_limiter.restore(saved["write_limiter"])
+            restored += 1
+        cached = sum(cache.load(snapshot["caches"].get(cache.name, []), elapsed) for cache in SHARED_CACHES)
+        load_knowledge_caches(snapshot["knowledge"], elapsed)
+        BREAKERS.restore(snapshot["breakers"], elapsed)
+        seconds = time.monotonic() - start
+        REGISTRY.histogram("glitchbot_snapshot_seconds", {"op": "restore"}).observe(seconds)
+        log.info("Warm start from %s (%.0fs old): %d account(s), %d cache entries, %d open circuit(s) in %.1f ms",
+                 self.path, elapsed, restored, cached, len(snapshot["breakers"]), seconds * 1000)
+        return True
+
+    def restore_scheduler(self, scheduler) -> int:
+        """Resume the task cadences from the last snapshot (after the tasks are registered)"""
+        if not self.snapshot:
+            return 0
+        return scheduler.restore(self.snapshot["scheduler"])
@@ -0,0 +1,22 @@
+"""
+Shared fixtures: a fresh database per test and a fake wall clock for the DB-backed queues
+"""
+import time
+
+import pytest
+
+from src.bots.glitch_bot_db import TwitterAgentDB
+from src.bots.scheduler import FakeClock
+
+
+@pytest.fixture
+def db(tmp_path):
+    return TwitterAgentDB(str(tmp_path / "twitter_agent.db"))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A FakeClock that time.time() follows, so lease and retry deadlines pass on advance()"""
+    fake = FakeClock(start=time.time())
+    monkeypatch.setattr(time, "time", fake.time)
+    return fake
@@ -0,0 +1,14 @@
+from src.bots.account_rotation import AccountRotation
+
+
+def test_usernames_that_dont_resolve_are_not_looked_up_again_until_the_ttl(db):
+    rotation = AccountRotation(db, config={"unresolved_ttl": 3600})
+    rotation.sync(["alice", "renamed"])
+    assert sorted(rotation.unresolved(now=1000)) == ["alice", "renamed"]
+    rotation.record_user_ids({"alice": "42"})
+    rotation.record_lookup_failures(["renamed"], now=1000)
+    assert rotation.unresolved(now=1000 + 60) == []
+    assert rotation.unresolved(now=1000 + 3600) == ["renamed"]
+    # A later successful lookup clears the failure
+    rotation.record_user_ids({"renamed": "43"})
+    assert rotation.unresolved(now=1000 + 3600) == []
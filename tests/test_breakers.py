@@ -0,0 +1,51 @@
+import pytest
+
+from src.bots.breakers import CircuitBreaker, CircuitOpen, Unavailable
+from src.bots.scheduler import FakeClock
+
+
+def failing():
+    raise ConnectionError("connection reset")
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    breaker = CircuitBreaker("twitter", "get_users", config={"min_calls": 2, "open_seconds": 30}, clock=clock.time)
+    for _ in range(2):
+        with pytest.raises(Unavailable):
+            breaker.call(failing)
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_an_open_circuit_fails_fast_then_lets_a_probe_through(breaker, clock):
+    with pytest.raises(CircuitOpen):
+        breaker.call(lambda: "ok")
+    clock.advance(31)
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
+
+
+def test_a_failed_probe_reopens_for_longer(breaker, clock):
+    clock.advance(31)
+    with pytest.raises(Unavailable):
+        breaker.call(failing)
+    assert breaker.state == "open"
+    assert breaker.open_until == clock.time() + 60
+
+
+def test_an_interrupted_probe_hands_its_slot_back(breaker, clock):
+    clock.advance(31)
+
+    def interrupted():
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        breaker.call(interrupted)
+    assert breaker.state == "half_open"
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == "closed"
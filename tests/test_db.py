@@ -0,0 +1,15 @@
+import json
+
+
+def test_storing_a_tweet_again_only_refreshes_its_metrics(db):
+    content_id = db.store_monitored_content("100", "Agents need memory", "AI", "7", {"like_count": 1})
+    with db.get_connection() as conn:
+        conn.execute("UPDATE monitored_content SET processed = 1 WHERE id = ?", (content_id,))
+        conn.commit()
+    assert db.store_monitored_content("100", "Agents need memory", "mentions", "7", {"like_count": 9}) == content_id
+    with db.get_connection() as conn:
+        row = conn.execute("SELECT * FROM monitored_content WHERE tweet_id = '100'").fetchone()
+    assert row["id"] == content_id
+    assert row["processed"] == 1
+    assert row["topic"] == "AI"
+    assert json.loads(row["engagement_metrics"]) == {"like_count": 9}
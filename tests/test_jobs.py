@@ -0,0 +1,63 @@
+import pytest
+
+from src.bots.jobs import JobQueue, JobWorker, RetryLater
+
+
+@pytest.fixture
+def jobs(db, clock):
+    return JobQueue(db, config={"lease_seconds": 60, "retry_delay": 30, "max_attempts": 3}, owner="worker-a")
+
+
+def test_jobs_are_claimed_once_and_completed(jobs):
+    assert jobs.enqueue("hydrate", {"tweet_ids": ["1"]}, dedupe_key="hydrate:1")
+    assert not jobs.enqueue("hydrate", {"tweet_ids": ["1"]}, dedupe_key="hydrate:1")
+    jobs.enqueue("score", {"tweet_id": "1"}, priority=1)
+    claimed = jobs.claim(["hydrate", "score"], limit=5)
+    assert [job["kind"] for job in claimed] == ["score", "hydrate"]
+    assert claimed[1]["payload"] == {"tweet_ids": ["1"]}
+    assert jobs.claim(["hydrate", "score"]) == []
+    assert all(jobs.complete(job) for job in claimed)
+    assert jobs.stats() == {"hydrate": {"done": 1}, "score": {"done": 1}}
+
+
+def test_failed_jobs_back_off_then_dead_letter(jobs, clock):
+    jobs.enqueue("fetch", {"source": "mentions"})
+    for attempt in (1, 2):
+        job = jobs.claim(["fetch"])[0]
+        assert job["attempts"] == attempt
+        assert jobs.fail(job, "503") == "pending"
+        assert jobs.claim(["fetch"]) == []
+        clock.advance(jobs.config["retry_delay"] * 2 ** attempt)
+    job = jobs.claim(["fetch"])[0]
+    assert jobs.fail(job, "503") == "dead"
+    clock.advance(3600)
+    assert jobs.claim(["fetch"]) == []
+    assert jobs.requeue_dead("fetch") == 1
+    assert jobs.claim(["fetch"])[0]["attempts"] == 1
+
+
+def test_deferred_jobs_keep_their_attempt(jobs, clock):
+    jobs.enqueue("post", {"thread_id": 1})
+
+    def not_yet(job, queue):
+        raise RetryLater(120, "posting slot not reached")
+    worker = JobWorker(jobs, {"post": not_yet}, concurrency=1)
+    assert worker.run_once() == 1
+    assert jobs.claim(["post"]) == []
+    clock.advance(121)
+    assert jobs.claim(["post"])[0]["attempts"] == 1
+
+
+def test_expired_job_leases_are_reclaimed(db, jobs, clock):
+    jobs.enqueue("score", {"tweet_id": "1"})
+    job = jobs.claim(["score"])[0]
+    other = JobQueue(db, config=jobs.config, owner="worker-b")
+    clock.advance(30)
+    assert jobs.heartbeat([job]) == []
+    clock.advance(61)
+    stolen = other.claim(["score"])[0]
+    assert stolen["lease_owner"] == "worker-b" and stolen["attempts"] == 2
+    # The first worker lost its lease: it can neither renew nor complete the job
+    assert jobs.heartbeat([job]) == [job["id"]]
+    assert not jobs.complete(job)
+    assert other.complete(stolen)
@@ -0,0 +1,29 @@
+import pytest
+
+from src.bots import llm_utils
+from src.bots.benchmarks import install_fakes
+from src.bots.caches import LLM_CACHE
+from src.bots.fakes import FakeOpenAI, FakeTwitterClient
+
+
+@pytest.fixture
+def openai_client():
+    client = FakeOpenAI(seed=5)
+    install_fakes(FakeTwitterClient(seed=7), client)
+    LLM_CACHE.clear()
+    yield client
+    LLM_CACHE.clear()
+
+
+def test_replies_are_generated_fresh_for_the_same_prompt(openai_client):
+    # Two accounts tagged in one thread, or a retry after a near-duplicate was rejected
+    first = llm_utils.generate_reply_to_mention("AI", [], "@glitchbot what about agents?", "fan")
+    second = llm_utils.generate_reply_to_mention("AI", [], "@glitchbot what about agents?", "fan")
+    assert len(openai_client.requests) == 2
+    assert first != second
+
+
+def test_batch_analysis_is_answered_from_the_cache(openai_client):
+    texts = ["Agents need better memory", "Provers get cheaper every month"]
+    assert llm_utils.analyze_content_batch(texts) == llm_utils.analyze_content_batch(texts)
+    assert len(openai_client.requests) == 1
@@ -0,0 +1,63 @@
+import pytest
+
+from src.bots.mention_queue import MentionQueue
+
+
+@pytest.fixture
+def mentions(db, clock):
+    return MentionQueue(db, config={"visibility_timeout": 60, "retry_delay": 30, "max_attempts": 3})
+
+
+def test_mentions_are_queued_once_and_leased_by_priority(mentions):
+    assert mentions.enqueue("1", "fan1", "@glitchbot hi", quality_score=2, is_priority=False)
+    assert mentions.enqueue("2", "fan2", "@glitchbot hey", quality_score=8, is_priority=False)
+    assert mentions.enqueue("3", "owner", "@glitchbot look", quality_score=0, is_priority=True)
+    assert not mentions.enqueue("1", "fan1", "@glitchbot hi")
+    assert [mentions.lease()["mention_id"] for _ in range(3)] == ["3", "2", "1"]
+    assert mentions.lease() is None
+
+
+def test_acked_mentions_are_done(mentions):
+    mentions.enqueue("1", "fan1", "@glitchbot hi", is_priority=False)
+    leased = mentions.lease()
+    assert leased["status"] == "leased" and leased["attempts"] == 1
+    mentions.ack("1", "replied")
+    assert mentions.lease() is None
+    assert mentions.stats()["done"] == 1
+
+
+def test_nacked_mentions_retry_after_a_delay_then_go_dead(mentions, clock):
+    mentions.enqueue("1", "fan1", "@glitchbot hi", is_priority=False)
+    mentions.lease()
+    mentions.nack("1", error="timeout")
+    assert mentions.lease() is None
+    assert mentions.stats()["ready"] == 0
+    clock.advance(31)
+    assert mentions.lease()["attempts"] == 2
+    mentions.nack("1", error="timeout")
+    # The retry delay doubles per attempt
+    clock.advance(31)
+    assert mentions.lease() is None
+    clock.advance(30)
+    assert mentions.lease()["attempts"] == 3
+    mentions.nack("1", error="timeout")
+    assert mentions.stats()["dead"] == 1
+    clock.advance(3600)
+    assert mentions.lease() is None
+
+
+def test_expired_mention_leases_are_reclaimed(db, mentions, clock):
+    mentions.enqueue("1", "fan1", "@glitchbot hi", is_priority=False)
+    mentions.lease()
+    other = MentionQueue(db, config=mentions.config)
+    other.owner = "other-worker"
+    assert other.lease() is None
+    assert mentions.extend_lease("1")
+    clock.advance(61)
+    assert other.lease()["attempts"] == 2
+    # The first worker's lease is gone: it can't renew, settle or return the mention
+    assert not mentions.extend_lease("1")
+    assert not mentions.ack("1", "replied")
+    assert not mentions.nack("1", error="timeout")
+    assert other.ack("1", "replied")
+    assert mentions.stats()["done"] == 1
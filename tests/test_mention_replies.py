@@ -0,0 +1,29 @@
+import pytest
+
+from src.bots.benchmarks import install_fakes, use_database
+from src.bots.fakes import FakeOpenAI, FakeTwitterClient
+
+
+@pytest.fixture
+def twitter():
+    return FakeTwitterClient(seed=5)
+
+
+@pytest.fixture
+def agent(tmp_path, twitter, clock):
+    install_fakes(twitter, FakeOpenAI(seed=5))
+    return use_database(str(tmp_path / "twitter_agent.db"))
+
+
+def test_a_reply_whose_response_was_lost_is_recorded_not_posted_again(agent, twitter, clock):
+    mention = twitter.add_mentions(1, author="fan1")[0]
+    agent.check_mentions(agent.current_account().twitter_client())
+    twitter.lost_response_rate = 1.0
+    assert agent.process_mention_queue("5")[2]["mentions_failed"] == [mention["id"]]
+    assert len(twitter.posted) == 1
+    twitter.lost_response_rate = 0.0
+    clock.advance(agent.current_account().mention_queue.config["retry_delay"] + 1)
+    assert agent.process_mention_queue("5")[2]["mentions_replied"] == [mention["id"]]
+    assert len(twitter.posted) == 1
+    response = agent.db.get_mention_response(mention["id"])
+    assert response["response_tweet_id"] == twitter.posted[0]["id"]
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from src.bots.mention_queue import MentionQueue
+from src.bots.mention_workers import MentionWorkerPool
+
+T0 = time.time() - 600
+
+
+@pytest.fixture
+def mentions(db, clock):
+    return MentionQueue(db, config={"visibility_timeout": 60, "retry_delay": 30, "order_delay": 10})
+
+
+class Handler:
+    """Records the mentions it replies to; fails the ids in fail_once on their first attempt"""
+
+    def __init__(self, fail_once=()):
+        self.replied = []
+        self.attempts = {}
+        self.fail_once = set(fail_once)
+
+    def __call__(self, item, lease_check):
+        self.attempts[item["mention_id"]] = item["attempts"]
+        if item["mention_id"] in self.fail_once:
+            self.fail_once.discard(item["mention_id"])
+            return "failed", "timeout", {}
+        self.replied.append(item["mention_id"])
+        return "done", "replied", {}
+
+
+def enqueue(mentions, mention_id, conversation_id, offset):
+    mentions.enqueue(mention_id, f"fan{mention_id}", "@glitchbot hi", is_priority=False,
+                     conversation_id=conversation_id, mention_created_at=T0 + offset)
+
+
+def test_a_mention_waits_for_an_earlier_one_leased_by_another_worker(db, mentions, clock):
+    enqueue(mentions, "1", "c", 0)
+    other = MentionQueue(db, config=mentions.config)
+    other.owner = "other-worker"
+    assert other.lease()["mention_id"] == "1"
+    enqueue(mentions, "2", "c", 10)
+    enqueue(mentions, "3", "d", 20)
+    handler = Handler()
+    result = MentionWorkerPool(mentions, handler).drain()
+    assert result["deferred"] == ["2"] and result["replied"] == ["3"]
+    assert handler.replied == ["3"]
+    assert other.ack("1", "replied")
+    clock.advance(11)
+    result = MentionWorkerPool(mentions, handler).drain()
+    assert result["replied"] == ["2"]
+    # Deferring didn't use up an attempt
+    assert handler.attempts["2"] == 1
+
+
+def test_a_failed_mention_is_not_overtaken_by_later_ones(mentions, clock):
+    enqueue(mentions, "1", "c", 0)
+    enqueue(mentions, "2", "c", 10)
+    handler = Handler(fail_once=["1"])
+    result = MentionWorkerPool(mentions, handler).drain()
+    assert result["failed"] == ["1"] and result["deferred"] == ["2"]
+    assert handler.replied == []
+    # "2" comes back first but still waits for "1" to be retried
+    clock.advance(11)
+    assert MentionWorkerPool(mentions, handler).drain()["deferred"] == ["2"]
+    clock.advance(31)
+    assert MentionWorkerPool(mentions, handler).drain()["replied"] == ["1", "2"]
+    assert handler.replied == ["1", "2"]
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from src.bots.fakes import FakeTwitterClient
+from src.bots.outbox import Outbox
+
+NOW = time.time()
+
+
+@pytest.fixture
+def outbox(db):
+    return Outbox(db)
+
+
+@pytest.fixture
+def twitter():
+    return FakeTwitterClient(seed=7)
+
+
+def scheduled_thread(db, outbox, text: str) -> int:
+    thread_id = db.store_generated_thread(text, "AI")
+    outbox.schedule(now=NOW)
+    return thread_id
+
+
+def publish(outbox, thread_id, twitter, now=NOW):
+    return outbox.publish(thread_id, twitter, bot_user_id=twitter.bot_user["id"], now=now)
+
+
+def test_a_post_goes_out_once(db, outbox, twitter):
+    thread_id = scheduled_thread(db, outbox, "Agents need better memory")
+    result = publish(outbox, thread_id, twitter)
+    assert result["status"] == "posted"
+    assert publish(outbox, thread_id, twitter) == {"status": "already_posted", "tweet_id": result["tweet_id"]}
+    assert db.get_generated_thread(thread_id)["tweet_id"] == result["tweet_id"]
+    assert len(twitter.posted) == 1
+
+
+@pytest.mark.parametrize("text", [
+    "Agents need better memory",
+    # The API returns this text with &amp; and a t.co link, and records the quoted tweet
+    "Rollups & provers: the next step https://x.com/someone/status/12345",
+])
+def test_a_lost_response_is_reconciled_not_reposted(db, outbox, twitter, text):
+    thread_id = scheduled_thread(db, outbox, text)
+    twitter.lost_response_rate = 1.0
+    assert publish(outbox, thread_id, twitter)["status"] == "retry"
+    assert len(twitter.posted) == 1
+    twitter.lost_response_rate = 0.0
+    assert publish(outbox, thread_id, twitter)["status"] == "not_due"
+    result = publish(outbox, thread_id, twitter, now=NOW + outbox.config["retry_delay"] + 1)
+    assert result["status"] == "posted"
+    assert result["tweet_id"] == twitter.posted[0]["id"]
+    assert len(twitter.posted) == 1
+    assert twitter.calls["create_tweet"] == 1
+    row = db.get_generated_thread(thread_id)
+    assert row["status"] == "posted" and row["tweet_id"] == twitter.posted[0]["id"]
+
+
+def test_a_different_quote_of_the_same_text_is_not_taken_for_ours(db, outbox, twitter):
+    thread_id = scheduled_thread(db, outbox, "Worth a read https://x.com/someone/status/222")
+    twitter.lost_response_rate = 1.0
+    publish(outbox, thread_id, twitter)
+    twitter.lost_response_rate = 0.0
+    # A newer post with the same words quoting another tweet
+    twitter.create_tweet(text="Worth a read https://x.com/someone/status/111")
+    result = publish(outbox, thread_id, twitter, now=NOW + outbox.config["retry_delay"] + 1)
+    assert result["tweet_id"] == twitter.posted[0]["id"]
+    assert len(twitter.posted) == 2
+
+
+def test_an_abandoned_publish_is_taken_over_without_reposting(db, outbox, twitter):
+    thread_id = scheduled_thread(db, outbox, "Provers get cheaper every month")
+    # A publisher claims the thread, posts it and dies before recording the tweet id
+    assert outbox._claim(thread_id, NOW)
+    twitter.create_tweet(text="Provers get cheaper every month")
+    assert publish(outbox, thread_id, twitter)["status"] == "busy"
+    result = publish(outbox, thread_id, twitter, now=NOW + outbox.config["publish_lease"] + 1)
+    assert result["status"] == "posted"
+    assert result["tweet_id"] == twitter.posted[0]["id"]
+    assert len(twitter.posted) == 1
+
+
+def test_failed_publishes_are_parked_after_max_attempts(db, outbox, twitter):
+    thread_id = scheduled_thread(db, outbox, "Data is the moat")
+    twitter.error_rate = 1.0
+    now = NOW
+    for _ in range(outbox.config["max_attempts"] - 1):
+        assert publish(outbox, thread_id, twitter, now=now)["status"] == "retry"
+        now += outbox.config["retry_delay"] + 1
+    assert publish(outbox, thread_id, twitter, now=now)["status"] == "failed"
+    assert db.get_generated_thread(thread_id)["status"] == "failed"
+    assert twitter.posted == []
@@ -0,0 +1,119 @@
+from src.bots.scheduler import FakeClock, ScheduledTask, Scheduler
+
+
+def recorder(results=None):
+    """A task function that logs each call and returns the next of results (None once they run out)"""
+    calls = []
+    results = list(results or [])
+
+    def fn():
+        calls.append(len(calls))
+        return results.pop(0) if results else None
+    fn.calls = calls
+    return fn
+
+
+def test_due_tasks_run_in_priority_order():
+    scheduler = Scheduler(clock=FakeClock())
+    for name, priority in (("timeline", 5), ("mentions", 1), ("follows", 9)):
+        scheduler.add(ScheduledTask(name, recorder(), interval=60, priority=priority))
+    assert scheduler.run_pending() == ["mentions", "timeline", "follows"]
+    assert scheduler.run_pending() == []
+
+
+def test_tasks_keep_their_own_cadence():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    scheduler.add(ScheduledTask("fast", recorder(), interval=10))
+    scheduler.add(ScheduledTask("slow", recorder(), interval=30, priority=1))
+    ran = []
+    for _ in range(60):
+        ran += scheduler.run_pending()
+        clock.advance(1)
+    assert ran.count("fast") == 6
+    assert ran.count("slow") == 2
+
+
+def test_idle_runs_back_off_and_work_resets_the_interval():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    task = scheduler.add(ScheduledTask("mentions", recorder([False, False, False, True]), interval=10,
+                                       min_interval=5, max_interval=40, idle_backoff=2))
+    intervals = []
+    for _ in range(4):
+        clock.advance(scheduler.seconds_until_next())
+        scheduler.run_pending()
+        intervals.append(task.current_interval)
+    assert intervals == [20, 40, 40, 5]
+    assert task.next_run == clock.time() + 5
+
+
+def test_failures_back_off_exponentially_up_to_max_interval():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+
+    def broken():
+        raise RuntimeError("upstream down")
+    task = scheduler.add(ScheduledTask("broken", broken, interval=10, max_interval=60))
+    healthy = scheduler.add(ScheduledTask("healthy", recorder(), interval=10))
+    delays = []
+    for _ in range(4):
+        clock.advance(task.next_run - clock.time())
+        scheduler.run_pending()
+        delays.append(task.next_run - clock.time())
+    assert delays == [20, 40, 60, 60]
+    assert task.errors == task.consecutive_errors == 4
+    assert task.last_error == "upstream down"
+    # A failing task only delays itself
+    assert healthy.consecutive_errors == 0
+    assert healthy.next_run == clock.time() + 10
+
+
+def test_a_success_ends_the_error_backoff():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    outcomes = [RuntimeError("timeout"), RuntimeError("timeout"), None]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if outcome:
+            raise outcome
+    task = scheduler.add(ScheduledTask("flaky", flaky, interval=10, max_interval=300))
+    for _ in range(3):
+        clock.advance(task.next_run - clock.time())
+        scheduler.run_pending()
+    assert task.consecutive_errors == 0
+    assert task.next_run - clock.time() == 10
+
+
+def test_runs_past_their_deadline_are_skipped():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    post = recorder()
+    task = scheduler.add(ScheduledTask("post", post, interval=1800, deadline=60, align=True), run_immediately=False)
+    assert task.next_run == 1800
+    clock.advance(1800 + 120)
+    assert scheduler.run_pending() == []
+    assert task.missed == 1
+    assert post.calls == []
+    # The next aligned slot still runs
+    assert task.next_run == 3600
+    clock.advance(3600 - clock.time() + 30)
+    assert scheduler.run_pending() == ["post"]
+    assert post.calls == [0]
+
+
+def test_trigger_runs_a_task_early_once():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    mentions = recorder()
+    task = scheduler.add(ScheduledTask("mentions", mentions, interval=300), run_immediately=False)
+    clock.advance(10)
+    assert scheduler.run_pending() == []
+    scheduler.trigger("mentions")
+    assert scheduler.run_pending() == ["mentions"]
+    assert task.next_run == 310
+    # The entry for the original slot is stale and doesn't run the task again
+    clock.advance(290)
+    assert scheduler.run_pending() == []
+    assert len(mentions.calls) == 1
@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from src.bots.benchmarks import STARTUP_HEAVY_MODULES, _import_times
+from src.bots.glitch_bot_db import SCHEMA_VERSION, TwitterAgentDB
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_entry_point_loads_no_heavy_modules(tmp_path):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import src.bots.glitch_bot_main"],
+                          cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    loaded = _import_times(proc.stderr)
+    assert "src.bots.glitch_bot_main" in loaded
+    eager = [m for m in STARTUP_HEAVY_MODULES if any(name == m or name.startswith(m + ".") for name in loaded)]
+    assert eager == []
+
+
+def table_names(path):
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_schema_setup_is_skipped_when_the_db_is_current(tmp_path):
+    path = str(tmp_path / "twitter_agent.db")
+    TwitterAgentDB(path)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        conn.execute("DROP TABLE search_queries")
+    # At SCHEMA_VERSION nothing is created or migrated...
+    TwitterAgentDB(path)
+    assert "search_queries" not in table_names(path)
+    # ...while an older version runs the setup again
+    with sqlite3.connect(path) as conn:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+    TwitterAgentDB(path)
+    assert "search_queries" in table_names(path)
@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from src.bots.fakes import FakeStreamServer
+from src.bots.streaming import FilteredStream
+
+BACKOFF = {"network_backoff": 0.01, "max_network_backoff": 0.05, "http_backoff": 0.01, "max_http_backoff": 0.02,
+           "rate_limit_backoff": 0.01, "max_rate_limit_backoff": 0.03}
+
+
+class RecordingIngestor:
+    """Stands in for StreamIngestor: one topic rule, and a record of events and catch-up polls"""
+
+    def __init__(self):
+        self.events = []
+        self.catch_ups = 0
+
+    def rules(self):
+        return [{"value": "glitch", "tag": "glitchbot:topics:test"}]
+
+    def handle(self, event):
+        self.events.append(event)
+        return 1
+
+    def catch_up(self):
+        self.catch_ups += 1
+
+    def tweet_ids(self):
+        return [event["data"]["id"] for event in self.events]
+
+
+class RecordingStop(threading.Event):
+    """The stream's stop event, noting each reconnect delay it is asked to wait"""
+
+    def __init__(self):
+        super().__init__()
+        self.waits = []
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        return super().wait(timeout)
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def server():
+    fake = FakeStreamServer(keepalive=0.05).start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def ingestor():
+    return RecordingIngestor()
+
+
+def open_stream(server, ingestor, sync_rules=True, **config) -> FilteredStream:
+    stream = FilteredStream(ingestor, url=server.url, bearer_token="test", config=dict(BACKOFF, **config))
+    stream._stop = RecordingStop()
+    return stream.start(sync_rules=sync_rules)
+
+
+def test_matching_tweets_are_delivered(server, ingestor):
+    stream = open_stream(server, ingestor)
+    try:
+        assert [rule["tag"] for rule in server.rules.values()] == ["glitchbot:topics:test"]
+        wait_for(lambda: stream.connected)
+        server.post_tweet("nothing to see here")
+        tweet = server.post_tweet("a glitch in the model")
+        wait_for(lambda: ingestor.events)
+        assert ingestor.tweet_ids() == [tweet["id"]]
+        assert stream.healthy()
+    finally:
+        stream.stop()
+
+
+def test_rule_sync_only_touches_changed_glitchbot_rules(server, ingestor):
+    server.rules["99"] = {"id": "99", "value": "someone else", "tag": "other"}
+    stream = FilteredStream(ingestor, url=server.url, bearer_token="test")
+    assert stream.sync_rules() == {"kept": 0, "added": 1, "deleted": 0}
+    assert stream.sync_rules() == {"kept": 1, "added": 0, "deleted": 0}
+    assert stream.sync_rules([]) == {"kept": 0, "added": 0, "deleted": 1}
+    assert list(server.rules) == ["99"]
+
+
+def test_dropped_connection_reconnects_and_resumes(server, ingestor):
+    stream = open_stream(server, ingestor, backfill_minutes=1)
+    try:
+        wait_for(lambda: server.connected_clients())
+        first = server.post_tweet("glitch one")
+        wait_for(lambda: first["id"] in ingestor.tweet_ids())
+        server.drop_connections()
+        missed = server.post_tweet("glitch two")
+        wait_for(lambda: stream.connections == 2 and missed["id"] in ingestor.tweet_ids())
+        # The resumed connection asks for a backfill and a catch-up poll covers longer gaps
+        assert "backfill_minutes" not in server.requests[0]
+        assert server.requests[1]["backfill_minutes"] == ["1"]
+        assert ingestor.catch_ups == 1
+    finally:
+        stream.stop()
+
+
+def test_connect_errors_back_off_by_kind(server, ingestor):
+    server.fail_next(503, 503, 503, 429, 429, 429)
+    stream = open_stream(server, ingestor, sync_rules=False)
+    try:
+        wait_for(lambda: stream.connected)
+        # HTTP errors double up to max_http_backoff, 429s separately up to max_rate_limit_backoff
+        assert stream._stop.waits == pytest.approx([0.01, 0.02, 0.02, 0.01, 0.02, 0.03])
+        # A successful connection resets the backoff
+        server.fail_next(503)
+        server.drop_connections()
+        wait_for(lambda: stream.connections == 2)
+        assert stream._stop.waits[6:] == pytest.approx([0.01])
+    finally:
+        stream.stop()
+
+
+def test_network_errors_back_off_linearly(ingestor):
+    server = FakeStreamServer().start()
+    server.stop()  # Nothing listens on its port any more: every connect is refused
+    stream = open_stream(server, ingestor, sync_rules=False)
+    try:
+        wait_for(lambda: len(stream._stop.waits) >= 6)
+        assert stream._stop.waits[:6] == pytest.approx([0.01, 0.02, 0.03, 0.04, 0.05, 0.05])
+        assert stream.connections == 0
+    finally:
+        stream.stop()